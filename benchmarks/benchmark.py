@@ -0,0 +1,232 @@
+"""
+Benchmarks of the clients against the fake PrestaShop webservice of the tests, which serves generated orders,
+customers, addresses, countries and states. The shop runs in a child process with a configurable size and latency per
+response, so the measured CPU time and memory are the client's only.
+
+Every mode is run with a new client and reports the requests per order, wall time, throughput, CPU time and peak
+memory. The CPU time includes the worker processes of a mode, like the ones of iter_orders_pipelined, the peak memory
+is the one of the main process only. Results can be saved and compared with an earlier run to catch regressions:
+
+    python benchmarks/benchmark.py --orders 500 --latency 0.002 --save baseline.json
+    python benchmarks/benchmark.py --orders 500 --latency 0.002 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from typing import Callable
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_shop import FakePrestaShop, make_shop
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.metrics import ClientMetrics
+
+try:
+    from prestashop_orders_client.async_client import AsyncPrestaShopOrderClient, httpx
+except ImportError:
+    httpx = None
+
+API_KEY = "benchmark_api_key"
+
+"""
+Amount of orders fetched one by one with get_order.
+"""
+SINGLE_ORDERS = 50
+
+"""
+The result of one mode. Times are in seconds and memory in bytes. cpu includes the CPU time of the worker processes
+of the mode where the platform reports it, peak_memory counts the allocations of the main process only.
+"""
+BenchmarkResult = namedtuple("BenchmarkResult", "mode orders requests wall cpu peak_memory")
+
+
+def _get_order(client: PrestaShopOrderClient) -> int:
+    orders = min(SINGLE_ORDERS, client.orders_amount)
+    for number in client.order_ids[:orders]:
+        client.get_order(number)
+    return orders
+
+
+def _async_mode(method: str, **kwargs) -> Callable[[ClientMetrics, str], int]:
+    def run(metrics: ClientMetrics, link: str) -> int:
+        async def main() -> int:
+            async with AsyncPrestaShopOrderClient(link, API_KEY, check_connection=False, metrics=metrics) as client:
+                return len(await getattr(client, method)(**kwargs))
+
+        return asyncio.run(main())
+
+    return run
+
+
+def _sync_mode(run: Callable[[PrestaShopOrderClient], int]) -> Callable[[ClientMetrics, str], int]:
+    def run_with_client(metrics: ClientMetrics, link: str) -> int:
+        with PrestaShopOrderClient(link, API_KEY, check_connection=False, metrics=metrics) as client:
+            return run(client)
+
+    return run_with_client
+
+
+def _cpu_time() -> float:
+    """
+    Returns the CPU time of this process and of its finished child processes, like the worker processes of a mode.
+    The shop keeps running until the benchmarks are done, so its CPU time is not included.
+    """
+    if resource is None:
+        return time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+"""
+The benchmarked modes, each one returns the amount of orders it fetched.
+"""
+MODES = {
+    "get_order": _sync_mode(_get_order),
+    "get_all_orders": _sync_mode(lambda client: len(client.get_all_orders())),
+    "get_all_orders_workers": _sync_mode(lambda client: len(client.get_all_orders(workers=8))),
+    "get_all_orders_bulk": _sync_mode(lambda client: len(client.get_all_orders_bulk(page_size=100))),
+    "get_all_orders_batch": _sync_mode(lambda client: len(client.get_all_orders_batch(page_size=100))),
+    "iter_orders_pipelined": _sync_mode(lambda client: sum(1 for _ in client.iter_orders_pipelined(page_size=100))),
+    "async_get_all_orders": _async_mode("get_all_orders"),
+    "async_get_all_orders_bulk": _async_mode("get_all_orders_bulk", page_size=100),
+}
+
+"""
+Modes which need httpx.
+"""
+ASYNC_MODES = ("async_get_all_orders", "async_get_all_orders_bulk")
+
+
+def _serve(orders: int, latency: float, connection):
+    """
+    Serves a generated shop until the parent sends anything over the connection.
+    """
+    with FakePrestaShop(make_shop(orders), API_KEY, latency=latency) as shop:
+        connection.send(shop.link)
+        connection.recv()
+
+
+def run_mode(mode: str, link: str, repeat: int = 3) -> BenchmarkResult:
+    """
+    Runs the mode repeat times and once more with tracemalloc for the peak memory of the main process, which slows it
+    down.
+
+    :param mode: The name of the mode, a key of MODES.
+    :param link: The link of the shop.
+    :param repeat: The amount of timed runs, their median is reported.
+    :return: The result of the mode.
+    """
+    walls, cpus = [], []
+    for _ in range(repeat):
+        metrics = ClientMetrics()
+        wall, cpu = time.perf_counter(), _cpu_time()
+        orders = MODES[mode](metrics, link)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(_cpu_time() - cpu)
+    requests = sum(metrics[resource].requests for resource in metrics)
+    tracemalloc.start()
+    try:
+        MODES[mode](ClientMetrics(), link)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return BenchmarkResult(mode, orders, requests, statistics.median(walls), statistics.median(cpus), peak_memory)
+
+
+def run_benchmarks(orders: int = 200, latency: float = 0.001, modes=None, repeat: int = 3) -> list[BenchmarkResult]:
+    """
+    Starts a shop with the given amount of orders and runs the modes against it.
+
+    :param orders: The amount of orders of the shop.
+    :param latency: Seconds the shop waits before every response.
+    :param modes: The names of the modes to run, all modes which can run here if not set.
+    :param repeat: The amount of timed runs per mode.
+    :return: The results in the order of the modes.
+    """
+    if modes is None:
+        modes = [mode for mode in MODES if httpx is not None or mode not in ASYNC_MODES]
+    parent, child = multiprocessing.Pipe()
+    shop = multiprocessing.Process(target=_serve, args=(orders, latency, child), daemon=True)
+    shop.start()
+    try:
+        link = parent.recv()
+        return [run_mode(mode, link, repeat) for mode in modes]
+    finally:
+        parent.send(None)
+        shop.join(5)
+
+
+def compare(results: list[BenchmarkResult], baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the results with the results of an earlier run.
+
+    :param results: The results of this run.
+    :param baseline: The results of the earlier run as saved by save, keyed by mode.
+    :param tolerance: The allowed relative increase, e.g. 0.2 for 20 percent.
+    :return: A description of every regression, empty if there is none.
+    """
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.mode)
+        if previous is None:
+            continue
+        for field in ("requests", "wall", "cpu", "peak_memory"):
+            value, limit = getattr(result, field), previous[field] * (1 + tolerance)
+            if value > limit:
+                # A baseline of zero has no relative increase
+                increase = f" (+{value / previous[field] - 1:.0%})" if previous[field] else ""
+                regressions.append(f"{result.mode}: {field} {value:.6g} > {previous[field]:.6g}{increase}")
+    return regressions
+
+
+def format_results(results: list[BenchmarkResult]) -> str:
+    """
+    Formats the results as a table, the peak memory is the one of the main process.
+    """
+    lines = [f"{'mode':<28}{'orders':>8}{'req/order':>11}{'wall s':>10}{'orders/s':>11}{'cpu s':>10}{'main MiB':>10}"]
+    for result in results:
+        lines.append(f"{result.mode:<28}{result.orders:>8}{result.requests / result.orders:>11.2f}{result.wall:>10.3f}"
+                     f"{result.orders / result.wall:>11.1f}{result.cpu:>10.3f}{result.peak_memory / 2 ** 20:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(arguments: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200, help="amount of orders of the shop")
+    parser.add_argument("--latency", type=float, default=0.001, help="seconds the shop waits before every response")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per mode, the median is reported")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), help="modes to run, all by default")
+    parser.add_argument("--save", help="save the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare with the results saved in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative increase over the baseline")
+    args = parser.parse_args(arguments)
+
+    results = run_benchmarks(args.orders, args.latency, args.modes, args.repeat)
+    print(format_results(results))
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({result.mode: result._asdict() for result in results}, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print("Regression:", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
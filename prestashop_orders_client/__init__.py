@@ -1,2 +1,3 @@
 from prestashop_orders_client.client import PrestaShopOrderClient
-
+from prestashop_orders_client.async_client import AsyncPrestaShopOrderClient
+from prestashop_orders_client.multi_shop import MultiShopOrderClient
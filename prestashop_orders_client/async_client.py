@@ -0,0 +1,572 @@
+"""
+prestashop_orders_client.async_client
+~~~~~~~~~~~~~~
+This module provides an asyncio version of PrestaShopOrderClient. It is built on httpx, which has to be installed
+separately: pip install prestashop_orders_client[async]
+"""
+import asyncio
+from array import array
+from collections import deque
+from typing import AsyncIterator, Iterable
+
+try:
+    import httpx
+    from .transport import AsyncRetryingTransport
+except ImportError:
+    httpx = None
+
+from .batch import OrderBatch
+from .cache import ResourceCache
+from .exceptions import *
+from .parser import _OrderParser
+from .response_cache import ResponseCache
+from .transport import RetryPolicy, RateLimiter, DEFAULT_TIMEOUT
+from .metrics import ClientMetrics, _Stopwatch
+from .utils import _handle_response, _handle_projected_response, _check_response, _timed_decode_resources, \
+    _check_connection_response, _build_api_url, _cache_key, _projection, _merge_fields, _display, _id_filter, Order, \
+    ORDER_COMPONENTS, RESOURCE_LISTS, OUTPUT_FORMATS, _OrderIdIndex
+
+
+async def _get_resource_as_dict_async(client: "httpx.AsyncClient", link: str, xml_root: str,
+                                      params: dict = None, cache=None, fields=None, metrics=None) -> dict:
+    """
+    Fetches the given resource from the PrestaShop server and returns it as a dictionary.
+
+    :param client: An open httpx.AsyncClient authenticated at the PrestaShop server.
+    :param link: The URL of the resource to be fetched.
+    :param xml_root: The root element of the resource in the XML response.
+    :param params: Optional query parameters such as display, filter, sort or limit.
+    :param cache: Optional ResourceCache, single resources are read from it and stored in it.
+    :param fields: Optional fields to extract, all fields are parsed with xmltodict if not set. Without params only
+        these fields are requested from the server.
+    :param metrics: Optional ClientMetrics, the parse time and cache hits are recorded in it.
+    :return: The resource as a dictionary.
+    :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
+    :raises UnexpectedStatusCodeError: If the server returns a status code other than 200 or 401.
+    :raises PrestaShopConnectionError: If there is an error connecting to the server.
+    """
+    cache_key = _cache_key(link, xml_root) if cache is not None and params is None else None
+    if cache_key and (data := cache.get(*cache_key)) is not None:
+        if metrics is not None:
+            metrics.record_cache_hit(RESOURCE_LISTS[xml_root])
+        return data
+    projected = fields is not None and params is None
+    if projected:
+        link, params = _projection(link, fields)
+    try:
+        response = await client.get(link, params=params)
+    except httpx.HTTPError as e:
+        raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+    with _Stopwatch() as stopwatch:
+        if projected:
+            data = _handle_projected_response(response.status_code, response.content, response.text, xml_root,
+                                              fields, link)
+        else:
+            data = _handle_response(response.status_code, response.content, response.text, xml_root, fields, link)
+    if metrics is not None:
+        metrics.record_parse(RESOURCE_LISTS[xml_root], stopwatch.seconds, 1 if data else 0)
+    if cache_key and data:
+        cache.set(*cache_key, data)
+    return data
+
+
+async def _get_resources_as_list_async(client: "httpx.AsyncClient", link: str, xml_root: str, params: dict = None,
+                                       fields=None, metrics=None) -> list[dict]:
+    """
+    Fetches a list of resources from the PrestaShop server.
+
+    :param client: An open httpx.AsyncClient authenticated at the PrestaShop server.
+    :param link: The URL of the resource list, e.g. https://shop/api/customers
+    :param xml_root: The root element of a single resource in the XML response, e.g. customer
+    :param params: Optional query parameters such as display, filter, sort or limit.
+    :param fields: Optional fields to extract from every resource, all fields are parsed with xmltodict if not set.
+    :param metrics: Optional ClientMetrics, the parse time is recorded in it.
+    :return: The resources as a list of dictionaries, empty if there are none.
+    :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
+    :raises UnexpectedStatusCodeError: If the server returns a status code other than 200 or 401.
+    :raises PrestaShopConnectionError: If there is an error connecting to the server.
+    """
+    try:
+        response = await client.get(link, params=params)
+    except httpx.HTTPError as e:
+        raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+    if not _check_response(response.status_code, response.text, RESOURCE_LISTS[xml_root]):
+        return []
+    return _timed_decode_resources(response.content, xml_root, fields, link, metrics)
+
+
+def _httpx_timeout(timeout: float | tuple[float, float] | None) -> "httpx.Timeout":
+    """
+    Turns a timeout in seconds or a (connect, read) pair, as requests takes it, into an httpx.Timeout.
+    """
+    if isinstance(timeout, tuple):
+        return httpx.Timeout(timeout[1], connect=timeout[0])
+    return httpx.Timeout(timeout)
+
+
+class _AsyncOrderParser:
+    """
+    Asyncio version of _OrderParser. Resources are fetched concurrently, never more at once than the semaphore
+    allows.
+    """
+
+    def __init__(self, client: "httpx.AsyncClient", semaphore: asyncio.Semaphore, cache=None, fields: dict = None,
+                 extra_fields: dict = None, metrics: ClientMetrics = None):
+        """
+        Initializes an instance of the AsyncOrderParser class
+
+        :param client: An httpx.AsyncClient used to make API requests.
+        :param semaphore: The semaphore limiting the amount of requests running at the same time.
+        :param cache: Optional ResourceCache holding resources shared between orders.
+        :param fields: The fields to request per resource, RESOURCE_FIELDS if not set.
+        :param extra_fields: Optional fields per resource whose values are put into Order.extra.
+        :param metrics: Optional ClientMetrics recording the parse and build times and cache hits.
+        """
+        self.client = client
+        self.semaphore = semaphore
+        self.cache = cache
+        self.fields = _merge_fields() if fields is None else fields
+        self.extra_fields = extra_fields
+        self.metrics = metrics
+        # Builds orders and records the build time, it doesn't make any request
+        self.__builder = _OrderParser(None, extra_fields=extra_fields, metrics=metrics)
+
+    async def parse_order(self, order_link: str) -> Order:
+        """
+        Parses an order from the provided order link and returns it as an Order object
+
+        :param order_link: A link to the order resource.
+        :return: An Order object.
+        """
+        return self.__builder.build_orders([await self.extract_order_data(order_link)])[0]
+
+    async def parse_orders(self, orders_data: list[dict], chunk_size: int = 100) -> list[Order]:
+        """
+        Parses many orders at once like _OrderParser.parse_orders, each distinct resource is fetched only once with
+        batched filter[id] requests, which run concurrently.
+
+        :param orders_data: Orders as dictionaries, as returned by the orders list with a display of their fields.
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A list of Order objects in the same order as orders_data.
+        """
+        order_states, customers, addresses, products = await asyncio.gather(
+            self.extract_linked_data(orders_data, "current_state", "order_state", chunk_size),
+            self.extract_linked_data(orders_data, "id_customer", "customer", chunk_size),
+            self.extract_linked_data(orders_data, "id_address_delivery", "address", chunk_size),
+            self.extract_products(orders_data, chunk_size))
+        countries, states = await asyncio.gather(
+            self.extract_linked_data(addresses.values(), "id_country", "country", chunk_size),
+            self.extract_linked_data(addresses.values(), "id_state", "state", chunk_size))
+        return self.__builder.build_orders(_OrderParser.join_orders_data(orders_data, order_states, customers,
+                                                                         addresses, countries, states, products))
+
+    async def extract_products(self, orders_data: list[dict], chunk_size: int = 100) -> dict | None:
+        """
+        Fetches the products of the order rows of the orders like _OrderParser.extract_products.
+
+        :param orders_data: Orders as dictionaries, including their associations.
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A dictionary mapping the ids to the products, None if products are not resolved.
+        """
+        if "product" not in self.fields:
+            return None
+        return await self.extract_linked_data([row for order_data in orders_data
+                                               for row in _OrderParser.order_rows(order_data)],
+                                              "product_id", "product", chunk_size)
+
+    async def extract_linked_data(self, resources_data, field: str, xml_root: str, chunk_size: int) -> dict:
+        """
+        Fetches all resources referenced in the given field of the resources, each distinct id only once and
+        in chunks of chunk_size ids per request. Resources found in the cache are not fetched.
+
+        :param resources_data: Resources as dictionaries containing the link field.
+        :param field: The field holding the link, e.g. id_customer
+        :param xml_root: The root element of the linked resource, e.g. customer
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A dictionary mapping the ids to the linked resources.
+        """
+        links = _OrderParser.linked_links(resources_data, field)
+        if not links:
+            return dict()
+        list_link = next(iter(links.values())).rsplit("/", 1)[0]
+        linked_data = dict()
+        if self.cache is not None:
+            linked_data = {resource_id: data for resource_id in links
+                           if (data := self.cache.get(xml_root, resource_id)) is not None}
+            if self.metrics is not None:
+                self.metrics.record_cache_hit(RESOURCE_LISTS[xml_root], len(linked_data))
+        ids = sorted((resource_id for resource_id in links if resource_id not in linked_data), key=int)
+        pages = await asyncio.gather(*(self.fetch_resources(list_link, xml_root, ids[start:start + chunk_size])
+                                       for start in range(0, len(ids), chunk_size)))
+        for page in pages:
+            for data in page:
+                linked_data[data["id"]] = data
+                if self.cache is not None:
+                    self.cache.set(xml_root, data["id"], data)
+        return linked_data
+
+    async def fetch_resources(self, list_link: str, xml_root: str, ids: list) -> list[dict]:
+        """
+        Fetches the resources with the given ids with one filter[id] request, as soon as the semaphore allows another
+        request.
+
+        :param list_link: The URL of the resource list, e.g. https://shop/api/customers
+        :param xml_root: The root element of a single resource in the XML response, e.g. customer
+        :param ids: The ids of the resources.
+        :return: The resources as a list of dictionaries.
+        """
+        async with self.semaphore:
+            return await _get_resources_as_list_async(self.client, list_link, xml_root,
+                                                      {"display": _display(self.fields[xml_root]),
+                                                       "filter[id]": _id_filter(ids)},
+                                                      fields=self.fields[xml_root], metrics=self.metrics)
+
+    async def extract_order_data(self, order_link: str) -> dict:
+        """
+        Extracts all the necessary data for the order from the API
+
+        :param order_link: A link to the order resource.
+        :return: A dictionary containing all the necessary data for the order.
+        """
+        order_data = await self.fetch_resource(order_link, "order")
+        order_state_data, customer_data, address_data = await asyncio.gather(
+            self.fetch_resource(order_data['current_state']['@xlink:href'], "order_state"),
+            self.fetch_resource(order_data['id_customer']['@xlink:href'], "customer"),
+            self.fetch_resource(order_data['id_address_delivery']['@xlink:href'], "address"))
+        linked_resources = [self.fetch_resource(address_data['id_country']['@xlink:href'], "country")]
+        # If state is not set there will be '0' in the state field instead of a link, state_data will be empty dict
+        if isinstance(address_data['id_state'], dict):
+            linked_resources.append(self.fetch_resource(address_data['id_state']['@xlink:href'], "state"))
+        linked_resources.append(self.extract_products([order_data]))
+        country_data, *linked_data, products = await asyncio.gather(*linked_resources)
+        state_data = linked_data[0] if linked_data else {}
+        extracted_data = {resource: data for resource, data in zip(ORDER_COMPONENTS,
+                                                                   [order_data, order_state_data, customer_data,
+                                                                    address_data, country_data, state_data])}
+        if products is not None:
+            extracted_data["products"] = products
+        return extracted_data
+
+    async def fetch_resource(self, link: str, xml_root: str) -> dict:
+        """
+        Fetches the resource as soon as the semaphore allows another request.
+
+        :param link: The URL of the resource to be fetched.
+        :param xml_root: The root element of the resource in the XML response.
+        :return: The resource as a dictionary.
+        """
+        cache_key = _cache_key(link, xml_root) if self.cache is not None else None
+        # Cached resources don't have to wait for the semaphore
+        if cache_key and (data := self.cache.get(*cache_key)) is not None:
+            if self.metrics is not None:
+                self.metrics.record_cache_hit(RESOURCE_LISTS[xml_root])
+            return data
+        async with self.semaphore:
+            data = await _get_resource_as_dict_async(self.client, link, xml_root, fields=self.fields[xml_root],
+                                                     metrics=self.metrics)
+        if cache_key and data:
+            self.cache.set(*cache_key, data)
+        return data
+
+
+class AsyncPrestaShopOrderClient:
+    """
+    An asyncio client for interacting with the PrestaShop orders API. It returns the same Order objects and raises
+    the same exceptions as PrestaShopOrderClient. Use it as an async context manager, which connects to the shop on
+    enter and closes the connections on exit:
+
+        async with AsyncPrestaShopOrderClient("myshop.com", "my_api_key") as client:
+            order = await client.get_order(1)
+    """
+
+    def __init__(self, shop_link: str, api_key: str, max_concurrency: int = 10, cache: ResourceCache = None,
+                 output_format: str = "XML", check_connection: bool = True, retry_policy: RetryPolicy = None,
+                 rate_limiter: RateLimiter = None, response_cache: ResponseCache = None, extra_fields: dict = None,
+                 metrics: ClientMetrics = None, timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+                 keep_alive: bool = True, compression: bool = True, http2: bool = False, order_rows: bool = False,
+                 products: bool = False):
+        """
+        Initializes the client with the provided shop link and API key. No request is made before connect() is
+        awaited.
+
+        :param shop_link: The link of the shop to connect to, https is used unless it contains a scheme.
+        :param api_key: The API key to use for authentication.
+        :param max_concurrency: The maximum amount of requests running at the same time.
+        :param cache: Optional ResourceCache for resources shared between orders, like countries or customers.
+        :param output_format: The wire format, XML or JSON. Shops which do not support JSON answer in XML which is
+            then used instead.
+        :param check_connection: Request the API root in connect() to check the connection and the API key.
+        :param retry_policy: How connection errors and transient error statuses like 429 or 502 are retried,
+            RetryPolicy() with 3 retries if not set. RetryPolicy(retries=0) disables retrying.
+        :param rate_limiter: Optional RateLimiter which limits the requests per second sent to the shop.
+        :param response_cache: Optional persistent ResponseCache, unchanged resources are then taken from it instead
+            of being downloaded again, also across restarts.
+        :param extra_fields: Further fields to read per resource, e.g. {"customer": ["birthday"]}. Their values are
+            put into Order.extra, e.g. order.extra["customer"]["birthday"].
+        :param metrics: The ClientMetrics recording requests, parse times and cache hits, a new one if not set.
+        :param timeout: Seconds to wait for a connection and for a response, as one value for both or a pair of
+            (connect, read) timeouts. None waits forever.
+        :param keep_alive: Reuse connections between requests. Without it every request opens a new connection.
+        :param compression: Ask for gzip compressed responses, which are much smaller for XML and JSON.
+        :param http2: Use HTTP/2 where the shop supports it, all requests then share one connection. Requires the h2
+            package: pip install httpx[http2]
+        :param order_rows: Read the line items of the orders into Order.rows, see PrestaShopOrderClient.
+        :param products: Read the order rows and resolve the product of every row with batched requests, see
+            PrestaShopOrderClient.
+        :raises: ImportError if httpx is not installed, ValueError if the output format or an extra field's resource is
+            not supported
+        """
+        if httpx is None:
+            raise ImportError("AsyncPrestaShopOrderClient requires httpx! "
+                              "Install it with: pip install prestashop_orders_client[async]")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output format! Must be one of {', '.join(OUTPUT_FORMATS)}")
+        self.__fields = _merge_fields(extra_fields, order_rows, products)
+        self.__shop_api_url = _build_api_url(shop_link)
+        self.__max_concurrency = max_concurrency
+        self.__check_connection = check_connection
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self.rate_limiter = rate_limiter
+        self.response_cache = response_cache
+        self.metrics = ClientMetrics() if metrics is None else metrics
+        transport = AsyncRetryingTransport(self.retry_policy, self.rate_limiter, response_cache=self.response_cache,
+                                           metrics=self.metrics, http2=http2,
+                                           limits=httpx.Limits(max_connections=max_concurrency,
+                                                               max_keepalive_connections=max_concurrency
+                                                               if keep_alive else 0))
+        self.__client = httpx.AsyncClient(auth=(api_key, ""), transport=transport, timeout=_httpx_timeout(timeout),
+                                          headers=None if compression else {"Accept-Encoding": "identity"},
+                                          params={"output_format": output_format} if output_format != "XML" else None)
+        self.cache = cache
+        self.extra_fields = extra_fields
+        self.__semaphore = asyncio.Semaphore(max_concurrency)
+        self.__order_parser = _AsyncOrderParser(self.__client, self.__semaphore, self.cache, self.__fields,
+                                                extra_fields, self.metrics)
+        self.__order_ids = None
+        self.__order_ids_lock = asyncio.Lock()
+
+    async def __aenter__(self) -> "AsyncPrestaShopOrderClient":
+        try:
+            await self.connect()
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def connect(self):
+        """
+        Tests the connection to the API, unless the client was created with check_connection=False. Orders are
+        counted on first use.
+
+        :raises: InvalidApiKeyError, WebServiceUnavailableError, UnexpectedStatusCodeError, PrestaShopConnectionError
+        """
+        if not self.__check_connection:
+            return
+        try:
+            test_response = await self.__client.get(self.__shop_api_url)
+        except httpx.HTTPError as e:
+            raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+        _check_connection_response(test_response.status_code, test_response.text)
+
+    async def close(self):
+        """
+        Closes all connections of the client.
+        """
+        await self.__client.aclose()
+
+    @property
+    def orders_amount(self) -> int | None:
+        """
+        The number of orders available in the shop, None until they are counted by count_orders or the first call
+        needing them.
+        """
+        return None if self.__order_ids is None else len(self.__order_ids)
+
+    @property
+    def order_ids(self) -> array | None:
+        """
+        The sorted ids of the orders available in the shop, None until they are loaded by count_orders or the first
+        call needing them. Ids added to the shop later are picked up by refresh_order_ids.
+        """
+        return None if self.__order_ids is None else self.__order_ids.ids
+
+    async def count_orders(self) -> int:
+        """
+        Loads the ids of all orders available in the shop once and returns their number. Order ids have gaps after
+        deletions, so they are kept in an index instead of assuming they run from 1 to the highest id.
+        :return: int
+        :raises: OrdersNotFound
+        """
+        return len(await self.__order_id_index())
+
+    async def refresh_order_ids(self) -> int:
+        """
+        Adds the ids of orders created since the ids were loaded, requesting only the ids newer than the known ones.
+
+        Returns:
+            The amount of new orders.
+        """
+        if self.__order_ids is None:
+            return len(await self.__order_id_index())
+        return await self.__refresh(self.__order_ids)
+
+    async def __order_id_index(self) -> _OrderIdIndex:
+        """
+        Returns the order id index, loading it on first use. Concurrent first uses load it once.
+        :raises: OrdersNotFound
+        """
+        async with self.__order_ids_lock:
+            if self.__order_ids is None:
+                order_ids = _OrderIdIndex()
+                await self.__refresh(order_ids)
+                if not order_ids:
+                    raise OrdersNotFound("No orders found! Add some to your shop.")
+                self.__order_ids = order_ids
+        return self.__order_ids
+
+    async def __refresh(self, order_ids: _OrderIdIndex) -> int:
+        """
+        Adds the ids of orders newer than the ones in the index.
+        :param order_ids: The index to add the ids to.
+        :return: The amount of added ids.
+        """
+        return order_ids.extend(await _get_resources_as_list_async(
+            self.__client, "{}/orders".format(self.__shop_api_url), "order", order_ids.refresh_params(),
+            fields=("id",), metrics=self.metrics))
+
+    async def __order_link(self, number: int) -> str:
+        """
+        Validates the order number and returns the link to the order.
+        :param number: The order number.
+        :return: The link to the order resource.
+        :raises: InvalidOrderNumber
+        """
+        order_ids = await self.__order_id_index()
+        if number not in order_ids:
+            # The order may have been created after the ids were loaded
+            if number <= order_ids.last_id or not await self.__refresh(order_ids) or number not in order_ids:
+                raise InvalidOrderNumber(f"Invalid order number! There is no order with id {number}")
+        return f"{self.__shop_api_url}/orders/{number}"
+
+    async def get_order(self, number: int) -> Order:
+        """
+        Retrieve a specific order by its number.
+
+        Args: number (int): The order number, i.e. the id of the order, to retrieve. Must be the id of an order
+        present in the shop.
+
+        Returns:
+            An Order object representing the order with the specified number.
+
+        Raises:
+            InvalidOrderNumber: if the provided number is not a valid order number.
+        """
+        return await self.__order_parser.parse_order(await self.__order_link(number))
+
+    async def iter_orders(self) -> AsyncIterator[Order]:
+        """
+        Iterate over all orders present in the shop. Orders are fetched concurrently but yielded in order of their
+        numbers, ids of deleted orders are skipped.
+
+        Yields:
+            Order objects, representing all orders present in the shop.
+        """
+        pending = deque()
+        try:
+            for number in list(await self.__order_id_index()):
+                pending.append(asyncio.ensure_future(
+                    self.__order_parser.parse_order(f"{self.__shop_api_url}/orders/{number}")))
+                if len(pending) >= self.__max_concurrency:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_all_orders(self) -> list[Order]:
+        """
+        Retrieve a list of all orders present in the shop.
+
+        Returns:
+            A list of Order objects, representing all orders present in the shop.
+        """
+        return [order async for order in self.iter_orders()]
+
+    async def get_all_orders_batch(self) -> OrderBatch:
+        """
+        Retrieve all orders present in the shop as a compact OrderBatch. Orders are added to the batch as they arrive,
+        so they are never held as Order objects all at once.
+
+        Returns:
+            An OrderBatch with all orders present in the shop.
+        """
+        batch = OrderBatch()
+        async for order in self.iter_orders():
+            batch.append(order)
+        return batch
+
+    async def get_orders_bulk(self, numbers: Iterable[int], page_size: int = 100) -> list[Order]:
+        """
+        Retrieve the orders with the given numbers using bulk requests. The orders are read with filter[id] requests
+        of page_size ids and every customer, address, order state, country and state they reference is read only
+        once with batched filter[id] requests, so the amount of requests grows with the amount of distinct resources
+        instead of the amount of orders. All requests run concurrently.
+
+        Args:
+            numbers (Iterable[int]): The order numbers to retrieve.
+            page_size (int): The maximum amount of ids in one request.
+
+        Returns:
+            A list of Order objects in the same order as the numbers.
+
+        Raises:
+            InvalidOrderNumber: if one of the provided numbers is not a valid order number.
+        """
+        numbers = list(numbers)
+        for number in numbers:
+            await self.__order_link(number)
+        ids = sorted(set(numbers))
+        orders = {order.id: order for order in await self.__get_orders_bulk(
+            [{"filter[id]": _id_filter(ids[start:start + page_size])} for start in range(0, len(ids), page_size)],
+            page_size)}
+        for number in numbers:
+            if number not in orders:
+                raise InvalidOrderNumber(f"Invalid order number! There is no order with id {number}")
+        return [orders[number] for number in numbers]
+
+    async def get_all_orders_bulk(self, page_size: int = 100) -> list[Order]:
+        """
+        Retrieve a list of all orders present in the shop using bulk requests, see get_orders_bulk. The orders are
+        read in id ranges of page_size orders cut from the order id index, which are requested concurrently.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            A list of Order objects, representing all orders present in the shop, sorted by id.
+        """
+        order_ids = list(await self.__order_id_index())
+        return await self.__get_orders_bulk(
+            [{"filter[id]": f"[{order_ids[start]},{order_ids[min(start + page_size, len(order_ids)) - 1]}]"}
+             for start in range(0, len(order_ids), page_size)], page_size)
+
+    async def __get_orders_bulk(self, pages_params: list[dict], chunk_size: int) -> list[Order]:
+        """
+        Reads the order pages concurrently and resolves the resources of all of their orders at once.
+        :param pages_params: The filter parameters of every page of orders.
+        :param chunk_size: Maximum amount of ids in one filter[id] request of the referenced resources.
+        :return: The orders sorted by id.
+        """
+        async def get_page(params: dict) -> list[dict]:
+            async with self.__semaphore:
+                return await _get_resources_as_list_async(self.__client, f"{self.__shop_api_url}/orders", "order",
+                                                          params | {"display": _display(self.__fields["order"])},
+                                                          fields=self.__fields["order"], metrics=self.metrics)
+
+        pages = await asyncio.gather(*(get_page(params) for params in pages_params))
+        orders_data = sorted((data for page in pages for data in page), key=lambda data: int(data["id"]))
+        return await self.__order_parser.parse_orders(orders_data, chunk_size)
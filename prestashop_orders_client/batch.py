@@ -0,0 +1,243 @@
+"""
+prestashop_orders_client.batch
+~~~~~~~~~~~~~~
+This module provides OrderBatch, a compact columnar container for many orders. Fields repeating between orders are
+dictionary encoded, all other text is packed into one buffer per field and numbers are kept in arrays, so a million
+orders take a fraction of the memory of a list of Order objects. Batches can be handed to pyarrow and pandas without
+copying the buffers when those are installed.
+"""
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from .utils import Order, OrderRow
+
+"""
+Fields with few distinct values, these are stored once per value and referenced by a code per order.
+"""
+DICTIONARY_FIELDS = ("order_state", "country", "state", "city", "company_name")
+
+
+class _Validity:
+    """
+    An Arrow compatible validity bitmap, one bit per row and set for values which are not None. It is only created
+    once the first None is added, columns without None have no bitmap at all.
+    """
+
+    def __init__(self):
+        self.bitmap = None
+
+    def add(self, row: int, valid: bool):
+        if self.bitmap is None:
+            if valid:
+                return
+            # Every row before the first None is valid
+            self.bitmap = bytearray(b"\xff" * (row // 8 + 1))
+        if row // 8 >= len(self.bitmap):
+            self.bitmap.append(0)
+        if valid:
+            self.bitmap[row // 8] |= 1 << row % 8
+        else:
+            self.bitmap[row // 8] &= ~(1 << row % 8) & 0xff
+
+    def valid(self, row: int) -> bool:
+        return self.bitmap is None or bool(self.bitmap[row // 8] >> row % 8 & 1)
+
+
+class _StringColumn:
+    """
+    Text of all rows as one UTF-8 buffer with the offsets of every value, the layout of an Arrow large_string array.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+        self.validity = _Validity()
+
+    def append(self, value: str | None):
+        self.validity.add(len(self.offsets) - 1, value is not None)
+        if value is not None:
+            self.data += value.encode()
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, row: int) -> str | None:
+        if not self.validity.valid(row):
+            return None
+        return self.data[self.offsets[row]:self.offsets[row + 1]].decode()
+
+    def to_arrow(self, length: int) -> "pyarrow.Array":
+        return pyarrow.Array.from_buffers(pyarrow.large_string(), length, [_buffer(self.validity.bitmap),
+                                                                          pyarrow.py_buffer(self.offsets),
+                                                                          pyarrow.py_buffer(self.data)])
+
+
+class _DictionaryColumn:
+    """
+    Distinct values of all rows and the code of every row's value, the layout of an Arrow dictionary array.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = array("i")
+        self.validity = _Validity()
+        self.__index = dict()
+
+    def append(self, value: str | None):
+        self.validity.add(len(self.codes), value is not None)
+        if value is None:
+            self.codes.append(0)
+            return
+        code = self.__index.get(value)
+        if code is None:
+            code = self.__index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row: int) -> str | None:
+        return self.values[self.codes[row]] if self.validity.valid(row) else None
+
+    def to_arrow(self, length: int) -> "pyarrow.Array":
+        codes = pyarrow.Array.from_buffers(pyarrow.int32(), length, [_buffer(self.validity.bitmap),
+                                                                    pyarrow.py_buffer(self.codes)])
+        return pyarrow.DictionaryArray.from_arrays(codes, pyarrow.array(self.values, pyarrow.string()))
+
+
+class OrderBatch(Sequence):
+    """
+    A sequence of orders stored column by column. Reading a row builds its Order, so the batch can be used like a
+    list of orders, while only the columns are kept in memory:
+
+        batch = OrderBatch(client.iter_orders())
+        batch[0], len(batch), batch.column("country")
+
+    Ids are stored as 64 bit integers, total_paid as doubles, fields of DICTIONARY_FIELDS dictionary encoded and all
+    other text as UTF-8 buffers. The extra values of orders read with extra fields and the order rows of orders read
+    with them are kept as they are.
+    """
+
+    def __init__(self, orders: Iterable[Order] = ()):
+        """
+        Initializes the batch with the given orders.
+
+        :param orders: Orders to add, e.g. an iterator like PrestaShopOrderClient.iter_orders() which is consumed
+            without holding all orders at once.
+        """
+        self.__ids = array("q")
+        self.__totals_paid = array("d")
+        self.__columns = {field: _DictionaryColumn() if field in DICTIONARY_FIELDS else _StringColumn()
+                          for field in Order._fields[2:-2]}
+        # Most batches have no extra values or order rows at all, so they are only kept for the rows having them
+        self.__extras = dict()
+        self.__rows = dict()
+        self.extend(orders)
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return OrderBatch(self[row] for row in range(*index.indices(len(self))))
+        row = range(len(self))[index]
+        return Order(self.__ids[row], self.__totals_paid[row],
+                     *(column[row] for column in self.__columns.values()), self.__extras.get(row), self.__rows.get(row))
+
+    def __iter__(self) -> Iterator[Order]:
+        return (self[row] for row in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, OrderBatch):
+            return len(self) == len(other) and all(order == other_order for order, other_order in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"OrderBatch(<{len(self)} orders>)"
+
+    def append(self, order: Order):
+        """
+        Adds an order at the end of the batch.
+
+        :param order: The order to add.
+        """
+        if order.extra is not None:
+            self.__extras[len(self.__ids)] = order.extra
+        if order.rows is not None:
+            self.__rows[len(self.__ids)] = order.rows
+        self.__ids.append(order.id)
+        self.__totals_paid.append(order.total_paid)
+        for field, column in self.__columns.items():
+            column.append(getattr(order, field))
+
+    def extend(self, orders: Iterable[Order]):
+        """
+        Adds the orders at the end of the batch.
+
+        :param orders: The orders to add.
+        """
+        for order in orders:
+            self.append(order)
+
+    def column(self, field: str) -> list:
+        """
+        Returns the values of one field of all orders.
+
+        :param field: A field of Order, e.g. country
+        :raises KeyError: If Order has no such field.
+        """
+        if field == "id":
+            return self.__ids.tolist()
+        if field == "total_paid":
+            return self.__totals_paid.tolist()
+        if field == "extra":
+            return [self.__extras.get(row) for row in range(len(self))]
+        if field == "rows":
+            return [self.__rows.get(row) for row in range(len(self))]
+        column = self.__columns[field]
+        return [column[row] for row in range(len(self))]
+
+    def to_arrow(self) -> "pyarrow.Table":
+        """
+        Returns the orders as a pyarrow Table with the fields of Order as columns. The buffers of the batch are shared
+        with the table instead of being copied, dictionary encoded fields become dictionary arrays. Adding orders to
+        the batch raises BufferError while the table is in use.
+
+        :raises ImportError: If pyarrow is not installed.
+        """
+        if pyarrow is None:
+            raise ImportError("OrderBatch.to_arrow requires pyarrow! Install it with: pip install pyarrow")
+        length = len(self)
+        arrays = [pyarrow.Array.from_buffers(pyarrow.int64(), length, [None, pyarrow.py_buffer(self.__ids)]),
+                  pyarrow.Array.from_buffers(pyarrow.float64(), length, [None, pyarrow.py_buffer(self.__totals_paid)])]
+        arrays.extend(column.to_arrow(length) for column in self.__columns.values())
+        # Extra values are copied into a struct column
+        arrays.append(pyarrow.array(self.column("extra")) if self.__extras else pyarrow.nulls(length))
+        # Order rows are copied into a list of structs column
+        arrays.append(pyarrow.array([None if rows is None else [_row_dict(order_row) for order_row in rows]
+                                     for rows in self.column("rows")]) if self.__rows else pyarrow.nulls(length))
+        return pyarrow.Table.from_arrays(arrays, names=list(Order._fields))
+
+    def to_pandas(self):
+        """
+        Returns the orders as a pandas DataFrame, built from to_arrow(). Numeric columns reuse the buffers of the
+        batch where pandas allows it and dictionary encoded fields become categoricals.
+
+        :raises ImportError: If pyarrow or pandas is not installed.
+        """
+        return self.to_arrow().to_pandas()
+
+
+def _row_dict(order_row: OrderRow) -> dict:
+    """
+    Turns an OrderRow into a dictionary, with its product as a dictionary as well.
+    """
+    return order_row._asdict() | {"product": None if order_row.product is None else order_row.product._asdict()}
+
+
+def _buffer(data) -> "pyarrow.Buffer | None":
+    """
+    Wraps the data in a pyarrow buffer without copying it, None stays None.
+    """
+    return None if data is None else pyarrow.py_buffer(data)
@@ -0,0 +1,97 @@
+"""
+prestashop_orders_client.cache
+~~~~~~~~~~~~~~
+This module provides an in-memory cache for resources which are shared between orders, like countries, states,
+order states, customers and their addresses or the products of order rows. Pass it to PrestaShopOrderClient to stop
+fetching them for every order.
+"""
+import threading
+import time
+from collections import OrderedDict, Counter
+from typing import Callable
+
+"""
+Seconds a resource stays fresh in the cache by default. Resources without a TTL, like orders whose state changes,
+are not cached.
+"""
+DEFAULT_TTLS = {"order_state": 3600, "country": 86400, "state": 86400, "customer": 600, "address": 600,
+                "product": 3600}
+
+"""
+Resource types every shop has only a few of, these can be preloaded with one request each.
+"""
+REFERENCE_RESOURCES = ("order_state", "country", "state")
+
+
+class ResourceCache:
+    """
+    A thread safe LRU cache of resources keyed by resource type and id, with a TTL per resource type and a limit on
+    the amount of cached resources. Hits and misses are counted per resource type.
+
+    Any object with the same get and set methods can be used instead, for example one backed by a shared store.
+    """
+
+    def __init__(self, max_size: int = 10000, ttls: dict = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initializes an empty cache.
+
+        :param max_size: The maximum amount of resources kept, the least recently used one is evicted first.
+        :param ttls: Seconds a resource stays fresh per resource type, DEFAULT_TTLS if not set. None means forever.
+        :param clock: Function returning the current time in seconds.
+        """
+        self.max_size = max_size
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.hits = Counter()
+        self.misses = Counter()
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, resource: str, resource_id: str) -> dict | None:
+        """
+        Returns the cached resource or None if it is not cached, expired or of a type which is not cached.
+
+        :param resource: The resource type, e.g. country
+        :param resource_id: The id of the resource.
+        """
+        if resource not in self.ttls:
+            return None
+        key = (resource, str(resource_id))
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > self.__clock()):
+                self.__entries.move_to_end(key)
+                self.hits[resource] += 1
+                return entry[1]
+            if entry is not None:
+                del self.__entries[key]
+            self.misses[resource] += 1
+            return None
+
+    def set(self, resource: str, resource_id: str, data: dict):
+        """
+        Caches the resource, unless its type is not cached.
+
+        :param resource: The resource type, e.g. country
+        :param resource_id: The id of the resource.
+        :param data: The resource as a dictionary.
+        """
+        if resource not in self.ttls:
+            return
+        ttl = self.ttls[resource]
+        key = (resource, str(resource_id))
+        with self.__lock:
+            self.__entries[key] = (None if ttl is None else self.__clock() + ttl, data)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all cached resources, the counters are kept.
+        """
+        with self.__lock:
+            self.__entries.clear()
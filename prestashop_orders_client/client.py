@@ -4,11 +4,25 @@ prestashop_orders_client.client
 This module provides main functionality of our package. It contains class that is used to communicate with PrestaShop
 API and retrieve orders.
 """
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
 import requests
+from requests.adapters import DEFAULT_POOLSIZE
 
+from .batch import OrderBatch
+from .cache import ResourceCache, REFERENCE_RESOURCES
 from .exceptions import *
+from .export import _export_orders
 from .parser import _OrderParser
-from .utils import _get_resource_as_dict, Order
+from .pipeline import _OrderPipeline
+from .metrics import ClientMetrics
+from .response_cache import ResponseCache
+from .transport import RetryPolicy, RateLimiter, RetryingAdapter, DEFAULT_TIMEOUT
+from .utils import _get_resources_as_list, _check_connection_response, _build_api_url, Order, \
+    _merge_fields, _display, _id_filter, RESOURCE_LISTS, OUTPUT_FORMATS, SyncWatermark, _OrderIdIndex
+from .watcher import OrderWatcher, WATCH_FIELDS
 
 
 class PrestaShopOrderClient:
@@ -16,20 +30,84 @@ class PrestaShopOrderClient:
     A client for interacting with the PrestaShop orders API.
     This class allows you to establish a connection to the PrestaShop API,
     retrieve information about orders and parse them to the Order object.
+    The client keeps its connections open until it is closed, use it as a context manager to close them:
+
+        with PrestaShopOrderClient("myshop.com", "my_api_key") as client:
+            order = client.get_order(1)
     """
 
-    def __init__(self, shop_link: str, api_key: str):
+    def __init__(self, shop_link: str, api_key: str, cache: ResourceCache = None, preload: bool = False,
+                 output_format: str = "XML", check_connection: bool = True, retry_policy: RetryPolicy = None,
+                 rate_limiter: RateLimiter = None, response_cache: ResponseCache = None, extra_fields: dict = None,
+                 metrics: ClientMetrics = None, pool_size: int = DEFAULT_POOLSIZE,
+                 timeout: float | tuple[float, float] = DEFAULT_TIMEOUT, keep_alive: bool = True,
+                 compression: bool = True, order_rows: bool = False, products: bool = False):
         """
         Initializes the client with the provided shop link and API key.
 
-        :param shop_link: The link of the shop to connect to.
+        :param shop_link: The link of the shop to connect to, https is used unless it contains a scheme.
         :param api_key: The API key to use for authentication.
+        :param cache: Optional ResourceCache for resources shared between orders, like countries or customers.
+        :param preload: Fill the cache with all order states, countries and states right away.
+        :param output_format: The wire format, XML or JSON. JSON is smaller and cheaper to decode, shops which do not
+            support it answer in XML which is then used instead.
+        :param check_connection: Request the API root to check the connection and the API key right away. Without it
+            the client is created without any request and errors show up with the first call.
+        :param retry_policy: How connection errors and transient error statuses like 429 or 502 are retried,
+            RetryPolicy() with 3 retries if not set. RetryPolicy(retries=0) disables retrying.
+        :param rate_limiter: Optional RateLimiter which limits the requests per second sent to the shop.
+        :param response_cache: Optional persistent ResponseCache, unchanged resources are then taken from it instead
+            of being downloaded again, also across restarts.
+        :param extra_fields: Further fields to read per resource, e.g. {"customer": ["birthday"]}. Their values are
+            put into Order.extra, e.g. order.extra["customer"]["birthday"].
+        :param metrics: The ClientMetrics recording requests, parse times and cache hits, a new one if not set. Pass
+            one with hooks or a tracer to feed them into a monitoring system.
+        :param pool_size: The amount of connections kept open, it grows when orders are fetched with more workers.
+        :param timeout: Seconds to wait for a connection and for a response, as one value for both or a pair of
+            (connect, read) timeouts. None waits forever.
+        :param keep_alive: Reuse connections between requests. Without it every request opens a new connection.
+        :param compression: Ask for gzip compressed responses, which are much smaller for XML and JSON.
+        :param order_rows: Read the line items of the orders into Order.rows. They are part of the order, so this
+            needs no further request, but full orders are requested instead of their fields only.
+        :param products: Read the order rows and resolve the product of every row with its weight, EAN-13 and
+            reference, with batched requests of the products of many rows at once. Products are cached like
+            customers when the client has a cache.
         :raises: InvalidApiKeyError, WebServiceUnavailableError, UnexpectedStatusCodeError, PrestaShopConnectionError
         """
-        self.__shop_api_url = "https://{}/api".format(shop_link)
-        self.__session = self.__establish_connection(api_key)
-        self.__order_parser = _OrderParser(self.__session)
-        self.orders_amount = self.__count_orders()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output format! Must be one of {', '.join(OUTPUT_FORMATS)}")
+        self.__shop_api_url = _build_api_url(shop_link)
+        self.extra_fields = extra_fields
+        self.__fields = _merge_fields(extra_fields, order_rows, products)
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self.rate_limiter = rate_limiter
+        self.response_cache = response_cache
+        self.metrics = ClientMetrics() if metrics is None else metrics
+        self.timeout = timeout
+        self.__keep_alive = keep_alive
+        self.__compression = compression
+        self.__pool_size = pool_size
+        self.__session = self.__establish_connection(api_key) if check_connection else self.__create_session(api_key)
+        if output_format != "XML":
+            self.__session.params = {"output_format": output_format}
+        self.cache = cache
+        self.__order_parser = _OrderParser(self.__session, cache=self.cache, fields=self.__fields,
+                                           extra_fields=self.extra_fields, metrics=self.metrics)
+        self.__order_ids = None
+        if preload:
+            self.preload_resources()
+
+    def __enter__(self) -> "PrestaShopOrderClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes all connections of the client.
+        """
+        self.__session.close()
 
     def __establish_connection(self, api_key: str) -> requests.Session:
         """
@@ -38,51 +116,548 @@ class PrestaShopOrderClient:
         :return: session object
         :raises: InvalidApiKeyError, WebServiceUnavailableError, UnexpectedStatusCodeError, PrestaShopConnectionError
         """
-        with requests.Session() as presta_client:
-            presta_client.auth = (api_key, "")
+        presta_client = self.__create_session(api_key)
+        try:
             try:
                 test_response = presta_client.get(self.__shop_api_url)
-                if test_response.status_code == 200:
-                    return presta_client
-                elif test_response.status_code == 503:
-                    raise WebServiceUnavailableError(
-                        "WebService Api is unavailable! Turn it on in your shop settings.")
-                elif test_response.status_code == 401:
-                    raise InvalidApiKeyError("Invalid API key!")
-                else:
-                    raise UnexpectedStatusCodeError(
-                        f"Unexpected status code: {test_response.status_code}\nError: {test_response.text}")
             except requests.RequestException as e:
                 raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+            _check_connection_response(test_response.status_code, test_response.text)
+        except BaseException:
+            presta_client.close()
+            raise
+        # The session stays open, so the connection of the check is reused by the next request
+        return presta_client
+
+    def __create_session(self, api_key: str) -> requests.Session:
+        """
+        Creates a session authenticated with the API key, sending its requests through the retrying adapter.
+        :param api_key: The API key to use for authentication.
+        :return: session object
+        """
+        session = requests.Session()
+        session.auth = (api_key, "")
+        if not self.__keep_alive:
+            session.headers["Connection"] = "close"
+        if not self.__compression:
+            session.headers["Accept-Encoding"] = "identity"
+        self.__mount_adapter(session, self.__pool_size)
+        return session
+
+    def __mount_adapter(self, session: requests.Session, pool_size: int):
+        """
+        Mounts a retrying adapter keeping up to pool_size connections open for both http and https.
+        :param session: The session to mount the adapter on.
+        :param pool_size: The amount of connections kept open.
+        """
+        adapter = RetryingAdapter(self.retry_policy, self.rate_limiter, response_cache=self.response_cache,
+                                  metrics=self.metrics, timeout=self.timeout, pool_connections=pool_size,
+                                  pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+    @property
+    def orders_amount(self) -> int:
+        """
+        The number of orders available in the shop, counted on first access.
+        :raises: OrdersNotFound
+        """
+        return len(self.order_ids)
 
-    def __count_orders(self) -> int:
+    @property
+    def order_ids(self) -> array:
         """
-        Counts the number of orders available in the shop.
-        :return: int
+        The sorted ids of the orders available in the shop, loaded on first access. Ids added to the shop later are
+        picked up by refresh_order_ids.
         :raises: OrdersNotFound
         """
-        orders_list = _get_resource_as_dict(self.__session, "{}/orders".format(self.__shop_api_url), "orders").get(
-            'order')
-        if orders_list:
-            return len(orders_list)
+        return self.__order_id_index().ids
+
+    def __load_order_ids(self) -> _OrderIdIndex:
+        """
+        Loads the ids of all orders available in the shop into an index.
+        :return: _OrderIdIndex
+        :raises: OrdersNotFound
+        """
+        order_ids = _OrderIdIndex()
+        self.__refresh(order_ids)
+        if order_ids:
+            return order_ids
         else:
             raise OrdersNotFound("No orders found! Add some to your shop.")
 
-    def get_all_orders(self) -> list[Order]:
+    def __refresh(self, order_ids: _OrderIdIndex) -> int:
+        """
+        Adds the ids of orders newer than the ones in the index.
+        :param order_ids: The index to add the ids to.
+        :return: The amount of added ids.
+        """
+        return order_ids.extend(_get_resources_as_list(self.__session, "{}/orders".format(self.__shop_api_url),
+                                                       "order", order_ids.refresh_params(), fields=("id",),
+                                                       metrics=self.metrics))
+
+    def refresh_order_ids(self) -> int:
+        """
+        Adds the ids of orders created since the ids were loaded, requesting only the ids newer than the known ones.
+
+        Returns:
+            The amount of new orders.
+        """
+        if self.__order_ids is None:
+            return len(self.__order_id_index())
+        return self.__refresh(self.__order_ids)
+
+    def __resize_connection_pool(self, pool_size: int):
+        """
+        Makes sure the session keeps at least pool_size connections open so that concurrent requests reuse
+        connections instead of opening a new one each time.
+        :param pool_size: The amount of connections needed at the same time.
+        """
+        if pool_size > self.__pool_size:
+            replaced = self.__session.get_adapter(self.__shop_api_url)
+            self.__mount_adapter(self.__session, pool_size)
+            # Idle connections of the replaced adapter are closed, connections in use are closed once released
+            replaced.close()
+            self.__pool_size = pool_size
+
+    def preload_resources(self, resources: Iterable[str] = REFERENCE_RESOURCES):
+        """
+        Fills the cache with all resources of the given types, one request per resource type.
+
+        Args:
+            resources (Iterable[str]): The resource types to preload, order states, countries and states by default.
+
+        Raises:
+            ValueError: if the client has no cache.
+        """
+        if self.cache is None:
+            raise ValueError("The client has no cache to preload resources into!")
+        for resource in resources:
+            for data in _get_resources_as_list(self.__session, f"{self.__shop_api_url}/{RESOURCE_LISTS[resource]}",
+                                               resource, {"display": _display(self.__fields[resource])},
+                                               fields=self.__fields[resource], metrics=self.metrics):
+                self.cache.set(resource, data["id"], data)
+
+    def get_all_orders(self, workers: int = 1) -> list[Order]:
         """
         Retrieve a list of all orders present in the shop.
 
+        Args:
+            workers (int): The amount of orders fetched at the same time.
+
         Returns:
             A list of Order objects, representing all orders present in the shop.
         """
-        return [self.get_order(i) for i in range(1, self.orders_amount + 1)]
+        return self.get_orders(self.order_ids, workers)
+
+    def get_orders(self, numbers: Iterable[int], workers: int = 1) -> list[Order]:
+        """
+        Retrieve the orders with the given numbers. With more than one worker the orders are fetched concurrently and
+        the resources of every order (order state, customer, address and then country, state) are fetched in
+        parallel as well. get_orders_bulk needs far fewer requests for many orders.
+
+        Args:
+            numbers (Iterable[int]): The order numbers to retrieve.
+            workers (int): The amount of orders fetched at the same time.
+
+        Returns:
+            A list of Order objects in the same order as the numbers.
+
+        Raises:
+            InvalidOrderNumber: if one of the provided numbers is not a valid order number.
+        """
+        numbers = list(numbers)
+        if workers <= 1:
+            return [self.get_order(number) for number in numbers]
+        order_links = [self.__order_link(number) for number in numbers]
+        # An order can wait on up to three of its resources, these run in their own pool to avoid starving it
+        resource_workers = workers * 3
+        self.__resize_connection_pool(workers + resource_workers)
+        with ThreadPoolExecutor(workers) as order_pool, ThreadPoolExecutor(resource_workers) as resource_pool:
+            order_parser = _OrderParser(self.__session, resource_pool, self.cache, self.__fields, self.extra_fields,
+                                        self.metrics)
+            return list(order_pool.map(order_parser.parse_order, order_links))
+
+    def get_orders_bulk(self, numbers: Iterable[int], page_size: int = 100) -> list[Order]:
+        """
+        Retrieve the orders with the given numbers using bulk requests. The orders are read with filter[id] requests
+        of page_size ids and every customer, address, order state, country and state they reference is read only
+        once with batched filter[id] requests, so the amount of requests grows with the amount of distinct resources
+        instead of five times the amount of orders.
+
+        Args:
+            numbers (Iterable[int]): The order numbers to retrieve.
+            page_size (int): The maximum amount of ids in one request.
+
+        Returns:
+            A list of Order objects in the same order as the numbers.
+
+        Raises:
+            InvalidOrderNumber: if one of the provided numbers is not a valid order number.
+        """
+        numbers = list(numbers)
+        for number in numbers:
+            self.__order_link(number)
+        orders = {order.id: order for order in self.__get_orders_by_ids(numbers, page_size)}
+        for number in numbers:
+            if number not in orders:
+                raise InvalidOrderNumber(f"Invalid order number! There is no order with id {number}")
+        return [orders[number] for number in numbers]
+
+    def __get_orders_by_ids(self, numbers: Iterable[int], page_size: int) -> list[Order]:
+        """
+        Reads the orders with the given ids with filter[id] requests of page_size ids, missing orders are left out.
+        :return: The orders sorted by id.
+        """
+        ids = sorted(set(numbers))
+        orders_data = []
+        for start in range(0, len(ids), page_size):
+            orders_data.extend(_get_resources_as_list(
+                self.__session, f"{self.__shop_api_url}/orders", "order",
+                {"display": _display(self.__fields["order"]), "filter[id]": _id_filter(ids[start:start + page_size])},
+                fields=self.__fields["order"], metrics=self.metrics))
+        # The resources of all orders are resolved at once, so resources shared by orders of different pages are
+        # read only once as well
+        return self.__order_parser.parse_orders(orders_data, page_size)
+
+    def get_all_orders_bulk(self, page_size: int = 100) -> list[Order]:
+        """
+        Retrieve a list of all orders present in the shop using bulk requests. Orders are read in pages of page_size
+        and the customers, addresses, order states, countries and states they reference are read with batched
+        filter[id] requests, so the amount of requests grows with the amount of pages instead of the amount of orders.
+        Only the fields the orders are built from are requested.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            A list of Order objects, representing all orders present in the shop, sorted by id.
+        """
+        return list(self.iter_orders(page_size))
+
+    def get_all_orders_batch(self, page_size: int = 100) -> OrderBatch:
+        """
+        Retrieve all orders present in the shop as a compact OrderBatch, using the bulk requests of
+        get_all_orders_bulk. Orders are added to the batch page by page, so they are never held as Order objects
+        all at once, which keeps the memory of exports of millions of orders low.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            An OrderBatch with all orders present in the shop, sorted by id.
+        """
+        return OrderBatch(self.iter_orders(page_size))
+
+    def iter_orders(self, page_size: int = 100, start: int = 0, stop: int = None,
+                    after_id: int = None) -> Iterator[Order]:
+        """
+        Lazily iterate over the orders of the shop sorted by id, using the bulk requests of get_all_orders_bulk.
+        Only one page of orders is held in memory and orders are yielded as soon as their page is parsed.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+            start (int): Position of the first order to yield.
+            stop (int): Position after the last order to yield, all orders up to the end if not set.
+            after_id (int): Yield only the orders with a greater id, positions then count from the first of them. Use
+                it with the id of the last processed order to resume an interrupted iteration, orders deleted
+                meanwhile don't shift it.
+
+        Yields:
+            Order objects sorted by id.
+        """
+        position, last_id, offset = start, after_id, start
+        display = _display(self.__fields["order"])
+        while stop is None or position < stop:
+            amount = page_size if stop is None else min(page_size, stop - position)
+            # The first page is found by its position, the next ones by id which keeps every page equally cheap
+            # for the shop's database
+            params = {"display": display, "sort": "[id_ASC]",
+                      "limit": amount if offset is None else f"{offset},{amount}"}
+            if last_id is not None:
+                params["filter[id]"] = f">[{last_id}]"
+            orders_page = _get_resources_as_list(self.__session, f"{self.__shop_api_url}/orders", "order", params,
+                                                 fields=self.__fields["order"], metrics=self.metrics)
+            yield from self.__order_parser.parse_orders(orders_page, page_size)
+            if len(orders_page) < amount:
+                return
+            position, last_id, offset = position + amount, orders_page[-1]["id"], None
+
+    def iter_orders_pipelined(self, page_size: int = 100, io_workers: int = 8, processes: int = None,
+                              max_pending: int = None, start: int = 0, stop: int = None) -> Iterator[Order]:
+        """
+        Lazily iterate over the orders of the shop sorted by id like iter_orders, but download pages in I/O threads
+        and decode them in a pool of worker processes, so decoding large exports uses all cores. Pages are cut from
+        the order id index, refreshed first to include orders added since it was loaded, and read by id range.
+        Order states, countries and states are read once at the start, the
+        client's cache is not used. At most max_pending pages are in flight, a slow consumer holds the downloads back.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+            io_workers (int): The amount of pages downloaded at the same time.
+            processes (int): The amount of worker processes, one per core if not set.
+            max_pending (int): The maximum amount of pages downloaded or decoded ahead of the consumer, twice the
+                I/O workers if not set.
+            start (int): Position of the first order to yield, use it to resume an interrupted iteration.
+            stop (int): Position after the last order to yield, all orders up to the end if not set.
+
+        Yields:
+            Order objects sorted by id.
+        """
+        try:
+            self.refresh_order_ids()
+        except OrdersNotFound:
+            # Like iter_orders, an empty shop has no orders to yield
+            return
+        self.__resize_connection_pool(io_workers)
+        pipeline = _OrderPipeline(self.__session, self.__shop_api_url, self.__fields, self.extra_fields, self.metrics,
+                                  page_size)
+        yield from pipeline.run(self.order_ids[start:stop], page_size, io_workers, processes, max_pending)
+
+    def export_orders(self, path: str, format: str = "ndjson", compression: str = None, page_size: int = 100,
+                      chunk_size: int = 1000) -> int:
+        """
+        Stream all orders of the shop sorted by id to a file, with bounded memory. Orders are written in chunks and
+        after every chunk the id of its last order is saved in <path>.checkpoint. If the export is interrupted,
+        calling it again with the same path resumes after the last written chunk instead of starting over. The
+        checkpoint is removed once the export is complete.
+
+        NDJSON writes one JSON object per order and CSV one row per order with extra and rows as JSON. Both go to
+        one file which can be gzip compressed. Parquet needs pyarrow and writes a directory with one part file per
+        chunk, compressed with any Parquet compression like snappy or zstd.
+
+        Args:
+            path (str): The file to write, a directory for Parquet.
+            format (str): One of ndjson, csv or parquet.
+            compression (str): Optional compression, gzip for NDJSON and CSV.
+            page_size (int): The amount of orders requested at once.
+            chunk_size (int): The amount of orders written at once and between checkpoints.
+
+        Returns:
+            The amount of exported orders, including the ones exported before an interruption.
+
+        Raises:
+            ValueError: if the format or compression is not supported or differs from the interrupted export, or the
+                file of the interrupted export is missing or shorter than its checkpoint.
+            ImportError: if the format is parquet and pyarrow is not installed.
+        """
+        return _export_orders(self, path, format, compression, page_size, chunk_size)
+
+    def get_orders_since(self, date_upd: str = None, since_id: int = 0,
+                         page_size: int = 100) -> tuple[list[Order], SyncWatermark]:
+        """
+        Retrieve only the orders added or changed after a watermark, using the bulk requests of get_all_orders_bulk.
+        With date_upd the orders updated after (date_upd, since_id) are returned, so changes of old orders are
+        found as well. With since_id alone only orders with a greater id, i.e. new orders, are returned.
+
+        Args:
+            date_upd (str): Update date of the last synced order, e.g. 2024-01-31 12:00:00
+            since_id (int): Id of the last synced order.
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            The orders sorted by update date (or by id without date_upd) and the watermark to pass to the next call,
+            e.g. client.get_orders_since(*watermark)
+        """
+        orders_data, watermark = self.get_orders_data_since(date_upd, since_id, page_size)
+        return self.__order_parser.build_orders(orders_data), watermark
+
+    def get_orders_data_since(self, date_upd: str = None, since_id: int = 0,
+                              page_size: int = 100) -> tuple[list[dict], SyncWatermark]:
+        """
+        Like get_orders_since, but returns the data of the resources every order is built from instead of the orders,
+        e.g. to mirror them. Only the fields of RESOURCE_FIELDS and the extra fields are read.
+
+        Args:
+            date_upd (str): Update date of the last synced order, e.g. 2024-01-31 12:00:00
+            since_id (int): Id of the last synced order.
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            A dictionary with the order, order_state, customer, address, country and state of every order, in the
+            order of get_orders_since, and the watermark to pass to the next call.
+        """
+        if date_upd is None:
+            orders_data = self.__get_orders_data_by_id({}, since_id, page_size)
+            watermark = SyncWatermark(None, int(orders_data[-1]["id"]) if orders_data else since_id)
+        else:
+            orders_data = self.__get_orders_data_after(date_upd, since_id, page_size)
+            watermark = SyncWatermark(orders_data[-1]["date_upd"], int(orders_data[-1]["id"])) if orders_data \
+                else SyncWatermark(date_upd, since_id)
+        return self.__order_parser.extract_orders_data(orders_data), watermark
+
+    def watch_orders(self, since: SyncWatermark = None, min_interval: float = 5.0, max_interval: float = 60.0,
+                     backoff: float = 2.0, page_size: int = 100) -> OrderWatcher:
+        """
+        Watch the shop for new and changed orders, e.g. to process paid orders as soon as they come in. Every poll
+        reads only the id, update date and state of the orders updated since the last poll, usually a single small
+        request, and the full orders are read only for new or changed ids with the bulk requests of get_orders_bulk.
+        Polls follow each other every min_interval seconds while orders change and back off up to max_interval
+        seconds while nothing does. The watcher reuses the connections of the client, keep one client for it
+        instead of creating a new one for every poll.
+
+            watcher = client.watch_orders()
+            for change in watcher:
+                if change.created:
+                    print("New order", change.order.reference)
+
+        Args:
+            since (SyncWatermark): Report the orders changed after this watermark, e.g. the watermark of a previous
+                watcher or of get_orders_since. Only orders changed after the first poll are reported if not set.
+            min_interval (float): Seconds between polls while orders change.
+            max_interval (float): Maximum seconds between polls while nothing changes.
+            backoff (float): Factor the interval grows by after every poll without changes.
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            An OrderWatcher, iterate over it or call its run method with a callback. Its stop method ends watching.
+
+        Raises:
+            ValueError: if the intervals or the backoff are invalid or since has no update date.
+        """
+        return OrderWatcher(lambda params, limit=None: self.__get_orders_data(params, page_size, limit, WATCH_FIELDS),
+                            lambda date_upd: self.__get_orders_data_after(date_upd, 0, page_size, WATCH_FIELDS),
+                            lambda numbers: self.__get_orders_by_ids(numbers, page_size), since, min_interval,
+                            max_interval, backoff)
+
+    def find_orders(self, current_state=None, date_add: tuple[str, str] = None, date_upd: tuple[str, str] = None,
+                    id_customer=None, reference=None, sort: str = "id_ASC", limit: int = None,
+                    page_size: int = 100) -> list[Order]:
+        """
+        Retrieve the orders matching all given conditions. The conditions are sent to the shop as filter parameters,
+        so only the matching orders are read and the cost grows with the amount of results instead of the size of
+        the shop. Their resources are read with the bulk requests of get_all_orders_bulk.
+
+            client.find_orders(current_state="Payment accepted", date_add=("2024-02-01", "2024-02-01 23:59:59"))
+
+        Args:
+            current_state: An order state, by id or by name, or a list of them.
+            date_add (tuple[str, str]): Interval of the add date, both ends included, e.g.
+                ("2024-01-01", "2024-01-31 23:59:59")
+            date_upd (tuple[str, str]): Interval of the update date, both ends included.
+            id_customer: The id of a customer or a list of them.
+            reference: The reference of an order or a list of them.
+            sort (str): The field and direction to sort by, e.g. date_add_DESC. Orders with equal values are sorted
+                by id.
+            limit (int): The maximum amount of orders returned.
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            A list of the matching Order objects, sorted as requested.
+
+        Raises:
+            ValueError: if an order state name is not an order state of the shop.
+        """
+        params = {"sort": f"[{sort}]" if sort.startswith("id_") else f"[{sort},id_ASC]"}
+        if current_state is not None:
+            params["filter[current_state]"] = _id_filter(self.__order_state_ids(_values(current_state)))
+        for field, interval in (("date_add", date_add), ("date_upd", date_upd)):
+            if interval is not None:
+                params[f"filter[{field}]"] = "[{},{}]".format(*interval)
+                params["date"] = 1
+        if id_customer is not None:
+            params["filter[id_customer]"] = _id_filter(_values(id_customer))
+        if reference is not None:
+            params["filter[reference]"] = _id_filter(_values(reference))
+        return self.__order_parser.parse_orders(self.__get_orders_data(params, page_size, limit), page_size)
+
+    def __order_state_ids(self, states: list) -> list:
+        """
+        Turns order state names into their ids with one request for all order states, ids are kept.
+        :raises ValueError: If a name is not the name of an order state.
+        """
+        names = [state for state in states if isinstance(state, str) and not state.isdigit()]
+        if not names:
+            return states
+        ids_by_name = {_OrderParser.plain_value(data["name"]): data["id"] for data in _get_resources_as_list(
+            self.__session, f"{self.__shop_api_url}/order_states", "order_state",
+            {"display": _display(self.__fields["order_state"])}, fields=self.__fields["order_state"],
+            metrics=self.metrics)}
+        for name in names:
+            if name not in ids_by_name:
+                raise ValueError(f"Invalid order state {name}! Must be one of {', '.join(ids_by_name)}")
+        return [ids_by_name.get(state, state) for state in states]
+
+    def __get_orders_data(self, params: dict, page_size: int, limit: int = None, fields: tuple = None) -> list[dict]:
+        """
+        Reads the fields of all orders matching the query parameters, page by page.
+        :param params: Filter and sort parameters of the query.
+        :param page_size: The amount of orders requested at once.
+        :param limit: The maximum amount of orders read, all matching orders if not set.
+        :param fields: The fields to read, the fields orders are built from if not set.
+        :return: The orders as dictionaries.
+        """
+        fields = fields or self.__fields["order"]
+        orders_data = []
+        while limit is None or len(orders_data) < limit:
+            amount = page_size if limit is None else min(page_size, limit - len(orders_data))
+            orders_page = _get_resources_as_list(self.__session, f"{self.__shop_api_url}/orders", "order",
+                                                 params | {"display": _display(fields),
+                                                           "limit": f"{len(orders_data)},{amount}"},
+                                                 fields=fields, metrics=self.metrics)
+            orders_data.extend(orders_page)
+            if len(orders_page) < amount:
+                break
+        return orders_data
+
+    def __get_orders_data_after(self, date_upd: str, since_id: int, page_size: int, fields: tuple = None) -> list[dict]:
+        """
+        Reads the fields of all orders updated after the watermark (date_upd, since_id), sorted by update date and id.
+        Every page starts after the update date and id of the last order read instead of at an offset, so orders
+        updated meanwhile don't shift the pages and make others be skipped.
+        :param date_upd: Update date of the watermark.
+        :param since_id: Id of the watermark, orders updated at date_upd with an id up to it are left out.
+        :param page_size: The amount of orders requested at once.
+        :param fields: The fields to read, the fields orders are built from if not set.
+        :return: The orders as dictionaries, an order updated meanwhile only once at its new position.
+        """
+        orders_data = []
+        interval = f"[{date_upd},9999-12-31 23:59:59]"
+        while True:
+            orders_page = self.__get_orders_data({"filter[date_upd]": interval, "date": 1,
+                                                  "sort": "[date_upd_ASC,id_ASC]"}, page_size, page_size, fields)
+            # The interval includes date_upd itself, orders up to since_id at that date were already read
+            orders_data.extend(data for data in orders_page
+                               if data["date_upd"] != date_upd or int(data["id"]) > since_id)
+            if len(orders_page) < page_size:
+                break
+            if orders_page[-1]["date_upd"] == date_upd:
+                # A whole page was updated in the same second, the rest of that second is read by id
+                orders_data.extend(self.__get_orders_data_by_id(
+                    {"filter[date_upd]": f"[{date_upd},{date_upd}]", "date": 1},
+                    max(since_id, int(orders_page[-1]["id"])), page_size, fields))
+                interval = f">[{date_upd}]"
+            else:
+                date_upd, since_id = orders_page[-1]["date_upd"], int(orders_page[-1]["id"])
+                interval = f"[{date_upd},9999-12-31 23:59:59]"
+        positions = {data["id"]: position for position, data in enumerate(orders_data)}
+        return [data for position, data in enumerate(orders_data) if positions[data["id"]] == position]
+
+    def __get_orders_data_by_id(self, params: dict, since_id: int, page_size: int, fields: tuple = None) -> list[dict]:
+        """
+        Reads the fields of all orders matching the filter parameters with an id above since_id, sorted by id. Every
+        page starts after the id of the last order read.
+        :param params: Filter parameters of the query.
+        :param since_id: The orders up to this id are left out.
+        :param page_size: The amount of orders requested at once.
+        :param fields: The fields to read, the fields orders are built from if not set.
+        :return: The orders as dictionaries.
+        """
+        orders_data = []
+        while True:
+            orders_page = self.__get_orders_data(params | {"filter[id]": f">[{since_id}]", "sort": "[id_ASC]"},
+                                                 page_size, page_size, fields)
+            orders_data.extend(orders_page)
+            if len(orders_page) < page_size:
+                return orders_data
+            since_id = int(orders_page[-1]["id"])
 
     def get_order(self, number: int) -> Order:
         """
         Retrieve a specific order by its number.
 
-        Args: number (int): The order number to retrieve. Must be greater than or equal to 1 and less than or equal
-        to the total number of orders.
+        Args: number (int): The order number, i.e. the id of the order, to retrieve. Must be the id of an order
+        present in the shop.
 
         Returns:
             An Order object representing the order with the specified number.
@@ -90,7 +665,34 @@ class PrestaShopOrderClient:
         Raises:
             InvalidOrderNumber: if the provided number is not a valid order number.
         """
-        if number < 1 or number > self.orders_amount:
-            raise InvalidOrderNumber(f"Invalid order number! Must be >= 1 and <= {self.orders_amount}")
-        order_link = f"{self.__shop_api_url}/orders/{number}"
-        return self.__order_parser.parse_order(order_link)
+        return self.__order_parser.parse_order(self.__order_link(number))
+
+    def __order_link(self, number: int) -> str:
+        """
+        Validates the order number and returns the link to the order.
+        :param number: The order number.
+        :return: The link to the order resource.
+        :raises: InvalidOrderNumber
+        """
+        if number not in self.__order_id_index():
+            # The order may have been created after the ids were loaded
+            if number <= self.__order_ids.last_id or not self.__refresh(self.__order_ids) \
+                    or number not in self.__order_ids:
+                raise InvalidOrderNumber(f"Invalid order number! There is no order with id {number}")
+        return f"{self.__shop_api_url}/orders/{number}"
+
+    def __order_id_index(self) -> _OrderIdIndex:
+        """
+        Returns the order id index, loading it on first use.
+        :raises: OrdersNotFound
+        """
+        if self.__order_ids is None:
+            self.__order_ids = self.__load_order_ids()
+        return self.__order_ids
+
+
+def _values(value) -> list:
+    """
+    Returns a single value of a query as a list, a list of values as it is.
+    """
+    return [value] if isinstance(value, (str, int)) else list(value)
@@ -0,0 +1,254 @@
+"""
+prestashop_orders_client.export
+~~~~~~~~~~~~~~
+This module provides the writers and checkpoints of PrestaShopOrderClient.export_orders, which streams the orders of
+a shop to NDJSON, CSV or Parquet and resumes an interrupted export where it stopped. Made not to be used by external
+users.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .batch import OrderBatch, _row_dict
+from .utils import Order
+
+"""
+Formats orders can be exported to.
+"""
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+
+class _Checkpoint:
+    """
+    The progress of an export, kept as JSON next to it in <path>.checkpoint. It is replaced atomically, so it always
+    describes a completely written chunk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path + ".checkpoint"
+
+    def load(self) -> dict | None:
+        """
+        Returns the saved progress or None if there is no unfinished export.
+        """
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state: dict):
+        """
+        Saves the progress, the previous progress stays intact if this fails.
+        """
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, self.path)
+
+    def remove(self):
+        """
+        Removes the checkpoint of a finished export.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class _FileWriter:
+    """
+    Appends chunks of orders to one file. Every chunk is flushed to disk before it counts as written and, when
+    compressed, becomes a gzip member of its own, so the file can be cut back to the end of any chunk.
+    """
+
+    def __init__(self, path: str, compression: str = None, position: int = 0):
+        """
+        Opens the file, cutting off everything written after the given position.
+
+        :param path: The path of the file.
+        :param compression: None or gzip.
+        :param position: The size of the file after the last completely written chunk, 0 starts a new file.
+        """
+        self.compression = compression
+        self.file = open(path, "r+b" if position else "wb")
+        self.file.truncate(position)
+        self.file.seek(position)
+        if not position:
+            self.write_bytes(self.header())
+
+    @staticmethod
+    def can_resume(path: str, position: int) -> bool:
+        """
+        Returns whether the file still holds everything written up to the given position.
+        """
+        return os.path.isfile(path) and os.path.getsize(path) >= position
+
+    @property
+    def position(self) -> int:
+        return self.file.tell()
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, orders: list[Order]) -> bytes:
+        raise NotImplementedError
+
+    def write(self, orders: list[Order]):
+        self.write_bytes(self.encode(orders))
+
+    def write_bytes(self, data: bytes):
+        if not data:
+            return
+        self.file.write(gzip.compress(data) if self.compression == "gzip" else data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class _NdjsonWriter(_FileWriter):
+    """
+    Writes every order as a JSON object on a line of its own.
+    """
+
+    def encode(self, orders: list[Order]) -> bytes:
+        return "".join(json.dumps(_order_dict(order), ensure_ascii=False) + "\n" for order in orders).encode()
+
+
+class _CsvWriter(_FileWriter):
+    """
+    Writes every order as a row with the fields of Order as columns, extra values and order rows as JSON.
+    """
+
+    def header(self) -> bytes:
+        return self.__rows([Order._fields])
+
+    def encode(self, orders: list[Order]) -> bytes:
+        rows = []
+        for order in orders:
+            data = _order_dict(order)
+            rows.append(tuple(order[:-2]) + tuple(None if data[field] is None else
+                                                  json.dumps(data[field], ensure_ascii=False)
+                                                  for field in ("extra", "rows")))
+        return self.__rows(rows)
+
+    @staticmethod
+    def __rows(rows: list) -> bytes:
+        text = io.StringIO()
+        csv.writer(text).writerows(rows)
+        return text.getvalue().encode()
+
+
+class _ParquetWriter:
+    """
+    Writes every chunk of orders as a Parquet file of its own into a directory, part-00000.parquet and so on, which
+    can be read together as one dataset. A part file is complete or not there at all.
+    """
+
+    def __init__(self, path: str, compression: str = None, position: int = 0):
+        """
+        Creates the directory, removing the parts written after the given position.
+
+        :param path: The path of the directory.
+        :param compression: A Parquet compression like snappy, gzip or zstd, None writes uncompressed parts.
+        :param position: The amount of completely written parts.
+        """
+        if pyarrow is None:
+            raise ImportError("Exporting to Parquet requires pyarrow! Install it with: pip install pyarrow")
+        self.path = path
+        self.compression = compression or "none"
+        self.position = position
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name.startswith("part-") and (not name.endswith(".parquet") or int(name[5:10]) >= position):
+                os.remove(os.path.join(path, name))
+
+    @staticmethod
+    def can_resume(path: str, position: int) -> bool:
+        """
+        Returns whether the directory still holds all parts written before the given position.
+        """
+        return all(os.path.isfile(os.path.join(path, f"part-{part:05d}.parquet")) for part in range(position))
+
+    def write(self, orders: list[Order]):
+        part = os.path.join(self.path, f"part-{self.position:05d}.parquet")
+        pyarrow.parquet.write_table(OrderBatch(orders).to_arrow(), part + ".tmp", compression=self.compression)
+        os.replace(part + ".tmp", part)
+        self.position += 1
+
+    def close(self):
+        pass
+
+
+_WRITERS = {"ndjson": _NdjsonWriter, "csv": _CsvWriter, "parquet": _ParquetWriter}
+
+
+def _order_dict(order: Order) -> dict:
+    """
+    Turns an order into a dictionary of plain values, with its order rows as dictionaries as well.
+    """
+    return order._asdict() | {"rows": None if order.rows is None else [_row_dict(row) for row in order.rows]}
+
+
+def _export_orders(client, path: str, format: str = "ndjson", compression: str = None, page_size: int = 100,
+                   chunk_size: int = 1000) -> int:
+    """
+    Streams the orders of the client to the path in chunks of chunk_size, saving a checkpoint after every chunk and
+    resuming from it if there is one.
+
+    :param client: The PrestaShopOrderClient of the shop.
+    :return: The amount of exported orders, including the ones exported before resuming.
+    :raises ValueError: If the format or compression is not supported or differs from the interrupted export, or the
+        file of the interrupted export is missing or shorter than its checkpoint.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid export format! Must be one of {', '.join(EXPORT_FORMATS)}")
+    if format != "parquet" and compression not in (None, "gzip"):
+        raise ValueError(f"Invalid compression {compression}! {format} exports support gzip only")
+    checkpoint = _Checkpoint(path)
+    state = checkpoint.load()
+    if state is not None and (state["format"], state["compression"]) != (format, compression):
+        raise ValueError(f"{path} is an interrupted {state['format']} export with compression {state['compression']}!"
+                         f" Finish it with the same format or remove {checkpoint.path}")
+    if state is not None and not _WRITERS[format].can_resume(path, state["position"]):
+        raise ValueError(f"{path} is missing or shorter than its interrupted export! Start over by removing "
+                         f"{checkpoint.path}")
+    if state is None:
+        state = {"format": format, "compression": compression, "last_id": 0, "orders": 0, "position": 0}
+    writer = _WRITERS[format](path, compression, state["position"])
+    try:
+        chunk = []
+        # Orders are read by id from the last exported one on, so orders deleted meanwhile don't shift them
+        for order in client.iter_orders(page_size, after_id=state["last_id"]):
+            chunk.append(order)
+            if len(chunk) == chunk_size:
+                state = _write_chunk(writer, checkpoint, state, chunk)
+                chunk = []
+        if chunk:
+            state = _write_chunk(writer, checkpoint, state, chunk)
+    finally:
+        writer.close()
+    checkpoint.remove()
+    return state["orders"]
+
+
+def _write_chunk(writer, checkpoint: _Checkpoint, state: dict, chunk: list[Order]) -> dict:
+    """
+    Writes the chunk and saves the checkpoint after it.
+
+    :return: The new state of the export.
+    """
+    writer.write(chunk)
+    state = state | {"last_id": chunk[-1].id, "orders": state["orders"] + len(chunk), "position": writer.position}
+    checkpoint.save(state)
+    return state
@@ -0,0 +1,135 @@
+"""
+prestashop_orders_client.extractor
+~~~~~~~~~~~~~~
+This module provides a streaming XML extractor which reads only the listed fields of PrestaShop resources and skips
+everything else, like the order rows of an order unless associations is one of the fields. It is used instead of
+xmltodict by the package internals.
+Made not to be used by external users.
+"""
+from xml.parsers import expat
+
+
+class _ResourceExtractor:
+    """
+    Extracts the given fields of every resource element in a PrestaShop response, either the single resource of
+    /api/orders/1 or every resource of a list like /api/orders?display=full. Values have the same shape xmltodict
+    gives them, so the extracted dictionaries can be used in place of the xmltodict ones:
+
+    - plain fields become strings or None if empty
+    - fields with attributes, like links, become {'@xlink:href': ..., '#text': ...}
+    - translated fields become {'language': {'@id': ..., '@xlink:href': ..., '#text': ...}}, a list of such
+      dictionaries for more than one language
+    - the associations field keeps its nested elements, e.g. {'order_rows': {'@nodeType': ..., 'order_row': [...]}}
+    """
+
+    def __init__(self, xml_root: str, fields):
+        """
+        Initializes an extractor for one resource type
+
+        :param xml_root: The root element of a single resource, e.g. order
+        :param fields: The fields to extract, all other elements are skipped.
+        """
+        self.xml_root = xml_root
+        self.fields = frozenset(fields)
+
+    def extract(self, content: bytes) -> list[dict]:
+        """
+        Extracts the resources from the response body
+
+        :param content: The XML response body.
+        :return: The resources as dictionaries, in document order.
+        """
+        self.__resources, self.__resource, self.__depth = [], None, 0
+        self.__resource_depth, self.__field, self.__attributes, self.__languages = 0, None, None, None
+        self.__language_attributes, self.__text, self.__nested = None, [], None
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self.__start
+        parser.EndElementHandler = self.__end
+        parser.CharacterDataHandler = self.__characters
+        parser.Parse(content, True)
+        return self.__resources
+
+    def __start(self, name: str, attributes: dict):
+        self.__depth += 1
+        if self.__resource is None:
+            # A single resource is a child of <prestashop>, a resource of a list a child of e.g. <orders>
+            if name == self.xml_root and self.__depth in (2, 3):
+                self.__resource, self.__resource_depth = dict(), self.__depth
+        elif self.__nested is not None:
+            self.__nested.append((attributes, dict(), []))
+        elif self.__depth == self.__resource_depth + 1:
+            if name == "associations" and name in self.fields:
+                # Stack of the open nested elements, each with its attributes, children and text
+                self.__nested = [(attributes, dict(), [])]
+            elif name in self.fields:
+                self.__field, self.__attributes, self.__languages, self.__text = name, attributes, [], []
+        elif self.__depth == self.__resource_depth + 2 and self.__field is not None and name == "language":
+            self.__language_attributes, self.__text = attributes, []
+
+    def __end(self, name: str):
+        if self.__nested is not None:
+            value = self.__nested_value(*self.__nested.pop())
+            if self.__nested:
+                children = self.__nested[-1][1]
+                if name not in children:
+                    children[name] = value
+                elif isinstance(children[name], list):
+                    children[name].append(value)
+                else:
+                    children[name] = [children[name], value]
+            else:
+                self.__resource[name] = value
+                self.__nested = None
+        elif self.__resource is not None:
+            if self.__depth == self.__resource_depth + 2 and self.__language_attributes is not None:
+                self.__languages.append(self.__value(self.__language_attributes))
+                self.__language_attributes = None
+            elif self.__depth == self.__resource_depth + 1 and self.__field == name:
+                self.__resource[name] = {"language": self.__languages[0] if len(self.__languages) == 1 else
+                                         self.__languages} if self.__languages else self.__value(self.__attributes)
+                self.__field = None
+            elif self.__depth == self.__resource_depth:
+                self.__resources.append(self.__resource)
+                self.__resource = None
+        self.__depth -= 1
+
+    def __characters(self, data: str):
+        if self.__nested is not None:
+            self.__nested[-1][2].append(data)
+        elif self.__field is not None:
+            self.__text.append(data)
+
+    def __value(self, attributes: dict):
+        text = "".join(self.__text).strip() or None
+        self.__text = []
+        if not attributes:
+            return text
+        value = {"@" + attribute: attribute_value for attribute, attribute_value in attributes.items()}
+        if text is not None:
+            value["#text"] = text
+        return value
+
+    @staticmethod
+    def __nested_value(attributes: dict, children: dict, text: list):
+        if children:
+            return {"@" + attribute: attribute_value for attribute, attribute_value in attributes.items()} | children
+        text = "".join(text).strip() or None
+        if not attributes:
+            return text
+        value = {"@" + attribute: attribute_value for attribute, attribute_value in attributes.items()}
+        if text is not None:
+            value["#text"] = text
+        return value
+
+
+def _extract_resources(content: bytes, xml_root: str, fields) -> list[dict]:
+    """
+    Extracts only the given fields of every resource in a PrestaShop response.
+
+    :param content: The XML response body.
+    :param xml_root: The root element of a single resource, e.g. order
+    :param fields: The fields to extract.
+    :return: The resources as dictionaries.
+    """
+    return _ResourceExtractor(xml_root, fields).extract(content)
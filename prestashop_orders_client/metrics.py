@@ -0,0 +1,211 @@
+"""
+prestashop_orders_client.metrics
+~~~~~~~~~~~~~~
+This module provides ClientMetrics, which records where the clients spend their time: requests per resource list with
+their latency, statuses and downloaded bytes, parsing of the responses, building of the orders and cache hits.
+Hooks receive every recorded event, e.g. to feed it into a monitoring system, and an OpenTelemetry tracer turns the
+events into spans.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple, Counter, defaultdict
+from typing import Callable
+
+"""
+Upper bounds in seconds of the buckets of the latency histograms, the last bucket holds all slower requests.
+"""
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+"""
+An event passed to the hooks of ClientMetrics. kind is request, parse, build or cache_hit and resource the resource
+list, e.g. customers. seconds is the duration, size the downloaded bytes of a request or the amount of parsed
+resources, built orders or cache hits. status_code is None for connection errors and all events besides requests.
+"""
+MetricEvent = namedtuple("MetricEvent", "kind resource seconds size status_code")
+
+
+class ResourceMetrics:
+    """
+    The counters of one resource list.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        # Requests answered from the ResponseCache without a request to the shop
+        self.cached_responses = 0
+        self.errors = 0
+        self.statuses = Counter()
+        self.bytes = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.parsed = 0
+        self.parse_time = 0.0
+        self.cache_hits = 0
+
+    def as_dict(self) -> dict:
+        """
+        Returns the counters as a dictionary, the latency histogram maps the upper bound of every bucket to its
+        amount of requests.
+        """
+        return {"requests": self.requests, "cached_responses": self.cached_responses, "errors": self.errors,
+                "statuses": dict(self.statuses), "bytes": self.bytes,
+                "latency": dict(zip(LATENCY_BUCKETS + (float("inf"),), self.latency)),
+                "latency_sum": self.latency_sum, "parsed": self.parsed, "parse_time": self.parse_time,
+                "cache_hits": self.cache_hits}
+
+
+class ClientMetrics:
+    """
+    Thread safe metrics of a client, counted per resource list. Every client has one in its metrics attribute, one
+    instance can be shared between clients to sum them up.
+
+        client.get_all_orders_bulk()
+        client.metrics["customers"].requests, client.metrics["customers"].bytes
+        client.metrics.snapshot()
+    """
+
+    def __init__(self, hooks: list[Callable[[MetricEvent], None]] = None, tracer=None):
+        """
+        Initializes empty metrics.
+
+        :param hooks: Functions called with every MetricEvent, in the thread or task which recorded it. Exceptions
+            raised by a hook are not caught.
+        :param tracer: Optional OpenTelemetry tracer, e.g. opentelemetry.trace.get_tracer(__name__). A span is
+            recorded for every request, parse and build.
+        """
+        self.hooks = list(hooks or [])
+        self.tracer = tracer
+        self.built = 0
+        self.build_time = 0.0
+        self.__resources = defaultdict(ResourceMetrics)
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, resource: str) -> ResourceMetrics:
+        with self.__lock:
+            return self.__resources[resource]
+
+    def __iter__(self):
+        with self.__lock:
+            return iter(list(self.__resources))
+
+    def add_hook(self, hook: Callable[[MetricEvent], None]):
+        """
+        Adds a function called with every MetricEvent.
+        """
+        self.hooks.append(hook)
+
+    def record_request(self, resource: str, status_code: int | None, seconds: float, size: int,
+                       cached: bool = False):
+        """
+        Records a request, including its retries.
+
+        :param resource: The resource list, e.g. customers, or an empty string for the API root.
+        :param status_code: The status code of the response or None if the request failed.
+        :param seconds: The time until the whole response was read.
+        :param size: The size of the body in bytes.
+        :param cached: Whether the response was taken from the ResponseCache without a request to the shop.
+        """
+        with self.__lock:
+            metrics = self.__resources[resource]
+            if cached:
+                metrics.cached_responses += 1
+            else:
+                metrics.requests += 1
+                metrics.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+                metrics.latency_sum += seconds
+                metrics.bytes += size
+            metrics.statuses[status_code] += 1
+            if status_code is None or status_code >= 400:
+                metrics.errors += 1
+        self.__emit(MetricEvent("request", resource, seconds, size, status_code))
+
+    def record_parse(self, resource: str, seconds: float, amount: int = 1):
+        """
+        Records the decoding of a response into dictionaries.
+
+        :param resource: The resource list, e.g. customers
+        :param seconds: The time the decoding took.
+        :param amount: The amount of decoded resources.
+        """
+        with self.__lock:
+            metrics = self.__resources[resource]
+            metrics.parsed += amount
+            metrics.parse_time += seconds
+        self.__emit(MetricEvent("parse", resource, seconds, amount, None))
+
+    def record_build(self, seconds: float, amount: int = 1):
+        """
+        Records the building of Order objects from the decoded resources.
+
+        :param seconds: The time the building took.
+        :param amount: The amount of built orders.
+        """
+        with self.__lock:
+            self.built += amount
+            self.build_time += seconds
+        self.__emit(MetricEvent("build", "orders", seconds, amount, None))
+
+    def record_cache_hit(self, resource: str, amount: int = 1):
+        """
+        Records resources taken from the ResourceCache.
+
+        :param resource: The resource list, e.g. customers
+        :param amount: The amount of resources taken from the cache.
+        """
+        if not amount:
+            return
+        with self.__lock:
+            self.__resources[resource].cache_hits += amount
+        self.__emit(MetricEvent("cache_hit", resource, 0.0, amount, None))
+
+    def snapshot(self) -> dict:
+        """
+        Returns all counters as a dictionary, keyed by resource list, plus the built orders under "build".
+        """
+        with self.__lock:
+            snapshot = {resource: metrics.as_dict() for resource, metrics in self.__resources.items()}
+            snapshot["build"] = {"built": self.built, "build_time": self.build_time}
+        return snapshot
+
+    def reset(self):
+        """
+        Sets all counters back to zero.
+        """
+        with self.__lock:
+            self.__resources.clear()
+            self.built = 0
+            self.build_time = 0.0
+
+    def __emit(self, event: MetricEvent):
+        """
+        Passes the event to the hooks and records it as a span which ended now.
+        """
+        if self.tracer is not None and event.kind != "cache_hit":
+            end = time.time_ns()
+            attributes = {"prestashop.resource": event.resource, "prestashop.size": event.size}
+            if event.status_code is not None:
+                attributes["http.response.status_code"] = event.status_code
+            span = self.tracer.start_span(f"prestashop.{event.kind}", start_time=end - int(event.seconds * 1e9),
+                                          attributes=attributes)
+            span.end(end_time=end)
+        for hook in self.hooks:
+            hook(event)
+
+
+class _Stopwatch:
+    """
+    Measures the time of a block with time.perf_counter.
+
+        with _Stopwatch() as stopwatch:
+            ...
+        stopwatch.seconds
+    """
+
+    def __enter__(self) -> "_Stopwatch":
+        self.seconds = 0.0
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.seconds = time.perf_counter() - self.__start
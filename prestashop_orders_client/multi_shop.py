@@ -0,0 +1,229 @@
+"""
+prestashop_orders_client.multi_shop
+~~~~~~~~~~~~~~
+This module provides MultiShopOrderClient, which reads the orders of many shops at once. Every shop gets its own
+PrestaShopOrderClient and results are streamed tagged with their shop as soon as they arrive, so a slow or broken shop
+doesn't hold up the others.
+"""
+import queue
+import threading
+from collections import namedtuple, deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from urllib.parse import urlsplit
+
+from .client import PrestaShopOrderClient
+from .transport import RateLimiter
+from .utils import Order, SyncWatermark, _build_api_url
+
+"""
+A page of orders of a shop. If reading the shop failed, error holds the exception, orders is empty and no more pages
+of the shop follow.
+"""
+ShopOrders = namedtuple("ShopOrders", "shop orders error")
+
+"""
+The orders of a shop added or changed since its watermark and the watermark to pass next time, see
+PrestaShopOrderClient.get_orders_since. If reading the shop failed, error holds the exception, orders is empty and the
+watermark is the one passed in.
+"""
+ShopSync = namedtuple("ShopSync", "shop orders watermark error")
+
+"""
+Put into the results queue by a shop when it is done.
+"""
+_DONE = object()
+
+
+class MultiShopOrderClient:
+    """
+    A client for reading the orders of many shops concurrently. Shops are identified by their shop link.
+
+    Shops on the same host share a limit of shops read at the same time and optionally a RateLimiter, so a server
+    hosting many shops is not overloaded. Every shop has its own connection pool. Creating the client doesn't make
+    any request, there is no connection check and no counting of the orders.
+
+        client = MultiShopOrderClient([("shop-a.com", "key_a"), ("shop-b.com", "key_b")])
+        for shop, orders, error in client.iter_orders():
+            ...
+    """
+
+    def __init__(self, shops: Iterable[tuple[str, str]], max_shops: int = 8, max_shops_per_host: int = 2,
+                 rate_per_host: float = None, burst_per_host: int = 1, **client_options):
+        """
+        Initializes a client for every shop.
+
+        :param shops: Pairs of shop link and API key.
+        :param max_shops: The maximum amount of shops read at the same time.
+        :param max_shops_per_host: The maximum amount of shops on the same host read at the same time.
+        :param rate_per_host: Optional maximum amount of requests per second sent to the same host.
+        :param burst_per_host: The amount of requests to the same host which may be sent at once.
+        :param client_options: Passed to every PrestaShopOrderClient, e.g. output_format or retry_policy.
+        """
+        self.max_shops = max_shops
+        self.max_shops_per_host = max_shops_per_host
+        self.clients = dict()
+        self.__hosts = dict()
+        rate_limiters = dict()
+        for shop_link, api_key in shops:
+            host = urlsplit(_build_api_url(shop_link)).hostname
+            if rate_per_host is not None and host not in rate_limiters:
+                rate_limiters[host] = RateLimiter(rate_per_host, burst_per_host)
+            self.__hosts[shop_link] = host
+            self.clients[shop_link] = PrestaShopOrderClient(shop_link, api_key, check_connection=False,
+                                                            rate_limiter=rate_limiters.get(host), **client_options)
+
+    def __enter__(self) -> "MultiShopOrderClient":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes the connections of all shops.
+        """
+        for client in self.clients.values():
+            client.close()
+
+    def iter_orders(self, page_size: int = 100) -> Iterator[ShopOrders]:
+        """
+        Streams the orders of all shops in pages, in the order they arrive. The pages of a shop are sorted by id.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+
+        Yields:
+            ShopOrders with a page of orders of a shop or the error which stopped reading the shop.
+        """
+
+        def read(shop: str, put):
+            page = []
+            for order in self.clients[shop].iter_orders(page_size):
+                page.append(order)
+                if len(page) == page_size:
+                    if not put(ShopOrders(shop, page, None)):
+                        return
+                    page = []
+            if page:
+                put(ShopOrders(shop, page, None))
+
+        return self.__fan_out(read, lambda shop, error: ShopOrders(shop, [], error))
+
+    def get_all_orders(self, page_size: int = 100) -> tuple[dict[str, list[Order]], dict[str, Exception]]:
+        """
+        Retrieve all orders of all shops.
+
+        Args:
+            page_size (int): The amount of orders requested at once.
+
+        Returns:
+            The orders per shop and the error per shop which could not be read completely. The orders of a failed shop
+            are the ones read before the error.
+        """
+        orders, errors = {shop: [] for shop in self.clients}, dict()
+        for shop, page, error in self.iter_orders(page_size):
+            if error is None:
+                orders[shop].extend(page)
+            else:
+                errors[shop] = error
+        return orders, errors
+
+    def get_orders_since(self, watermarks: dict[str, SyncWatermark] = None,
+                         page_size: int = 100) -> Iterator[ShopSync]:
+        """
+        Streams the orders added or changed since the watermark of every shop, see
+        PrestaShopOrderClient.get_orders_since. Shops are yielded as soon as they are read.
+
+        Args:
+            watermarks (dict[str, SyncWatermark]): The watermark per shop link, shops without one are read from the
+                start.
+            page_size (int): The amount of orders requested at once.
+
+        Yields:
+            ShopSync with the orders and the next watermark of a shop or the error which stopped reading it.
+        """
+        watermarks = watermarks or dict()
+
+        def read(shop: str, put):
+            watermark = watermarks.get(shop, SyncWatermark(None, 0))
+            orders, watermark = self.clients[shop].get_orders_since(*watermark, page_size=page_size)
+            put(ShopSync(shop, orders, watermark, None))
+
+        def failed(shop: str, error: Exception) -> ShopSync:
+            return ShopSync(shop, [], watermarks.get(shop, SyncWatermark(None, 0)), error)
+
+        return self.__fan_out(read, failed)
+
+    def __fan_out(self, read, failed) -> Iterator:
+        """
+        Reads all shops in a thread pool and yields their results as they arrive. Every host has a queue of its shops
+        and a shop is only handed to the pool when its host has a free slot, so shops waiting for a busy host don't
+        take up threads the shops of other hosts could use. Hosts take turns for free threads. The results queue
+        holds twice as many results as shops are read at once, a slow consumer holds the shops back instead of
+        letting them buffer all their orders.
+        :param read: Function reading a shop, called with the shop link and a function putting a result into the
+            queue. The put returns False once the consumer stopped iterating, the shop should then stop reading.
+        :param failed: Function building the result of a shop from the exception which stopped reading it.
+        """
+        results, stop, lock = queue.Queue(self.max_shops * 2), threading.Event(), threading.Lock()
+        waiting, running = dict(), Counter()
+        for shop, host in self.__hosts.items():
+            waiting.setdefault(host, deque()).append(shop)
+        hosts = deque(waiting)
+        executor = ThreadPoolExecutor(self.max_shops)
+
+        def schedule():
+            # Called with the lock held, starts one shop per host in turn until all threads or hosts are busy
+            started = True
+            while started and hosts:
+                started = False
+                for _ in range(len(hosts)):
+                    if sum(running.values()) >= self.max_shops:
+                        return
+                    host = hosts.popleft()
+                    if running[host] < self.max_shops_per_host:
+                        running[host] += 1
+                        executor.submit(run, host, waiting[host].popleft())
+                        started = True
+                    if waiting[host]:
+                        hosts.append(host)
+
+        def put(result) -> bool:
+            # Waits for room in the queue, but gives up once the consumer stopped so no shop waits forever
+            while not stop.is_set():
+                try:
+                    results.put(result, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def run(host: str, shop: str):
+            try:
+                if not stop.is_set():
+                    read(shop, put)
+            except Exception as e:
+                # Any error only stops this shop, the others go on
+                put(failed(shop, e))
+            finally:
+                with lock:
+                    running[host] -= 1
+                    if not stop.is_set():
+                        schedule()
+                put(_DONE)
+
+        try:
+            with lock:
+                schedule()
+            pending = len(self.clients)
+            while pending:
+                result = results.get()
+                if result is _DONE:
+                    pending -= 1
+                else:
+                    yield result
+        finally:
+            with lock:
+                stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
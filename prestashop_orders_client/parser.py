@@ -4,9 +4,13 @@ prestashop_orders_client.parser
 This module provides a class that parses order data from PrestaShop API. It is used by PrestaShopOrderClient class.
 Made not to be used by external users.
 """
+from concurrent.futures import Executor
+
 import requests
 
-from .utils import Order, _get_resource_as_dict, ORDER_COMPONENTS
+from .metrics import _Stopwatch
+from .utils import Order, OrderRow, Product, _get_resource_as_dict, _get_resources_as_list, _id_filter, _display, \
+    ORDER_COMPONENTS, RESOURCE_LISTS
 
 
 class _OrderParser:
@@ -14,13 +18,27 @@ class _OrderParser:
     A class used to parse order data from PrestaShop API and return it as an Order object.
     """
 
-    def __init__(self, session: requests.Session):
+    def __init__(self, session: requests.Session, executor: Executor = None, cache=None, fields: dict = None,
+                 extra_fields: dict = None, metrics=None):
         """
         Initializes an instance of the OrderParser class
 
         :param session: A requests.Session object used to make API requests.
+        :param executor: Optional executor used to fetch independent resources of an order in parallel.
+        :param cache: Optional ResourceCache holding resources shared between orders.
+        :param fields: Optional fields to request and extract per resource, e.g. RESOURCE_FIELDS. Full resources are
+            requested and parsed completely with xmltodict if not set. With fields of product the products of the
+            order rows are resolved as well.
+        :param extra_fields: Optional fields per resource whose values are put into Order.extra, they must be part
+            of fields.
+        :param metrics: Optional ClientMetrics recording the parse and build times and cache hits.
         """
         self.session = session
+        self.executor = executor
+        self.cache = cache
+        self.fields = fields or {}
+        self.extra_fields = extra_fields
+        self.metrics = metrics
 
     def parse_order(self, order_link: list) -> Order:
         """
@@ -29,11 +47,161 @@ class _OrderParser:
         :param order_link: A link to the order resource.
         :return: An Order object.
         """
-        ready_order, order_data = dict(), self.extract_order_data(order_link)
+        return self.build_orders([self.extract_order_data(order_link)])[0]
+
+    def parse_orders(self, orders_data: list[dict], chunk_size: int = 100) -> list[Order]:
+        """
+        Parses many orders at once. The orders must be fetched with the display of the order fields, the resources
+        they reference are fetched with one filter[id] request per resource type and chunk instead of one request per
+        order.
+
+        :param orders_data: Orders as dictionaries, as returned by the orders list with the display of the order
+            fields.
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A list of Order objects in the same order as orders_data.
+        """
+        return self.build_orders(self.extract_orders_data(orders_data, chunk_size))
+
+    def build_orders(self, orders_data: list[dict]) -> list[Order]:
+        """
+        Builds the orders with build_order, recording the time it took in the metrics.
+
+        :param orders_data: A dictionary with the data of every resource in ORDER_COMPONENTS per order.
+        :return: A list of Order objects in the same order as orders_data.
+        """
+        with _Stopwatch() as stopwatch:
+            orders = [self.build_order(order_data, self.extra_fields) for order_data in orders_data]
+        if self.metrics is not None:
+            self.metrics.record_build(stopwatch.seconds, len(orders))
+        return orders
+
+    def extract_orders_data(self, orders_data: list[dict], chunk_size: int = 100) -> list[dict]:
+        """
+        Extracts all the necessary data for many orders with the batched requests of parse_orders.
+
+        :param orders_data: Orders as dictionaries, as returned by the orders list with the display of the order
+            fields.
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A dictionary with the data of every resource in ORDER_COMPONENTS per order, in the same order as
+            orders_data.
+        """
+        order_states = self.extract_linked_data(orders_data, "current_state", "order_state", chunk_size)
+        customers = self.extract_linked_data(orders_data, "id_customer", "customer", chunk_size)
+        addresses = self.extract_linked_data(orders_data, "id_address_delivery", "address", chunk_size)
+        countries = self.extract_linked_data(addresses.values(), "id_country", "country", chunk_size)
+        states = self.extract_linked_data(addresses.values(), "id_state", "state", chunk_size)
+        products = self.extract_products(orders_data, chunk_size)
+        return self.join_orders_data(orders_data, order_states, customers, addresses, countries, states, products)
+
+    def extract_products(self, orders_data: list[dict], chunk_size: int = 100) -> dict | None:
+        """
+        Fetches the products of the order rows of the orders with batched filter[id] requests, if the parser has
+        fields of product.
+
+        :param orders_data: Orders as dictionaries, including their associations.
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A dictionary mapping the ids to the products, None if products are not resolved.
+        """
+        if "product" not in self.fields:
+            return None
+        return self.extract_linked_data([row for order_data in orders_data for row in self.order_rows(order_data)],
+                                        "product_id", "product", chunk_size)
+
+    @classmethod
+    def join_orders_data(cls, orders_data: list[dict], order_states: dict, customers: dict, addresses: dict,
+                         countries: dict, states: dict, products: dict = None) -> list[dict]:
+        """
+        Joins the orders with the resources they reference.
+
+        :param orders_data: Orders as dictionaries.
+        :param order_states: The referenced order states by id, as returned by extract_linked_data, the same for the
+            other resources.
+        :param products: Optional products of the order rows by id, every order gets them under products.
+        :return: A dictionary with the data of every resource in ORDER_COMPONENTS per order, in the same order as
+            orders_data.
+        """
+        extracted_data = []
+        for order_data in orders_data:
+            address_data = addresses.get(cls.linked_id(order_data, "id_address_delivery"), {})
+            extracted_data.append({
+                "order": order_data,
+                "order_state": order_states.get(cls.linked_id(order_data, "current_state"), {}),
+                "customer": customers.get(cls.linked_id(order_data, "id_customer"), {}),
+                "address": address_data,
+                "country": countries.get(cls.linked_id(address_data, "id_country"), {}),
+                "state": states.get(cls.linked_id(address_data, "id_state"), {}),
+            })
+            if products is not None:
+                extracted_data[-1]["products"] = products
+        return extracted_data
+
+    @classmethod
+    def build_order(cls, order_data: dict, extra_fields: dict = None) -> Order:
+        """
+        Builds an Order object from the data of all its components
+
+        :param order_data: A dictionary with the data of every resource in ORDER_COMPONENTS and optionally the
+            products of its order rows by id under products.
+        :param extra_fields: Optional fields per resource whose values are put into Order.extra.
+        :return: An Order object, with its order rows if the order was read with its associations.
+        """
+        ready_order = dict()
         for resource, data in order_data.items():
-            ready_order |= self.parse_resource(resource, data)
+            ready_order |= cls.parse_resource(resource, data)
+        if "associations" in order_data.get("order", {}):
+            ready_order["rows"] = [cls.parse_row(row, order_data.get("products"))
+                                   for row in cls.order_rows(order_data["order"])]
+        if extra_fields:
+            ready_order["extra"] = {resource: {field: cls.plain_value(order_data.get(resource, {}).get(field))
+                                               for field in fields} for resource, fields in extra_fields.items()}
         return Order(**ready_order)
 
+    @staticmethod
+    def plain_value(value):
+        """
+        Returns the text of a field value: the id of a linked resource, the text of a translated value in the first
+        language or the value itself.
+        """
+        if isinstance(value, dict) and "language" in value:
+            language = value["language"]
+            return (language[0] if isinstance(language, list) else language).get("#text")
+        if isinstance(value, dict) and "#text" in value:
+            return value["#text"]
+        return value
+
+    @staticmethod
+    def order_rows(order_data: dict) -> list[dict]:
+        """
+        Returns the order rows of the associations of an order, an empty list if it was read without them.
+        """
+        rows = (order_data.get("associations") or {}).get("order_rows")
+        # In XML the rows are wrapped in <order_rows nodeType="order_row">, in JSON they are a list
+        if isinstance(rows, dict):
+            rows = rows.get("order_row")
+        if rows is None:
+            return []
+        return rows if isinstance(rows, list) else [rows]
+
+    @classmethod
+    def parse_row(cls, row: dict, products: dict = None) -> OrderRow:
+        """
+        Builds an OrderRow from an order row of the associations of an order
+
+        :param row: The order row.
+        :param products: Optional products by id, the row gets its product from them.
+        :return: An OrderRow object.
+        """
+        product_id = cls.plain_value(row.get("product_id"))
+        product = None if products is None else products.get(product_id)
+        return OrderRow(id=int(row.get("id")), product_id=int(product_id or 0),
+                        product_attribute_id=int(cls.plain_value(row.get("product_attribute_id")) or 0),
+                        quantity=int(row.get("product_quantity") or 0), name=row.get("product_name"),
+                        reference=row.get("product_reference"), ean13=row.get("product_ean13"),
+                        unit_price_tax_incl=float(row.get("unit_price_tax_incl") or 0),
+                        product=None if product is None else Product(
+                            id=int(product.get("id")), reference=product.get("reference"),
+                            ean13=product.get("ean13"), weight=float(product.get("weight") or 0)))
+
     def extract_order_data(self, order_link: str) -> dict:
         """
         Extracts all the necessary data for the order from the API
@@ -41,25 +209,91 @@ class _OrderParser:
         :param order_link: A link to the order resource.
         :return: A dictionary containing all the necessary data for the order.
         """
-        order_data = _get_resource_as_dict(self.session, order_link, "order")
-        order_state_data = _get_resource_as_dict(self.session, order_data['current_state']['@xlink:href'],
-                                                "order_state")
-        customer_data = _get_resource_as_dict(self.session, order_data['id_customer']['@xlink:href'], "customer")
-        address_data = _get_resource_as_dict(self.session, order_data['id_address_delivery']['@xlink:href'],
-                                            "address")
-        country_data = _get_resource_as_dict(self.session, address_data['id_country']['@xlink:href'], "country")
-        try:
-            state_data = _get_resource_as_dict(self.session, address_data['id_state']['@xlink:href'], "state")
-        # If state is not set(there will be '0' in state field
-        # ->
-        # accessing it like a dict will produce TypeError),
-        # state_data will be empty dict
-        except TypeError:
-            state_data = {}
-        return {resource: data for resource, data in zip(ORDER_COMPONENTS,
-                                                         [order_data, order_state_data, customer_data, address_data,
-                                                          country_data,
-                                                          state_data])}
+        order_data = _get_resource_as_dict(self.session, order_link, "order", cache=self.cache,
+                                           fields=self.fields.get("order"), metrics=self.metrics)
+        order_state_data, customer_data, address_data = self.fetch_resources(
+            (order_data['current_state']['@xlink:href'], "order_state"),
+            (order_data['id_customer']['@xlink:href'], "customer"),
+            (order_data['id_address_delivery']['@xlink:href'], "address"))
+        linked_resources = [(address_data['id_country']['@xlink:href'], "country")]
+        # If state is not set there will be '0' in the state field instead of a link, state_data will be empty dict
+        if isinstance(address_data['id_state'], dict):
+            linked_resources.append((address_data['id_state']['@xlink:href'], "state"))
+        country_data, state_data, *_ = self.fetch_resources(*linked_resources) + [{}]
+        extracted_data = {resource: data for resource, data in zip(ORDER_COMPONENTS,
+                                                                   [order_data, order_state_data, customer_data,
+                                                                    address_data, country_data, state_data])}
+        # All products of the order are read with one request
+        products = self.extract_products([order_data])
+        if products is not None:
+            extracted_data["products"] = products
+        return extracted_data
+
+    def fetch_resources(self, *resources: tuple[str, str]) -> list[dict]:
+        """
+        Fetches the given resources, in parallel if the parser has an executor
+
+        :param resources: Pairs of resource link and xml root.
+        :return: The resources as dictionaries in the same order as they were passed.
+        """
+        if self.executor is None:
+            return [_get_resource_as_dict(self.session, link, xml_root, cache=self.cache,
+                                          fields=self.fields.get(xml_root), metrics=self.metrics)
+                    for link, xml_root in resources]
+        futures = [self.executor.submit(_get_resource_as_dict, self.session, link, xml_root, cache=self.cache,
+                                        fields=self.fields.get(xml_root), metrics=self.metrics)
+                   for link, xml_root in resources]
+        return [future.result() for future in futures]
+
+    def extract_linked_data(self, resources_data, field: str, xml_root: str, chunk_size: int) -> dict:
+        """
+        Fetches all resources referenced in the given field of the resources, each distinct id only once and
+        in chunks of chunk_size ids per request. Resources found in the cache are not fetched.
+
+        :param resources_data: Resources as dictionaries containing the link field.
+        :param field: The field holding the link, e.g. id_customer
+        :param xml_root: The root element of the linked resource, e.g. customer
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        :return: A dictionary mapping the ids to the linked resources.
+        """
+        links = self.linked_links(resources_data, field)
+        if not links:
+            return dict()
+        list_link = next(iter(links.values())).rsplit("/", 1)[0]
+        linked_data = dict()
+        if self.cache is not None:
+            linked_data = {resource_id: data for resource_id in links
+                           if (data := self.cache.get(xml_root, resource_id)) is not None}
+            if self.metrics is not None:
+                self.metrics.record_cache_hit(RESOURCE_LISTS[xml_root], len(linked_data))
+        ids = sorted((resource_id for resource_id in links if resource_id not in linked_data), key=int)
+        for start in range(0, len(ids), chunk_size):
+            params = {"display": _display(self.fields.get(xml_root)),
+                      "filter[id]": _id_filter(ids[start:start + chunk_size])}
+            for data in _get_resources_as_list(self.session, list_link, xml_root, params,
+                                               fields=self.fields.get(xml_root), metrics=self.metrics):
+                linked_data[data["id"]] = data
+                if self.cache is not None:
+                    self.cache.set(xml_root, data["id"], data)
+        return linked_data
+
+    @staticmethod
+    def linked_links(resources_data, field: str) -> dict:
+        """
+        Returns the distinct ids linked in the given field of the resources, mapped to their links. Resources without
+        a link in the field are skipped.
+        """
+        return {data[field]['#text']: data[field]['@xlink:href'] for data in resources_data
+                if isinstance(data.get(field), dict)}
+
+    @staticmethod
+    def linked_id(data: dict, field: str) -> str | None:
+        """
+        Returns the id of the resource linked in the given field or None if the field does not hold a link
+        (for example id_state is '0' when the address has no state).
+        """
+        link = data.get(field)
+        return link.get('#text') if isinstance(link, dict) else None
 
     @staticmethod
     def parse_resource(resource: str, data: dict) -> dict:
@@ -0,0 +1,217 @@
+"""
+prestashop_orders_client.pipeline
+~~~~~~~~~~~~~~
+This module provides the pipelined export engine of PrestaShopOrderClient.iter_orders_pipelined. I/O threads only
+download raw responses and a process pool decodes them and builds the Order objects, so large exports are not bound
+to a single core by the GIL. Made not to be used by external users.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Callable, Iterator
+
+import requests
+
+from .cache import REFERENCE_RESOURCES
+from .exceptions import PrestaShopConnectionError
+from .parser import _OrderParser
+from .utils import Order, _decode_resources, _check_response, _display, _id_filter, RESOURCE_LISTS
+
+"""
+Reference resources, fields and extra fields of the worker process, set once when the process starts.
+"""
+_worker_state = None
+
+
+def _init_worker(reference: dict, fields: dict, extra_fields: dict):
+    """
+    Initializes a worker process of the pipeline.
+    """
+    global _worker_state
+    _worker_state = reference, fields, extra_fields
+
+
+def _decode_orders(orders_content: bytes, link: str) -> tuple[list[dict], list[str], list[str], list[str], float]:
+    """
+    Decodes a page of orders and returns them with the ids of their customers, delivery addresses and, if products
+    are resolved, the products of their rows. Runs in a worker process.
+
+    :return: The orders as dictionaries, the linked ids and the seconds spent decoding.
+    """
+    fields = _worker_state[1]
+    start = time.perf_counter()
+    orders_data = _decode_resources(orders_content, "order", fields["order"], link)
+    rows = [row for order_data in orders_data for row in _OrderParser.order_rows(order_data)] \
+        if "product" in fields else []
+    return (orders_data, list(_OrderParser.linked_links(orders_data, "id_customer")),
+            list(_OrderParser.linked_links(orders_data, "id_address_delivery")),
+            list(_OrderParser.linked_links(rows, "product_id")), time.perf_counter() - start)
+
+
+def _build_orders(orders_data: list[dict], customers_contents: list[bytes], addresses_contents: list[bytes],
+                  products_contents: list[bytes], link: str) -> tuple[list[Order], float, float]:
+    """
+    Decodes the customers, addresses and products of a decoded page of orders and builds the orders. Runs in a
+    worker process.
+
+    :return: The orders and the seconds spent decoding and building them.
+    """
+    reference, fields, extra_fields = _worker_state
+    start = time.perf_counter()
+    customers = {data["id"]: data for content in customers_contents
+                 for data in _decode_resources(content, "customer", fields["customer"], link)}
+    addresses = {data["id"]: data for content in addresses_contents
+                 for data in _decode_resources(content, "address", fields["address"], link)}
+    products = {data["id"]: data for content in products_contents
+                for data in _decode_resources(content, "product", fields["product"], link)} \
+        if "product" in fields else None
+    decoded = time.perf_counter()
+    orders = [_OrderParser.build_order(order_data, extra_fields) for order_data in _OrderParser.join_orders_data(
+        orders_data, reference["order_state"], customers, addresses, reference["country"], reference["state"],
+        products)]
+    return orders, decoded - start, time.perf_counter() - decoded
+
+
+class _OrderPipeline:
+    """
+    Fetches pages of orders in I/O threads and decodes them in a process pool:
+
+    1. an I/O thread downloads a page of orders
+    2. a worker process decodes it and reads the ids of its customers and addresses
+    3. an I/O thread downloads them, and the products of the order rows if they are resolved, with batched
+       filter[id] requests
+    4. a worker process decodes them and builds the orders
+
+    Every stage hands the page to the next one when it is done, so I/O threads never wait for worker processes and
+    every response is decoded once. Order states, countries and states are read once when the pipeline starts and
+    handed to every worker process. Only a bounded amount of pages is in flight, so a slow consumer stops the
+    downloads instead of filling up memory.
+    """
+
+    def __init__(self, session: requests.Session, api_url: str, fields: dict, extra_fields: dict = None,
+                 metrics=None, chunk_size: int = 100):
+        """
+        Initializes the pipeline.
+
+        :param session: The session of the client.
+        :param api_url: The API url of the shop, e.g. https://myshop.com/api
+        :param fields: The fields to request and extract per resource.
+        :param extra_fields: Optional fields per resource whose values are put into Order.extra.
+        :param metrics: Optional ClientMetrics, the decoding and building time of the worker processes is recorded
+            in it.
+        :param chunk_size: Maximum amount of ids in one filter[id] request.
+        """
+        self.session = session
+        self.api_url = api_url
+        self.fields = fields
+        self.extra_fields = extra_fields
+        self.metrics = metrics
+        self.chunk_size = chunk_size
+
+    def run(self, order_ids, page_size: int = 100, io_workers: int = 8, processes: int = None,
+            max_pending: int = None) -> Iterator[Order]:
+        """
+        Yields the orders with the given ids, in the order of the ids.
+
+        :param order_ids: The sorted ids of the orders.
+        :param page_size: The amount of orders requested at once.
+        :param io_workers: The amount of pages downloaded at the same time.
+        :param processes: The amount of worker processes, one per core if not set.
+        :param max_pending: The maximum amount of pages in flight, twice the I/O workers if not set.
+        """
+        pages = [(order_ids[start], order_ids[min(start + page_size, len(order_ids)) - 1])
+                 for start in range(0, len(order_ids), page_size)]
+        if not pages:
+            return
+        max_pending = max_pending or io_workers * 2
+        reference = {resource: {data["id"]: data for data in self.__get_resources(resource, {})}
+                     for resource in REFERENCE_RESOURCES}
+        with ProcessPoolExecutor(processes or os.cpu_count(), initializer=_init_worker,
+                                 initargs=(reference, self.fields, self.extra_fields)) as process_pool, \
+                ThreadPoolExecutor(io_workers) as io_pool:
+            pending = deque()
+            try:
+                for first_id, last_id in pages:
+                    pending.append(self.__fetch_page(io_pool, process_pool, first_id, last_id))
+                    if len(pending) >= max_pending:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def __fetch_page(self, io_pool: ThreadPoolExecutor, process_pool: ProcessPoolExecutor, first_id: int,
+                     last_id: int) -> Future:
+        """
+        Starts reading a page of orders and everything it references.
+        :return: A future of the orders of the page, it fails with the error of any stage.
+        """
+        page = Future()
+        link = f"{self.api_url}/orders"
+
+        def then(future: Future, stage: Callable):
+            # Runs the next stage with the result of a finished one, unless the page is cancelled or failed
+            def next_stage(done: Future):
+                if page.done():
+                    return
+                try:
+                    stage(done.result())
+                except BaseException as e:
+                    if not page.done():
+                        page.set_exception(e)
+
+            future.add_done_callback(next_stage)
+
+        def decode_orders(orders_content: bytes):
+            then(process_pool.submit(_decode_orders, orders_content, link), get_linked)
+
+        def get_linked(decoded: tuple):
+            orders_data, customer_ids, address_ids, product_ids, orders_seconds = decoded
+            then(io_pool.submit(lambda: (self.__get_chunks("customer", customer_ids),
+                                         self.__get_chunks("address", address_ids),
+                                         self.__get_chunks("product", product_ids))),
+                 lambda contents: then(process_pool.submit(_build_orders, orders_data, *contents, link),
+                                       lambda built: finish(built, orders_seconds)))
+
+        def finish(built: tuple, orders_seconds: float):
+            orders, decode_seconds, build_seconds = built
+            if self.metrics is not None:
+                self.metrics.record_parse("orders", orders_seconds + decode_seconds, len(orders))
+                self.metrics.record_build(build_seconds, len(orders))
+            page.set_result(orders)
+
+        then(io_pool.submit(self.__get, "order", {"display": _display(self.fields["order"]),
+                                                  "filter[id]": f"[{first_id},{last_id}]", "sort": "[id_ASC]"}),
+             decode_orders)
+        return page
+
+    def __get_chunks(self, resource: str, ids: list[str]) -> list[bytes]:
+        """
+        Downloads the resources with the given ids in chunks of chunk_size.
+        """
+        ids = sorted(ids, key=int)
+        return [self.__get(resource, {"display": _display(self.fields[resource]),
+                                      "filter[id]": _id_filter(ids[start:start + self.chunk_size])})
+                for start in range(0, len(ids), self.chunk_size)]
+
+    def __get_resources(self, resource: str, params: dict) -> list[dict]:
+        """
+        Downloads and decodes all resources of a type in this process.
+        """
+        content = self.__get(resource, params | {"display": _display(self.fields[resource])})
+        return _decode_resources(content, resource, self.fields[resource], self.api_url)
+
+    def __get(self, resource: str, params: dict) -> bytes:
+        """
+        Downloads a resource list and returns its raw body.
+        :raises: ResourceForbiddenError, UnexpectedStatusCodeError, PrestaShopConnectionError
+        """
+        try:
+            response = self.session.get(f"{self.api_url}/{RESOURCE_LISTS[resource]}", params=params)
+        except requests.exceptions.RequestException as e:
+            raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+        if not _check_response(response.status_code, response.text, RESOURCE_LISTS[resource]):
+            return b"<prestashop></prestashop>"
+        return response.content
@@ -0,0 +1,206 @@
+"""
+prestashop_orders_client.response_cache
+~~~~~~~~~~~~~~
+This module provides a persistent cache of the responses of the shop, stored in an SQLite file. Responses are kept
+with their ETag and Last-Modified validators and served without a request while fresh, after that the shop is asked
+with If-None-Match and If-Modified-Since whether they changed. Pass it to PrestaShopOrderClient or
+AsyncPrestaShopOrderClient to reuse unchanged resources across runs.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Callable
+from urllib.parse import urlsplit
+
+"""
+Seconds a response of a resource list stays fresh by default, the responses of all other resources are revalidated
+with the shop every time they are used.
+"""
+DEFAULT_TTLS = {"order_states": 3600, "countries": 86400, "states": 86400}
+
+"""
+Headers stored with the body. The body is stored decoded, so Content-Encoding and Content-Length are not kept.
+"""
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+"""
+A response taken from the cache: its stored headers, body and the time it was stored or last revalidated at.
+"""
+CachedResponse = namedtuple("CachedResponse", "headers body stored_at")
+
+
+class ResponseCache:
+    """
+    A thread safe cache of successful GET responses keyed by their URL, stored in an SQLite database so that it
+    survives restarts. Responses are fresh for the TTL of their resource list, the least recently used ones are
+    evicted once the bodies take more than max_size bytes. The API root is never cached, so the connection check
+    always reaches the shop.
+
+    Counts the responses served from the cache without a request (hits), revalidated with a 304 (revalidated) and
+    fetched from the shop (misses).
+    """
+
+    def __init__(self, path: str, max_size: int = 256 * 1024 * 1024, ttls: dict = None, default_ttl: float = 0,
+                 clock: Callable[[], float] = time.time):
+        """
+        Opens the cache, creating the database file if it does not exist.
+
+        :param path: The path of the SQLite database, ":memory:" keeps the cache in memory only.
+        :param max_size: The maximum amount of bytes of all cached bodies.
+        :param ttls: Seconds a response stays fresh per resource list, e.g. {"countries": 86400}. DEFAULT_TTLS if not
+            set. None means forever.
+        :param default_ttl: Seconds responses of all other resource lists stay fresh, 0 revalidates them every time.
+        :param clock: Function returning the current time in seconds since the epoch, shared by all processes using
+            the database.
+        """
+        self.max_size = max_size
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, headers TEXT NOT NULL, "
+                                  "body BLOB NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)")
+        self.__connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self.__size = self.__connection.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM responses").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """
+        The amount of bytes of all cached bodies.
+        """
+        return self.__size
+
+    def cacheable(self, url: str) -> bool:
+        """
+        Tells whether responses of the URL are cached. Only resources and resource lists are, not the API root.
+
+        :param url: The full URL of the request, query included.
+        """
+        return bool(_resource_list(url))
+
+    def get(self, url: str) -> CachedResponse | None:
+        """
+        Returns the cached response of the URL, fresh or not, or None if there is none.
+
+        :param url: The full URL of the request, query included.
+        """
+        with self.__lock:
+            row = self.__connection.execute("SELECT headers, body, stored_at FROM responses WHERE url = ?",
+                                            (url,)).fetchone()
+            if row is None:
+                return None
+            self.__connection.execute("UPDATE responses SET used_at = ? WHERE url = ?", (self.__clock(), url))
+        return CachedResponse(json.loads(row[0]), row[1], row[2])
+
+    def fresh(self, url: str, cached: CachedResponse) -> bool:
+        """
+        Tells whether the cached response may be used without asking the shop, counting it as a hit if so.
+
+        :param url: The full URL of the request, query included.
+        :param cached: The cached response of the URL.
+        """
+        ttl = self.ttls.get(_resource_list(url), self.default_ttl)
+        fresh = ttl is None or cached.stored_at + ttl > self.__clock()
+        if fresh:
+            with self.__lock:
+                self.hits += 1
+        return fresh
+
+    def set(self, url: str, headers, body: bytes):
+        """
+        Caches a response fetched from the shop with status 200, unless it can neither be fresh nor revalidated.
+        Evicts the least recently used responses when the cache gets too big.
+
+        :param url: The full URL of the request, query included.
+        :param headers: The headers of the response, only STORED_HEADERS are kept.
+        :param body: The decoded body of the response.
+        """
+        with self.__lock:
+            self.misses += 1
+        stored_headers = {header: headers[header] for header in STORED_HEADERS if header in headers}
+        ttl = self.ttls.get(_resource_list(url), self.default_ttl)
+        if (ttl is not None and ttl <= 0 and "ETag" not in stored_headers and "Last-Modified" not in stored_headers) \
+                or len(body) > self.max_size:
+            return
+        now = self.__clock()
+        with self.__lock:
+            old = self.__connection.execute("SELECT LENGTH(body) FROM responses WHERE url = ?", (url,)).fetchone()
+            self.__connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                                      (url, json.dumps(stored_headers), body, now, now))
+            self.__size += len(body) - (old[0] if old else 0)
+            self.__evict()
+
+    def refresh(self, url: str):
+        """
+        Marks the cached response as fresh again after the shop answered 304 Not Modified.
+
+        :param url: The full URL of the request, query included.
+        """
+        now = self.__clock()
+        with self.__lock:
+            self.revalidated += 1
+            self.__connection.execute("UPDATE responses SET stored_at = ?, used_at = ? WHERE url = ?", (now, now, url))
+
+    def clear(self):
+        """
+        Removes all cached responses, the counters are kept.
+        """
+        with self.__lock:
+            self.__connection.execute("DELETE FROM responses")
+            self.__size = 0
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def __evict(self):
+        """
+        Deletes the least recently used responses until the bodies fit into max_size bytes.
+        """
+        while self.__size > self.max_size:
+            rows = self.__connection.execute("SELECT url, LENGTH(body) FROM responses ORDER BY used_at LIMIT 100")
+            for url, length in rows.fetchall():
+                self.__connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self.__size -= length
+                if self.__size <= self.max_size:
+                    break
+
+
+def _resource_list(url: str) -> str:
+    """
+    Returns the resource list a URL belongs to, e.g. countries for https://shop/api/countries/21 and an empty string
+    for the API root.
+    """
+    path = urlsplit(url).path
+    return path[path.find("/api") + 5:].split("/", 1)[0] if "/api" in path else ""
+
+
+def _conditional_headers(cached: CachedResponse) -> dict:
+    """
+    Builds the headers asking the shop whether the cached response changed.
+
+    :param cached: The cached response.
+    :return: If-None-Match and If-Modified-Since for the validators the response has.
+    """
+    headers = dict()
+    if "ETag" in cached.headers:
+        headers["If-None-Match"] = cached.headers["ETag"]
+    if "Last-Modified" in cached.headers:
+        headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+    return headers
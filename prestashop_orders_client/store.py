@@ -0,0 +1,201 @@
+"""
+prestashop_orders_client.store
+~~~~~~~~~~~~~~
+This module provides OrderStore, a local mirror of the orders of a shop in an SQLite database. It is filled
+incrementally from PrestaShopOrderClient and answers queries about the orders without any request to the shop.
+"""
+import json
+import sqlite3
+import threading
+from typing import Iterable
+
+from .parser import _OrderParser
+from .utils import Order, OrderRow, Product, SyncWatermark, ORDER_COMPONENTS
+
+"""
+Watermark of an empty store, every order of the shop was updated after it.
+"""
+INITIAL_WATERMARK = SyncWatermark("1970-01-01 00:00:00", 0)
+
+"""
+Columns of the orders table besides the fields of Order.
+"""
+DATE_COLUMNS = ("date_add", "date_upd")
+
+"""
+Columns of the orders table in the order of the rows written to it.
+"""
+ORDER_COLUMNS = Order._fields + DATE_COLUMNS
+
+"""
+Fields of Order which can be queried with OrderStore.query, each of them is indexed.
+"""
+QUERY_FIELDS = ("reference", "email", "order_state", "country", "state", "city", "post_code")
+
+
+class OrderStore:
+    """
+    A thread safe mirror of orders in an SQLite database. Every order is stored as a row with the fields of Order and
+    its add and update date, the order, order state, customer, address, country and state it was built from are kept
+    as well. The orders are indexed by id, by the fields of QUERY_FIELDS and by their add and update date.
+
+        store = OrderStore("orders.sqlite")
+        store.sync(client)
+        store.query(order_state="Payment accepted", country="Germany", date_add=("2024-01-29", "2024-02-04 23:59:59"))
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens the store, creating the database file if it does not exist.
+
+        :param path: The path of the SQLite database, ":memory:" keeps the store in memory only.
+        """
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+        with self.__connection:
+            # extra and rows are stored as JSON
+            columns = ", ".join(f"{column} TEXT" for column in ORDER_COLUMNS[2:])
+            self.__connection.execute(f"CREATE TABLE IF NOT EXISTS orders (id INTEGER PRIMARY KEY, total_paid REAL, "
+                                      f"{columns})")
+            # Stores created before Order had rows get the column added
+            if "rows" not in {row[1] for row in self.__connection.execute("PRAGMA table_info(orders)")}:
+                self.__connection.execute("ALTER TABLE orders ADD COLUMN rows TEXT")
+            for column in QUERY_FIELDS + DATE_COLUMNS:
+                self.__connection.execute(f"CREATE INDEX IF NOT EXISTS orders_{column} ON orders ({column})")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS resources (resource TEXT NOT NULL, id TEXT NOT NULL, "
+                                      "data TEXT NOT NULL, PRIMARY KEY (resource, id))")
+            self.__connection.execute("CREATE TABLE IF NOT EXISTS sync (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                                      "date_upd TEXT NOT NULL, since_id INTEGER NOT NULL)")
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__connection.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+    @property
+    def watermark(self) -> SyncWatermark:
+        """
+        The position up to which the orders of the shop were synced.
+        """
+        with self.__lock:
+            row = self.__connection.execute("SELECT date_upd, since_id FROM sync").fetchone()
+        return INITIAL_WATERMARK if row is None else SyncWatermark(*row)
+
+    def sync(self, client, page_size: int = 100) -> int:
+        """
+        Fetches the orders added or changed since the last sync and stores them. The first sync reads all orders.
+
+        :param client: The PrestaShopOrderClient of the shop.
+        :param page_size: The amount of orders requested at once.
+        :return: The amount of added or changed orders.
+        """
+        orders_data, watermark = client.get_orders_data_since(*self.watermark, page_size=page_size)
+        self.upsert(orders_data, watermark, client.extra_fields)
+        return len(orders_data)
+
+    def upsert(self, orders_data: Iterable[dict], watermark: SyncWatermark = None, extra_fields: dict = None):
+        """
+        Stores the orders, replacing stored orders with the same id, in one transaction.
+
+        :param orders_data: A dictionary with the data of every resource in ORDER_COMPONENTS per order, as returned
+            by PrestaShopOrderClient.get_orders_data_since.
+        :param watermark: The watermark the orders were synced up to, it is kept unchanged if not set.
+        :param extra_fields: The extra fields the orders were read with, their values are stored in Order.extra.
+        """
+        order_rows, resource_rows = [], dict()
+        for order_data in orders_data:
+            order = _OrderParser.build_order(order_data, extra_fields)
+            order_rows.append(tuple(order[:-2]) + tuple(None if value is None else json.dumps(value)
+                                                        for value in (order.extra, order.rows))
+                              + tuple(order_data["order"].get(column) for column in DATE_COLUMNS))
+            for resource in ORDER_COMPONENTS:
+                if order_data.get(resource):
+                    resource_rows[resource, order_data[resource]["id"]] = json.dumps(order_data[resource])
+        with self.__lock, self.__connection:
+            self.__connection.executemany("INSERT OR REPLACE INTO orders ({}) VALUES ({})".format(
+                ", ".join(ORDER_COLUMNS), ", ".join("?" * len(ORDER_COLUMNS))), order_rows)
+            self.__connection.executemany("INSERT OR REPLACE INTO resources VALUES (?, ?, ?)",
+                                          [(*key, data) for key, data in resource_rows.items()])
+            if watermark is not None:
+                self.__connection.execute("INSERT OR REPLACE INTO sync VALUES (1, ?, ?)",
+                                          (watermark.date_upd or INITIAL_WATERMARK.date_upd, watermark.since_id))
+
+    def get(self, order_id: int) -> Order | None:
+        """
+        Returns the stored order with the given id or None if it is not stored.
+
+        :param order_id: The id of the order.
+        """
+        with self.__lock:
+            row = self.__connection.execute("SELECT {} FROM orders WHERE id = ?".format(", ".join(Order._fields)),
+                                            (order_id,)).fetchone()
+        return None if row is None else _order(row)
+
+    def query(self, date_add: tuple[str, str] = None, date_upd: tuple[str, str] = None, limit: int = None,
+              **fields) -> list[Order]:
+        """
+        Returns the stored orders matching all given conditions, sorted by id.
+
+            store.query(order_state=["Payment accepted", "Shipped"], country="Germany")
+
+        :param date_add: Interval of the add date, both ends included, e.g. ("2024-01-01", "2024-01-31 23:59:59")
+        :param date_upd: Interval of the update date, both ends included.
+        :param limit: The maximum amount of orders returned.
+        :param fields: Values of fields of QUERY_FIELDS, a list of values matches any of them and None matches
+            orders without a value.
+        :return: The matching orders.
+        :raises ValueError: If a field cannot be queried.
+        """
+        conditions, parameters = [], []
+        for field, value in fields.items():
+            if field not in QUERY_FIELDS:
+                raise ValueError(f"Invalid query field {field}! Must be one of {', '.join(QUERY_FIELDS)}")
+            if value is None:
+                conditions.append(f"{field} IS NULL")
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            conditions.append("{} IN ({})".format(field, ", ".join("?" * len(values))))
+            parameters.extend(values)
+        for column, interval in (("date_add", date_add), ("date_upd", date_upd)):
+            if interval is not None:
+                conditions.append(f"{column} BETWEEN ? AND ?")
+                parameters.extend(interval)
+        statement = "SELECT {} FROM orders".format(", ".join(Order._fields))
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        statement += " ORDER BY id"
+        if limit is not None:
+            statement += " LIMIT ?"
+            parameters.append(limit)
+        with self.__lock:
+            return [_order(row) for row in self.__connection.execute(statement, parameters)]
+
+    def resource(self, resource: str, resource_id) -> dict | None:
+        """
+        Returns a stored resource an order was built from, as read from the shop.
+
+        :param resource: The resource type, one of ORDER_COMPONENTS, e.g. customer
+        :param resource_id: The id of the resource.
+        """
+        with self.__lock:
+            row = self.__connection.execute("SELECT data FROM resources WHERE resource = ? AND id = ?",
+                                            (resource, str(resource_id))).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        with self.__lock:
+            self.__connection.close()
+
+
+def _order(row: tuple) -> Order:
+    """
+    Builds an Order from a row of the orders table, decoding its extra values and order rows.
+    """
+    extra, rows = row[-2:]
+    return Order(*row[:-2], None if extra is None else json.loads(extra),
+                 None if rows is None else [OrderRow(*order_row[:-1], None if order_row[-1] is None else
+                                                     Product(*order_row[-1])) for order_row in json.loads(rows)])
@@ -0,0 +1,412 @@
+"""
+prestashop_orders_client.transport
+~~~~~~~~~~~~~~
+This module provides the transport layer below every request of the clients: retries of transient failures with
+exponential backoff and jitter, Retry-After handling, a client side token bucket rate limiter and conditional requests
+answered from a ResponseCache. Pass a RetryPolicy, a RateLimiter and a ResponseCache to PrestaShopOrderClient or
+AsyncPrestaShopOrderClient to configure them. Every request is recorded in the ClientMetrics of the client.
+"""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from .metrics import ClientMetrics
+from .response_cache import ResponseCache, CachedResponse, _conditional_headers, _resource_list
+
+"""
+Statuses which are retried. PrestaShop answers with 503 without a Retry-After header when the webservice is turned
+off, which is not transient, so 503 is only retried with a Retry-After header, as sent in maintenance mode.
+"""
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+"""
+Methods which are safe to send again, the clients only read from the shop.
+"""
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+"""
+Seconds the clients wait for a connection and for a response by default. Big pages of orders can take a while to be
+rendered by the shop, so the read timeout is generous.
+"""
+DEFAULT_TIMEOUT = (10.0, 120.0)
+
+
+class RetryPolicy:
+    """
+    Decides which responses are retried and how long to wait before the next attempt. The wait grows exponentially
+    with every attempt, backoff * 2 ** attempt capped at max_backoff, and is randomized with full jitter so that
+    concurrent workers do not retry in lockstep. A Retry-After header of the shop is used instead when present.
+    """
+
+    def __init__(self, retries: int = 3, backoff: float = 0.5, max_backoff: float = 30.0, jitter: bool = True,
+                 statuses=RETRY_STATUSES, random: Callable[[], float] = random.random):
+        """
+        Initializes a retry policy.
+
+        :param retries: The maximum amount of retries of a request, 0 disables retrying.
+        :param backoff: Seconds to wait before the first retry, doubled for every further retry.
+        :param max_backoff: The maximum amount of seconds to wait before a retry, Retry-After included.
+        :param jitter: Wait a random time between 0 and the backoff instead of the backoff itself.
+        :param statuses: The status codes which are retried.
+        :param random: Function returning a random float in [0, 1), used for the jitter.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.__random = random
+
+    def should_retry(self, attempt: int, status_code: int = None, retry_after: float = None) -> bool:
+        """
+        Tells whether a failed attempt is retried.
+
+        :param attempt: The amount of retries made so far.
+        :param status_code: The status code of the response, None if the request failed without a response.
+        :param retry_after: Seconds from the Retry-After header of the response, if any.
+        """
+        if attempt >= self.retries:
+            return False
+        if status_code is None:
+            return True
+        if status_code == 503 and retry_after is None:
+            return False
+        return status_code in self.statuses
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Returns the seconds to wait before the next attempt.
+
+        :param attempt: The amount of retries made so far.
+        :param retry_after: Seconds from the Retry-After header of the response, if any.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        return delay * self.__random() if self.jitter else delay
+
+
+class RateLimiter:
+    """
+    A thread safe token bucket which limits the requests of a client to rate requests per second, allowing bursts of
+    up to burst requests. Every request takes a token and waits until one is available. A Retry-After of the shop
+    pauses all requests sharing the limiter, not only the one which got it.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        Initializes a full bucket.
+
+        :param rate: The amount of requests allowed per second.
+        :param burst: The amount of requests allowed at once after a pause.
+        :param clock: Function returning the current time in seconds.
+        :param sleep: Function waiting the given amount of seconds.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("The rate must be positive and the burst at least 1!")
+        self.rate = rate
+        self.burst = burst
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__tokens = float(burst)
+        self.__updated = clock()
+        self.__paused_until = self.__updated
+        self.__lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token and returns the seconds to wait before it may be used.
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0.0
+            return max(wait, self.__paused_until - now)
+
+    def acquire(self) -> float:
+        """
+        Waits until a request may be sent.
+
+        :return: The seconds waited.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            self.__sleep(wait)
+        return wait
+
+    async def acquire_async(self) -> float:
+        """
+        Waits until a request may be sent without blocking the event loop.
+
+        :return: The seconds waited.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """
+        Holds back all requests for the given amount of seconds, e.g. after a 429 with Retry-After.
+
+        :param seconds: Seconds from now to wait before the next request.
+        """
+        with self.__lock:
+            self.__paused_until = max(self.__paused_until, self.__clock() + seconds)
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses a Retry-After header, which is either an amount of seconds or an HTTP date.
+
+    :param value: The header value.
+    :return: The seconds to wait or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _pause_rate_limiter(rate_limiter: RateLimiter | None, retry_policy: RetryPolicy, status_code: int,
+                        retry_after: float | None):
+    """
+    Pauses all requests sharing the rate limiter when the shop asked to wait with a Retry-After, also when the request
+    itself is not retried anymore.
+
+    :param rate_limiter: The rate limiter, nothing happens without one.
+    :param retry_policy: The retry policy, caps the pause at its max_backoff.
+    :param status_code: The status code of the response.
+    :param retry_after: Seconds from the Retry-After header of the response, if any.
+    """
+    if rate_limiter is not None and retry_after is not None and status_code in retry_policy.statuses:
+        rate_limiter.pause(min(retry_after, retry_policy.max_backoff))
+
+
+class RetryingAdapter(HTTPAdapter):
+    """
+    A requests transport adapter which waits for the rate limiter before every request and retries connection errors
+    and transient error statuses according to the retry policy. With a response cache GET requests are answered from
+    it while fresh and revalidated with the shop after that. With metrics every request is recorded once its body is
+    read. Mount it on a session, like any HTTPAdapter:
+
+        session.mount("https://", RetryingAdapter(RetryPolicy(retries=5), RateLimiter(10)))
+    """
+
+    def __init__(self, retry_policy: RetryPolicy = None, rate_limiter: RateLimiter = None,
+                 sleep: Callable[[float], None] = time.sleep, response_cache: ResponseCache = None,
+                 metrics: ClientMetrics = None, timeout: float | tuple[float, float] = None, **kwargs):
+        """
+        Initializes the adapter.
+
+        :param retry_policy: The retry policy, RetryPolicy() if not set.
+        :param rate_limiter: Optional rate limiter, it can be shared between adapters and clients.
+        :param sleep: Function waiting the given amount of seconds between attempts.
+        :param response_cache: Optional persistent cache of GET responses.
+        :param metrics: Optional metrics recording every request.
+        :param timeout: The timeout of requests sent without one, in seconds or as a (connect, read) pair.
+        :param kwargs: Passed to HTTPAdapter, e.g. pool_maxsize.
+        """
+        super().__init__(**kwargs)
+        self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+        self.rate_limiter = rate_limiter
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.timeout = timeout
+        self.retried = 0
+        self.__sleep = sleep
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if self.metrics is None:
+            return self.__respond(request, **kwargs)[0]
+        start = time.perf_counter()
+        try:
+            response, cached = self.__respond(request, **kwargs)
+            # The session reads the body right after anyway, reading it here counts the download as part of the request
+            size = 0 if kwargs.get("stream") else len(response.content)
+        except requests.RequestException:
+            self.metrics.record_request(_resource_list(request.url), None, time.perf_counter() - start, 0)
+            raise
+        self.metrics.record_request(_resource_list(request.url), response.status_code, time.perf_counter() - start,
+                                    size, cached)
+        return response
+
+    def __respond(self, request: requests.PreparedRequest, **kwargs) -> tuple[requests.Response, bool]:
+        """
+        Answers the request from the response cache or sends it.
+        :return: The response and whether it was taken from the response cache without a request.
+        """
+        cache = self.response_cache
+        if cache is None or request.method != "GET" or not cache.cacheable(request.url):
+            return self.__send(request, **kwargs), False
+        cached = cache.get(request.url)
+        if cached is not None:
+            if cache.fresh(request.url, cached):
+                return self.__cached_response(request, cached), True
+            request.headers.update(_conditional_headers(cached))
+        response = self.__send(request, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            cache.refresh(request.url)
+            return self.__cached_response(request, cached), False
+        if response.status_code == 200:
+            cache.set(request.url, response.headers, response.content)
+        return response, False
+
+    def __cached_response(self, request: requests.PreparedRequest, cached: CachedResponse) -> requests.Response:
+        """
+        Builds the response of a request answered from the response cache.
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(cached.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = cached.body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def __send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Sends the request, retrying it according to the retry policy.
+        """
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or not self.retry_policy.should_retry(attempt):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+            else:
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                _pause_rate_limiter(self.rate_limiter, self.retry_policy, response.status_code, retry_after)
+                if not idempotent or not self.retry_policy.should_retry(attempt, response.status_code, retry_after):
+                    return response
+                delay = self.retry_policy.delay(attempt, retry_after)
+                # Read the body so that the connection goes back to the pool instead of being dropped
+                response.content
+                response.close()
+            attempt += 1
+            self.retried += 1
+            self.__sleep(delay)
+
+
+if httpx is not None:
+    class AsyncRetryingTransport(httpx.AsyncHTTPTransport):
+        """
+        The httpx version of RetryingAdapter for AsyncPrestaShopOrderClient.
+        """
+
+        def __init__(self, retry_policy: RetryPolicy = None, rate_limiter: RateLimiter = None,
+                     response_cache: ResponseCache = None, metrics: ClientMetrics = None, **kwargs):
+            """
+            Initializes the transport.
+
+            :param retry_policy: The retry policy, RetryPolicy() if not set.
+            :param rate_limiter: Optional rate limiter, it can be shared between transports and clients.
+            :param response_cache: Optional persistent cache of GET responses.
+            :param metrics: Optional metrics recording every request.
+            :param kwargs: Passed to httpx.AsyncHTTPTransport, e.g. limits.
+            """
+            super().__init__(**kwargs)
+            self.retry_policy = RetryPolicy() if retry_policy is None else retry_policy
+            self.rate_limiter = rate_limiter
+            self.response_cache = response_cache
+            self.metrics = metrics
+            self.retried = 0
+
+        async def handle_async_request(self, request: "httpx.Request") -> "httpx.Response":
+            if self.metrics is None:
+                return (await self.__respond(request))[0]
+            start = time.perf_counter()
+            try:
+                response, cached = await self.__respond(request)
+                size = len(await response.aread())
+            except httpx.TransportError:
+                self.metrics.record_request(_resource_list(str(request.url)), None, time.perf_counter() - start, 0)
+                raise
+            self.metrics.record_request(_resource_list(str(request.url)), response.status_code,
+                                        time.perf_counter() - start, size, cached)
+            return response
+
+        async def __respond(self, request: "httpx.Request") -> tuple["httpx.Response", bool]:
+            """
+            Answers the request from the response cache or sends it.
+            :return: The response and whether it was taken from the response cache without a request.
+            """
+            cache = self.response_cache
+            url = str(request.url)
+            if cache is None or request.method != "GET" or not cache.cacheable(url):
+                return await self.__send(request), False
+            cached = cache.get(url)
+            if cached is not None:
+                if cache.fresh(url, cached):
+                    return httpx.Response(200, headers=cached.headers, content=cached.body, request=request), True
+                request.headers.update(_conditional_headers(cached))
+            response = await self.__send(request)
+            if response.status_code == 304 and cached is not None:
+                await response.aclose()
+                cache.refresh(url)
+                return httpx.Response(200, headers=cached.headers, content=cached.body, request=request), False
+            if response.status_code == 200:
+                cache.set(url, response.headers, await response.aread())
+            return response, False
+
+        async def __send(self, request: "httpx.Request") -> "httpx.Response":
+            """
+            Sends the request, retrying it according to the retry policy.
+            """
+            idempotent = request.method in IDEMPOTENT_METHODS
+            attempt = 0
+            while True:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire_async()
+                try:
+                    response = await super().handle_async_request(request)
+                except httpx.TransportError:
+                    if not idempotent or not self.retry_policy.should_retry(attempt):
+                        raise
+                    delay = self.retry_policy.delay(attempt)
+                else:
+                    retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                    _pause_rate_limiter(self.rate_limiter, self.retry_policy, response.status_code, retry_after)
+                    if not idempotent or not self.retry_policy.should_retry(attempt, response.status_code,
+                                                                            retry_after):
+                        return response
+                    delay = self.retry_policy.delay(attempt, retry_after)
+                    await response.aclose()
+                attempt += 1
+                self.retried += 1
+                await asyncio.sleep(delay)
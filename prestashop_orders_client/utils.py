@@ -4,16 +4,24 @@ prestashop_orders_client.utils
 This module provides utility functions, data structures that are used within our package
 that are also useful for external consumption.
 """
+import json
+from array import array
+from bisect import bisect_left
 from collections import namedtuple
 
 import requests
 import xmltodict
 
-from .exceptions import ResourceForbiddenError, UnexpectedStatusCodeError, PrestaShopConnectionError
+from .extractor import _extract_resources
+from .metrics import _Stopwatch
+from .exceptions import ResourceForbiddenError, UnexpectedStatusCodeError, PrestaShopConnectionError, \
+    WebServiceUnavailableError, InvalidApiKeyError
 
 
 """
-Representation of an order, containing relevant information about the order.
+Representation of an order, containing relevant information about the order. extra holds the values of the extra
+fields requested from the client per resource, e.g. {"customer": {"birthday": "1990-01-01"}}, and is None without.
+rows holds the OrderRow line items of orders read with their order rows and is None without.
 """
 Order = namedtuple("Order",
                    "id total_paid reference "
@@ -21,35 +29,443 @@ Order = namedtuple("Order",
                    "email "
                    "first_name last_name company_name phone address city post_code "
                    "country "
-                   "state")
+                   "state "
+                   "extra "
+                   "rows", defaults=(None, None))
+
+"""
+A line item of an order, read from the order_rows association of the order. product holds the Product the row
+refers to when the client resolves products, None otherwise or if the product was deleted.
+"""
+OrderRow = namedtuple("OrderRow",
+                      "id product_id product_attribute_id quantity name reference ean13 unit_price_tax_incl "
+                      "product", defaults=(None,))
+
+"""
+The current data of a product referenced by an order row, as needed for shipping: its stock reference, EAN-13 and
+weight.
+"""
+Product = namedtuple("Product", "id reference ean13 weight")
+
+"""
+Position up to which orders were synced, persist it and pass it to PrestaShopOrderClient.get_orders_since
+to get only the orders added or changed after it.
+"""
+SyncWatermark = namedtuple("SyncWatermark", "date_upd since_id", defaults=(None, 0))
 
 ORDER_COMPONENTS = ("order", "order_state", "customer", "address", "country", "state")
 
+"""
+Root element of the list response for every resource the package works with.
+"""
+RESOURCE_LISTS = {"order": "orders", "order_state": "order_states", "customer": "customers", "address": "addresses",
+                  "country": "countries", "state": "states", "product": "products"}
+
+"""
+Fields of every resource the package reads, all other fields are skipped when parsing a response.
+"""
+RESOURCE_FIELDS = {
+    "order": ("id", "current_state", "id_customer", "id_address_delivery", "date_add", "date_upd", "total_paid",
+              "reference"),
+    "order_state": ("id", "name"),
+    "customer": ("id", "email"),
+    "address": ("id", "id_country", "id_state", "company", "lastname", "firstname", "address1", "address2",
+                "postcode", "city", "phone"),
+    "country": ("id", "name"),
+    "state": ("id", "name"),
+}
+
+"""
+Fields of the products resolved for order rows.
+"""
+PRODUCT_FIELDS = ("id", "reference", "ean13", "weight")
+
+
+def _merge_fields(extra_fields: dict = None, order_rows: bool = False, products: bool = False) -> dict:
+    """
+    Adds extra fields to the fields of RESOURCE_FIELDS.
+
+    :param extra_fields: Further fields to read per resource, e.g. {"customer": ["birthday"]}
+    :param order_rows: Read the associations of the orders, which hold their order rows.
+    :param products: Read the order rows and the PRODUCT_FIELDS of the products they refer to.
+    :return: The fields to read per resource.
+    :raises ValueError: If a resource is not one of ORDER_COMPONENTS.
+    """
+    fields = dict(RESOURCE_FIELDS)
+    for resource, resource_fields in (extra_fields or {}).items():
+        if resource not in fields:
+            raise ValueError(f"Invalid resource {resource}! Must be one of {', '.join(RESOURCE_FIELDS)}")
+        fields[resource] += tuple(field for field in resource_fields if field not in fields[resource])
+    if order_rows or products:
+        fields["order"] += ("associations",)
+    if products:
+        fields["product"] = PRODUCT_FIELDS
+    return fields
+
+
+def _display(fields) -> str:
+    """
+    Builds the value of a PrestaShop display query parameter returning only the given fields, all fields if None.
 
-def _get_resource_as_dict(session: requests.Session, link: str, xml_root: str) -> dict:
+    :param fields: The fields to return.
+    :return: The display value, e.g. [id,email] or full
+    """
+    # Associations are part of full resources only, they can't be listed in a display of fields
+    if fields is None or "associations" in fields:
+        return "full"
+    return "[{}]".format(",".join(fields))
+
+"""
+Wire formats the PrestaShop webservice can answer in, requested with the output_format query parameter.
+"""
+OUTPUT_FORMATS = ("XML", "JSON")
+
+"""
+Fields linking to another resource and the resource list they link to. In XML these carry an xlink:href attribute,
+in JSON only the id.
+"""
+LINK_FIELDS = {"current_state": "order_states", "id_customer": "customers", "id_address_delivery": "addresses",
+               "id_country": "countries", "id_state": "states", "product_id": "products"}
+
+
+class _OrderIdIndex:
+    """
+    Sorted ids of the orders present in the shop, stored compactly as unsigned ints. Order ids have gaps after
+    deletions, so they are looked up here instead of assuming they run from 1 to the amount of orders.
+    """
+
+    def __init__(self):
+        self.ids = array("I")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __contains__(self, order_id: int) -> bool:
+        position = bisect_left(self.ids, order_id)
+        return position < len(self.ids) and self.ids[position] == order_id
+
+    @property
+    def last_id(self) -> int:
+        """
+        The highest known order id, 0 if there are none.
+        """
+        return self.ids[-1] if self.ids else 0
+
+    def refresh_params(self) -> dict:
+        """
+        Query parameters of the orders list returning only the ids of orders newer than the known ones.
+        """
+        return {"display": "[id]", "sort": "[id_ASC]", "filter[id]": f">[{self.last_id}]"}
+
+    def extend(self, orders_data: list[dict]) -> int:
+        """
+        Adds the ids of the orders returned for refresh_params.
+
+        :param orders_data: Orders as dictionaries containing their id, sorted by id.
+        :return: The amount of added ids.
+        """
+        new_ids = [int(data["id"]) for data in orders_data if int(data["id"]) > self.last_id]
+        self.ids.extend(sorted(new_ids))
+        return len(new_ids)
+
+
+def _get_resource_as_dict(session: requests.Session, link: str, xml_root: str, params: dict = None,
+                          cache=None, fields=None, metrics=None) -> dict:
     """
     Fetches the given resource from the PrestaShop server and returns it as a dictionary.
 
     :param session: An active session with the PrestaShop server.
     :param link: The URL of the resource to be fetched.
     :param xml_root: The root element of the resource in the XML response.
+    :param params: Optional query parameters such as display, filter, sort or limit.
+    :param cache: Optional ResourceCache, single resources are read from it and stored in it.
+    :param fields: Optional fields to extract, e.g. RESOURCE_FIELDS[xml_root]. Without params only these fields are
+        requested from the server, everything else is skipped, which is much cheaper than parsing the whole response.
+    :param metrics: Optional ClientMetrics, the parse time and cache hits are recorded in it.
     :return: The resource as a dictionary.
     :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
     :raises UnexpectedStatusCodeError: If the server returns a status code other than 200 or 401.
     :raises PrestaShopConnectionError: If there is an error connecting to the server.
     """
+    cache_key = _cache_key(link, xml_root) if cache is not None and params is None else None
+    if cache_key and (data := cache.get(*cache_key)) is not None:
+        if metrics is not None:
+            metrics.record_cache_hit(RESOURCE_LISTS[xml_root])
+        return data
     try:
-        response = session.get(link)
-        if response.status_code == 200:
-            return xmltodict.parse(response.content).get("prestashop").get(xml_root)
-        elif response.status_code == 401:
-            raise ResourceForbiddenError(
-                f"You don't have permission to access {xml_root}! Set correct API key or add it to current ApiKey's "
-                f"permission list.")
-        elif response.status_code == 404:
-            return dict()
+        if fields is not None and params is None:
+            list_link, projection = _projection(link, fields)
+            response = session.get(list_link, params=projection)
+            with _Stopwatch() as stopwatch:
+                data = _handle_projected_response(response.status_code, response.content, response.text, xml_root,
+                                                  fields, list_link)
         else:
-            raise UnexpectedStatusCodeError(
-                f"Unexpected status code: {response.status_code}\nError: {response.text}")
+            response = session.get(link, params=params)
+            with _Stopwatch() as stopwatch:
+                data = _handle_response(response.status_code, response.content, response.text, xml_root, fields,
+                                        link)
+    except requests.exceptions.RequestException as e:
+        raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+    if metrics is not None:
+        metrics.record_parse(RESOURCE_LISTS[xml_root], stopwatch.seconds, 1 if data else 0)
+    if cache_key and data:
+        cache.set(*cache_key, data)
+    return data
+
+
+def _projection(link: str, fields) -> tuple[str, dict]:
+    """
+    Returns the request reading only the given fields of a single resource. The webservice projects resource lists
+    only, so the resource list is filtered by the id of the resource.
+
+    :param link: The URL of the resource, e.g. https://shop/api/customers/5
+    :param fields: The fields to read.
+    :return: The URL of the resource list and its query parameters, e.g. https://shop/api/customers and
+        {"display": "[id,email]", "filter[id]": "[5]"}
+    """
+    list_link, resource_id = link.rstrip("/").rsplit("/", 1)
+    return list_link, {"display": _display(fields), "filter[id]": f"[{resource_id}]"}
+
+
+def _handle_projected_response(status_code: int, content: bytes, text: str, xml_root: str, fields,
+                               list_link: str) -> dict:
+    """
+    Turns the response of a projected request for a single resource into a dictionary.
+
+    :param status_code: The status code of the response.
+    :param content: The body of the response.
+    :param text: The body of the response decoded as text, used in error messages.
+    :param xml_root: The root element of the resource in the XML response.
+    :param fields: The fields to extract.
+    :param list_link: The URL of the resource list, needed to build the links of a JSON response.
+    :return: The resource as a dictionary, empty if the resource was not found.
+    :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
+    :raises UnexpectedStatusCodeError: If the server returns a status code other than 200, 401 or 404.
+    """
+    if not _check_response(status_code, text, RESOURCE_LISTS[xml_root]):
+        return dict()
+    resources = _decode_resources(content, xml_root, fields, list_link)
+    return resources[0] if resources else dict()
+
+
+def _cache_key(link: str, xml_root: str) -> tuple[str, str]:
+    """
+    Returns the resource type and id a single resource is cached under.
+
+    :param link: The URL of the resource, e.g. https://shop/api/countries/21
+    :param xml_root: The root element of the resource in the XML response, e.g. country
+    :return: The resource type and id, e.g. (country, 21)
+    """
+    return xml_root, link.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _handle_response(status_code: int, content: bytes, text: str, xml_root: str, fields=None,
+                     link: str = None) -> dict:
+    """
+    Turns a response of the PrestaShop server into a dictionary, independent of the HTTP library that made the
+    request. JSON responses are recognized by their content and turned into the same dictionary as the XML ones.
+
+    :param status_code: The status code of the response.
+    :param content: The body of the response.
+    :param text: The body of the response decoded as text, used in error messages.
+    :param xml_root: The root element of the resource in the XML response.
+    :param fields: Optional fields to extract, all fields are parsed with xmltodict if not set.
+    :param link: The URL of the resource, needed to build the links of a JSON response.
+    :return: The resource as a dictionary, empty if the resource was not found.
+    :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
+    :raises UnexpectedStatusCodeError: If the server returns a status code other than 200, 401 or 404.
+    """
+    if not _check_response(status_code, text, xml_root):
+        return dict()
+    if _is_json(content):
+        resource = json.loads(content)
+        return _from_json(resource[xml_root], _api_url(link), fields) if isinstance(resource, dict) else dict()
+    if fields is not None:
+        resources = _extract_resources(content, xml_root, fields)
+        return resources[0] if resources else dict()
+    return xmltodict.parse(content).get("prestashop").get(xml_root)
+
+
+def _check_response(status_code: int, text: str, xml_root: str) -> bool:
+    """
+    Checks the status code of a response of the PrestaShop server.
+
+    :param status_code: The status code of the response.
+    :param text: The body of the response decoded as text, used in error messages.
+    :param xml_root: The root element of the resource in the XML response, used in error messages.
+    :return: True if the resource was found, False if not.
+    :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
+    :raises UnexpectedStatusCodeError: If the server returns a status code other than 200, 401 or 404.
+    """
+    if status_code == 200:
+        return True
+    elif status_code == 401:
+        raise ResourceForbiddenError(
+            f"You don't have permission to access {xml_root}! Set correct API key or add it to current ApiKey's "
+            f"permission list.")
+    elif status_code == 404:
+        return False
+    else:
+        raise UnexpectedStatusCodeError(
+            f"Unexpected status code: {status_code}\nError: {text}")
+
+
+def _check_connection_response(status_code: int, text: str):
+    """
+    Checks the response of the API root which is requested to test the connection and the API key.
+
+    :param status_code: The status code of the response.
+    :param text: The body of the response decoded as text, used in error messages.
+    :raises WebServiceUnavailableError: If the WebService is turned off.
+    :raises InvalidApiKeyError: If the API key is not valid.
+    :raises UnexpectedStatusCodeError: If the server returns any other status code than 200.
+    """
+    if status_code == 200:
+        return
+    elif status_code == 503:
+        raise WebServiceUnavailableError(
+            "WebService Api is unavailable! Turn it on in your shop settings.")
+    elif status_code == 401:
+        raise InvalidApiKeyError("Invalid API key!")
+    else:
+        raise UnexpectedStatusCodeError(
+            f"Unexpected status code: {status_code}\nError: {text}")
+
+
+def _build_api_url(shop_link: str) -> str:
+    """
+    Builds the API url of the shop. Https is used unless the link already contains a scheme.
+
+    :param shop_link: The link of the shop, e.g. myshop.com or http://localhost:8080
+    :return: The API url, e.g. https://myshop.com/api
+    """
+    if shop_link.startswith(("https://", "http://")):
+        return "{}/api".format(shop_link.rstrip("/"))
+    return "https://{}/api".format(shop_link)
+
+def _get_resources_as_list(session: requests.Session, link: str, xml_root: str, params: dict = None,
+                           fields=None, metrics=None) -> list[dict]:
+    """
+    Fetches a list of resources from the PrestaShop server. Used together with the display and filter query
+    parameters to retrieve many resources in one request.
+
+    :param session: An active session with the PrestaShop server.
+    :param link: The URL of the resource list, e.g. https://shop/api/customers
+    :param xml_root: The root element of a single resource in the XML response, e.g. customer
+    :param params: Optional query parameters such as display, filter, sort or limit.
+    :param fields: Optional fields to extract from every resource, all fields are parsed with xmltodict if not set.
+    :param metrics: Optional ClientMetrics, the parse time is recorded in it.
+    :return: The resources as a list of dictionaries, empty if there are none.
+    :raises ResourceForbiddenError: If the user doesn't have permission to access the resource.
+    :raises UnexpectedStatusCodeError: If the server returns a status code other than 200 or 401.
+    :raises PrestaShopConnectionError: If there is an error connecting to the server.
+    """
+    try:
+        response = session.get(link, params=params)
+        if not _check_response(response.status_code, response.text, RESOURCE_LISTS[xml_root]):
+            return []
+        return _timed_decode_resources(response.content, xml_root, fields, link, metrics)
     except requests.exceptions.RequestException as e:
         raise PrestaShopConnectionError("Could not connect to the server!\n{}".format(e))
+
+
+def _timed_decode_resources(content: bytes, xml_root: str, fields=None, link: str = None,
+                            metrics=None) -> list[dict]:
+    """
+    Decodes the resources like _decode_resources and records the time it took in the metrics, if given.
+    """
+    if metrics is None:
+        return _decode_resources(content, xml_root, fields, link)
+    with _Stopwatch() as stopwatch:
+        resources = _decode_resources(content, xml_root, fields, link)
+    metrics.record_parse(RESOURCE_LISTS[xml_root], stopwatch.seconds, len(resources))
+    return resources
+
+
+def _decode_resources(content: bytes, xml_root: str, fields=None, link: str = None) -> list[dict]:
+    """
+    Turns the body of a resource list response, XML or JSON, into a list of dictionaries.
+
+    :param content: The body of the response.
+    :param xml_root: The root element of a single resource in the XML response, e.g. customer
+    :param fields: Optional fields to extract, all fields are parsed with xmltodict if not set.
+    :param link: The URL of the resource list, needed to build the links of a JSON response.
+    :return: The resources as a list of dictionaries, empty if there are none.
+    """
+    if _is_json(content):
+        resources = json.loads(content)
+        # An empty list is answered with [] instead of an object
+        if not isinstance(resources, dict):
+            return []
+        api_url = _api_url(link)
+        return [_from_json(resource, api_url, fields) for resource in resources.get(RESOURCE_LISTS[xml_root], [])]
+    if fields is not None:
+        return _extract_resources(content, xml_root, fields)
+    resources = (xmltodict.parse(content).get("prestashop").get(RESOURCE_LISTS[xml_root]) or {}).get(xml_root)
+    # xmltodict returns a single dict instead of a list when there is only one element
+    if resources is None:
+        return []
+    return resources if isinstance(resources, list) else [resources]
+
+
+def _is_json(content: bytes) -> bool:
+    """
+    Tells whether a response body is JSON. Shops not supporting output_format=JSON ignore it and answer in XML.
+    """
+    return content.lstrip()[:1] in (b"{", b"[")
+
+
+def _api_url(link: str) -> str:
+    """
+    Returns the API url of a resource link, e.g. https://shop/api for https://shop/api/orders/1
+    """
+    return link[:link.rindex("/api") + 4]
+
+
+def _from_json(resource: dict, api_url: str, fields=None) -> dict:
+    """
+    Turns a resource of a JSON response into the dictionary xmltodict gives for the XML response: values become
+    strings or None, ids of linked resources become {'@xlink:href': ..., '#text': ...} and translated values
+    become {'language': {'@id': ..., '@xlink:href': ..., '#text': ...}}.
+
+    :param resource: The resource as decoded from JSON.
+    :param api_url: The API url of the shop, used to build links.
+    :param fields: Optional fields to keep, all fields are kept if not set.
+    :return: The resource as a dictionary.
+    """
+    data = dict()
+    for field, value in resource.items():
+        if fields is not None and field not in fields:
+            continue
+        if isinstance(value, list) and all(isinstance(language, dict) and "value" in language for language in value):
+            languages = [{"@id": str(language["id"]), "@xlink:href": f"{api_url}/languages/{language['id']}",
+                          "#text": str(language["value"])} if language["value"] not in (None, "") else
+                         {"@id": str(language["id"]), "@xlink:href": f"{api_url}/languages/{language['id']}"}
+                         for language in value]
+            data[field] = {"language": languages[0] if len(languages) == 1 else languages} if languages else None
+        elif value is None or value == "":
+            data[field] = None
+        elif field in LINK_FIELDS and str(value) != "0":
+            data[field] = {"@xlink:href": f"{api_url}/{LINK_FIELDS[field]}/{value}", "#text": str(value)}
+        elif field == "associations" and isinstance(value, dict):
+            # The nested resources, like order rows, get the same shape as the resource
+            data[field] = {name: [_from_json(item, api_url) for item in items] if isinstance(items, list) else items
+                           for name, items in value.items()}
+        elif isinstance(value, (dict, list)):
+            data[field] = value
+        else:
+            data[field] = str(value)
+    return data
+
+
+def _id_filter(ids) -> str:
+    """
+    Builds the value of a PrestaShop filter[id] query parameter matching any of the given ids.
+
+    :param ids: Ids of the resources.
+    :return: The filter value, e.g. [1|2|3]
+    """
+    return "[{}]".format("|".join(str(resource_id) for resource_id in ids))
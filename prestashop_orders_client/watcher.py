@@ -0,0 +1,157 @@
+"""
+prestashop_orders_client.watcher
+~~~~~~~~~~~~~~
+This module provides OrderWatcher, the change feed of PrestaShopOrderClient.watch_orders. It polls a listing of just
+the id, update date and state of recently updated orders and reads full orders only for the ones that are new or
+changed.
+"""
+import threading
+from collections import namedtuple
+from typing import Callable, Iterator
+
+from .utils import Order, SyncWatermark
+
+"""
+Fields of the listing every poll reads.
+"""
+WATCH_FIELDS = ("id", "date_upd", "current_state")
+
+"""
+A new or changed order reported by an OrderWatcher, created is True for orders added to the shop while watching.
+"""
+OrderChange = namedtuple("OrderChange", "order created")
+
+
+class OrderWatcher:
+    """
+    Polls a shop for orders added or changed after a watermark. Every poll asks only for the id, update date and
+    state of the orders updated since the watermark, compares them with the last seen ones and reads the full orders
+    only for new or changed ids. The interval between polls shrinks to min_interval as soon as something changes and
+    grows by the backoff factor up to max_interval while nothing does.
+
+    Iterate over the watcher to receive the changes as they are found or pass a callback to run. Both block until
+    stop is called, from a callback or another thread. A watcher is created by PrestaShopOrderClient.watch_orders and
+    reuses the connections of its client, so polling doesn't probe the API or load the order ids again.
+    """
+
+    def __init__(self, list_orders: Callable[..., list[dict]], list_updated: Callable[[str], list[dict]],
+                 fetch_orders: Callable[[list[int]], list[Order]], since: SyncWatermark = None,
+                 min_interval: float = 5.0, max_interval: float = 60.0, backoff: float = 2.0):
+        """
+        Initializes the watcher. Without since the first poll only sets the watermark to the most recently updated
+        order of the shop.
+
+        :param list_orders: Function reading the fields of WATCH_FIELDS of the orders matching query parameters,
+            with an optional limit.
+        :param list_updated: Function reading the fields of WATCH_FIELDS of all orders updated at or after an update
+            date, sorted by update date and id.
+        :param fetch_orders: Function reading the orders with the given ids.
+        :param since: Watermark to report the changes after, e.g. the watermark of a previous watcher.
+        :param min_interval: Seconds between polls while orders change.
+        :param max_interval: Maximum seconds between polls while nothing changes.
+        :param backoff: Factor the interval grows by after every poll without changes.
+        :raises ValueError: If the intervals or the backoff are invalid or since has no update date.
+        """
+        if not 0 <= min_interval <= max_interval or backoff < 1:
+            raise ValueError("Invalid polling intervals! Requires 0 <= min_interval <= max_interval and backoff >= 1")
+        if since is not None and since.date_upd is None:
+            raise ValueError("Invalid watermark! The watermark of a watcher needs an update date")
+        self.__list_orders = list_orders
+        self.__list_updated = list_updated
+        self.__fetch_orders = fetch_orders
+        self.__date_upd, self.__since_id = since if since is not None else (None, 0)
+        # Update date and state of the orders updated at the watermark, orders updated before it are never listed
+        # again
+        self.__seen = {}
+        self.__last_id = None
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.__interval = min_interval
+        self.__stopped = threading.Event()
+
+    @property
+    def watermark(self) -> SyncWatermark:
+        """
+        The update date and id of the last reported order, to continue watching later with
+        PrestaShopOrderClient.watch_orders(since=...) or to sync with PrestaShopOrderClient.get_orders_since.
+        """
+        return SyncWatermark(self.__date_upd, max(max(self.__seen, default=0), self.__since_id))
+
+    @property
+    def interval(self) -> float:
+        """
+        Seconds until the next poll.
+        """
+        return self.__interval
+
+    def poll(self) -> list[OrderChange]:
+        """
+        Polls the shop once and adapts the interval. The watermark only moves once the changed orders are read, so
+        the changes of a failed poll are reported by the next one.
+
+        :return: The orders added or changed since the last poll, sorted by update date.
+        """
+        if self.__last_id is None:
+            baseline = self.__date_upd is None
+            self.__start()
+            if baseline:
+                return []
+        listed = self.__list_updated(self.__date_upd)
+        changed_ids = [int(data["id"]) for data in listed if self.__changed(data)]
+        date_upd, since_id = (listed[-1]["date_upd"], 0) if listed and listed[-1]["date_upd"] != self.__date_upd \
+            else (self.__date_upd, self.__since_id)
+        orders = {order.id: order for order in self.__fetch_orders(changed_ids)} if changed_ids else {}
+        # Orders deleted after they were listed are left out
+        changes = [OrderChange(orders[order_id], order_id > self.__last_id) for order_id in changed_ids
+                   if order_id in orders]
+        self.__date_upd, self.__since_id = date_upd, since_id
+        self.__seen = {int(data["id"]): (data["date_upd"], data["current_state"]) for data in listed
+                       if data["date_upd"] == date_upd}
+        self.__last_id = max([self.__last_id] + changed_ids)
+        self.__interval = self.min_interval if changes else min(self.__interval * self.backoff, self.max_interval)
+        return changes
+
+    def __start(self):
+        """
+        Reads the highest order id and, without a watermark, the most recently updated order.
+        """
+        last = self.__list_orders({"sort": "[id_DESC]"}, limit=1)
+        if self.__date_upd is None:
+            newest = self.__list_orders({"sort": "[date_upd_DESC,id_DESC]"}, limit=1)
+            # An empty shop is watched from the beginning
+            self.__date_upd, self.__since_id = (newest[0]["date_upd"], int(newest[0]["id"])) if newest \
+                else ("0000-00-00 00:00:00", 0)
+        self.__last_id = int(last[0]["id"]) if last else 0
+
+    def __changed(self, data: dict) -> bool:
+        """
+        Returns whether a listed order is new or changed since the last poll.
+        """
+        order_id = int(data["id"])
+        if order_id in self.__seen:
+            # A state change within the second of the last update is found by the state
+            return self.__seen[order_id] != (data["date_upd"], data["current_state"])
+        return data["date_upd"] != self.__date_upd or order_id > self.__since_id
+
+    def __iter__(self) -> Iterator[OrderChange]:
+        """
+        Polls the shop until the watcher is stopped and yields every change. An error of a poll ends the iteration,
+        iterating again continues after the last reported change.
+        """
+        while not self.__stopped.is_set():
+            yield from self.poll()
+            self.__stopped.wait(self.__interval)
+
+    def run(self, callback: Callable[[OrderChange], None]):
+        """
+        Polls the shop until the watcher is stopped and calls the callback with every change.
+        """
+        for change in self:
+            callback(change)
+
+    def stop(self):
+        """
+        Stops watching, a running iteration ends after the changes of the current poll.
+        """
+        self.__stopped.set()
@@ -24,6 +24,7 @@ setup(
     ],
     keywords='prestashop orders api client',
     install_requires=["requests>=2.28.1", "xmltodict>=0.13.0"],
+    extras_require={"async": ["httpx>=0.23.0"], "arrow": ["pyarrow>=10.0.0"]},
     test_require=["pytest"],
     test_suite="pytest",
     python_requires='>=3.10',
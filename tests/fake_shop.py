@@ -0,0 +1,373 @@
+"""
+A local HTTP server imitating the PrestaShop webservice. It serves single resources, resource lists with the display,
+filter, sort and limit parameters, can delay every response and can be told to fail the next requests of a path.
+With validators it sends ETag and Last-Modified headers and answers conditional requests with 304. With gzip it
+compresses the responses of clients accepting it.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import namedtuple, defaultdict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from prestashop_orders_client.utils import RESOURCE_LISTS
+
+"""
+Field values which are rendered as a link to another resource, as a translated text or as a list of nested resources.
+"""
+Link = namedtuple("Link", "resource id")
+Translated = namedtuple("Translated", "text")
+Association = namedtuple("Association", "name item_name items")
+
+RESOURCE_ROOTS = {resource_list: xml_root for xml_root, resource_list in RESOURCE_LISTS.items()}
+
+
+class FakePrestaShop:
+    """
+    Serves the given resources until stopped. Can be used as a context manager.
+
+    resources maps a resource list name (orders, customers, ...) to a dictionary of id -> fields.
+    """
+
+    def __init__(self, resources: dict, api_key: str = "test_api_key", latency: float = 0.0,
+                 json_support: bool = True, validators: bool = False, gzip: bool = False):
+        self.resources = resources
+        self.api_key = api_key
+        self.latency = latency
+        self.json_support = json_support
+        self.validators = validators
+        self.gzip = gzip
+        self.compressed = 0
+        # Client addresses of all connections, one per connection
+        self.connections = set()
+        self.not_modified = 0
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failures = defaultdict(deque)
+        self._lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), self.__handler())
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, args=(0.05,), daemon=True)
+
+    @property
+    def link(self) -> str:
+        return "http://127.0.0.1:{}".format(self.__server.server_address[1])
+
+    def start(self) -> "FakePrestaShop":
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self) -> "FakePrestaShop":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def fail(self, path: str, *statuses: int, headers: dict = None):
+        """
+        Makes the next requests of the path answer with the given statuses, one status per request.
+        """
+        for status in statuses:
+            self._failures[path].append((status, headers or {}))
+
+    def requests_to(self, resource_list: str) -> int:
+        """
+        Counts the requests made to the given resource list or its resources.
+        """
+        return sum(1 for path, _ in self.requests if path.split("/")[2:3] == [resource_list])
+
+    def __handler(self):
+        shop = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with shop._lock:
+                    shop.connections.add(self.client_address)
+                    shop.in_flight += 1
+                    shop.max_in_flight = max(shop.max_in_flight, shop.in_flight)
+                try:
+                    time.sleep(shop.latency)
+                    status, headers, body = shop.respond(self.path, self.headers)
+                    if status == 200 and shop.validators:
+                        status, headers, body = shop.validate(self.headers, headers, body)
+                    if status == 200 and shop.gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+                        headers, body = headers | {"Content-Encoding": "gzip"}, gzip.compress(body)
+                        with shop._lock:
+                            shop.compressed += 1
+                finally:
+                    with shop._lock:
+                        shop.in_flight -= 1
+                self.send_response(status)
+                for header, value in headers.items():
+                    self.send_header(header, value)
+                if "Content-Type" not in headers:
+                    self.send_header("Content-Type", "text/xml;charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, raw_path: str, headers) -> tuple[int, dict, bytes]:
+        url = urlsplit(raw_path)
+        path, params = url.path.rstrip("/"), dict(parse_qsl(url.query))
+        with self._lock:
+            self.requests.append((path, params))
+            failure = self._failures[path].popleft() if self._failures[path] else None
+        if failure:
+            return failure[0], failure[1], b"<prestashop><errors><error>Failure</error></errors></prestashop>"
+        expected_auth = "Basic " + base64.b64encode(f"{self.api_key}:".encode()).decode()
+        if headers.get("Authorization") != expected_auth:
+            return 401, {}, b"<prestashop><errors><error>Unauthorized</error></errors></prestashop>"
+        parts = path.split("/")[2:]
+        if not parts:
+            return 200, {}, self.__document("<api shopName=\"Fake shop\"></api>")
+        resource_list = parts[0]
+        if resource_list not in self.resources:
+            return 404, {}, b"<prestashop><errors><error>Not found</error></errors></prestashop>"
+        as_json = self.json_support and params.get("output_format") == "JSON"
+        if len(parts) == 1:
+            if as_json:
+                return 200, JSON_HEADERS, json.dumps(self.render_json_list(resource_list, params)).encode()
+            return 200, {}, self.__document(self.render_list(resource_list, params))
+        fields = self.resources[resource_list].get(int(parts[1]))
+        if fields is None:
+            return 404, {}, b"<prestashop><errors><error>Not found</error></errors></prestashop>"
+        if as_json:
+            return 200, JSON_HEADERS, json.dumps({RESOURCE_ROOTS[resource_list]: _json_resource(fields)}).encode()
+        return 200, {}, self.__document(self.render_resource(resource_list, fields))
+
+    def validate(self, request_headers, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        """
+        Adds the validators of the body to the headers, or answers 304 if the client already has the body.
+        """
+        headers = headers | {"ETag": '"{}"'.format(hashlib.md5(body).hexdigest()), "Last-Modified": LAST_MODIFIED}
+        if_none_match = request_headers.get("If-None-Match")
+        if if_none_match == headers["ETag"] or \
+                (if_none_match is None and request_headers.get("If-Modified-Since") == LAST_MODIFIED):
+            with self._lock:
+                self.not_modified += 1
+            return 304, {"ETag": headers["ETag"]}, b""
+        return 200, headers, body
+
+    def render_list(self, resource_list: str, params: dict) -> str:
+        resources = self.select(resource_list, params)
+        display = params.get("display")
+        xml_root = RESOURCE_ROOTS[resource_list]
+        if display is None:
+            items = "".join(f'<{xml_root} id="{fields["id"]}" xlink:href="{self.link}/api/{resource_list}/'
+                            f'{fields["id"]}"/>' for fields in resources)
+        else:
+            shown = None if display == "full" else display.strip("[]").split(",")
+            items = "".join(self.render_resource(resource_list, fields, shown) for fields in resources)
+        return f"<{resource_list}>{items}</{resource_list}>"
+
+    def render_json_list(self, resource_list: str, params: dict):
+        resources = self.select(resource_list, params)
+        if not resources:
+            return []
+        display = params.get("display")
+        shown = ["id"] if display is None else None if display == "full" else display.strip("[]").split(",")
+        return {resource_list: [_json_resource(fields, shown) for fields in resources]}
+
+    def select(self, resource_list: str, params: dict) -> list[dict]:
+        resources = list(self.resources[resource_list].values())
+        for key, value in params.items():
+            if key.startswith("filter["):
+                resources = [fields for fields in resources if _matches(_plain(fields.get(key[7:-1])), value)]
+        for sort in reversed(params.get("sort", "[id_ASC]").strip("[]").split(",")):
+            field, direction = sort.rsplit("_", 1)
+            resources.sort(key=lambda fields: _sort_key(_plain(fields.get(field))), reverse=direction == "DESC")
+        if "limit" in params:
+            offset, _, amount = params["limit"].rpartition(",")
+            offset = int(offset or 0)
+            resources = resources[offset:offset + int(amount)]
+        return resources
+
+    def render_resource(self, resource_list: str, fields: dict, shown: list = None) -> str:
+        xml_root = RESOURCE_ROOTS[resource_list]
+        return "<{0}>{1}</{0}>".format(xml_root, "".join(self.__render_field(field, value)
+                                                         for field, value in fields.items()
+                                                         if shown is None or field in shown))
+
+    def __render_field(self, field: str, value) -> str:
+        if isinstance(value, Link):
+            return f'<{field} xlink:href="{self.link}/api/{value.resource}/{value.id}"><![CDATA[{value.id}]]></{field}>'
+        if isinstance(value, Translated):
+            return f'<{field}><language id="1" xlink:href="{self.link}/api/languages/1">' \
+                   f'<![CDATA[{value.text}]]></language></{field}>'
+        if isinstance(value, Association):
+            items = "".join("<{0}>{1}</{0}>".format(value.item_name, "".join(
+                self.__render_field(item_field, item_value) for item_field, item_value in item.items()))
+                            for item in value.items)
+            return f'<associations><{value.name} nodeType="{value.item_name}" virtualEntity="true">{items}' \
+                   f'</{value.name}></associations>'
+        if value is None or value == "":
+            return f"<{field}></{field}>"
+        return f"<{field}><![CDATA[{value}]]></{field}>"
+
+    @staticmethod
+    def __document(content: str) -> bytes:
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<prestashop xmlns:xlink="http://www.w3.org/1999/xlink">{content}</prestashop>').encode()
+
+
+JSON_HEADERS = {"Content-Type": "application/json;charset=utf-8"}
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+def _json_resource(fields: dict, shown: list = None) -> dict:
+    return {field: _json_value(field, value) for field, value in fields.items() if shown is None or field in shown}
+
+
+def _json_value(field: str, value):
+    if isinstance(value, Link):
+        return str(value.id)
+    if isinstance(value, Translated):
+        return [{"id": "1", "value": value.text}]
+    if isinstance(value, Association):
+        return {value.name: [_json_resource(item) for item in value.items]}
+    if value is None:
+        return ""
+    return value if field == "id" else str(value)
+
+
+def _plain(value):
+    if isinstance(value, Link):
+        return value.id
+    if isinstance(value, Translated):
+        return value.text
+    return value
+
+
+def _sort_key(value):
+    text = "" if value is None else str(value)
+    return (0, float(text), "") if _is_number(text) else (1, 0, text)
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _compare(value, other: str) -> int:
+    left, right = _sort_key(value), _sort_key(other)
+    return (left > right) - (left < right)
+
+
+def _matches(value, condition: str) -> bool:
+    if condition.startswith(">["):
+        return _compare(value, condition[2:-1]) > 0
+    if condition.startswith("<["):
+        return _compare(value, condition[2:-1]) < 0
+    inner = condition.strip("[]")
+    if "," in inner:
+        low, high = inner.split(",", 1)
+        return _compare(value, low) >= 0 and _compare(value, high) <= 0
+    return any(_compare(value, option) == 0 for option in inner.split("|"))
+
+
+ORDER_STATES = ["Awaiting payment", "Payment accepted", "Processing in progress", "Shipped", "Delivered"]
+COUNTRIES = [("Austria", False), ("Germany", False), ("United States", True)]
+STATES = ["Alabama", "Alaska", "Arizona", "California"]
+PRODUCTS = 50
+
+
+def make_shop(orders_amount: int, customers_amount: int = None, seed: int = 1) -> dict:
+    """
+    Generates the resources of a shop with the given amount of orders. Customers order several times, every customer
+    has one address, addresses in the United States have a state.
+    """
+    generator = random.Random(seed)
+    customers_amount = customers_amount or max(1, orders_amount // 3)
+    resources = {
+        "order_states": {i: {"id": i, "name": Translated(name)} for i, name in enumerate(ORDER_STATES, 1)},
+        "countries": {i: {"id": i, "iso_code": name[:2].upper(), "contains_states": int(has_states),
+                          "name": Translated(name)} for i, (name, has_states) in enumerate(COUNTRIES, 1)},
+        "states": {i: {"id": i, "id_country": Link("countries", 3), "name": name}
+                   for i, name in enumerate(STATES, 1)},
+        "products": {i: {"id": i, "reference": f"SKU{i:04d}", "ean13": f"{4000000000000 + i}" if i % 5 else None,
+                         "weight": f"{i / 10:.6f}", "price": "9.900000", "name": Translated(f"Product {i}")}
+                     for i in range(1, PRODUCTS + 1)},
+        "customers": {}, "addresses": {}, "orders": {},
+    }
+    for i in range(1, customers_amount + 1):
+        country = generator.randint(1, len(COUNTRIES))
+        resources["customers"][i] = {"id": i, "lastname": f"Doe{i}", "firstname": "John", "passwd": "x" * 60,
+                                     "email": f"customer{i}@example.com", "newsletter": 0}
+        resources["addresses"][i] = {
+            "id": i, "id_customer": Link("customers", i), "id_country": Link("countries", country),
+            "id_state": Link("states", generator.randint(1, len(STATES))) if COUNTRIES[country - 1][1] else "0",
+            "company": "Company" if i % 4 == 0 else None, "lastname": f"Doe{i}", "firstname": "John",
+            "address1": f"Street {i}", "address2": "Floor 2" if i % 3 == 0 else None, "postcode": f"{1000 + i}",
+            "city": f"City {i % 10}", "phone": f"+43 {i:08d}"}
+    for i in range(1, orders_amount + 1):
+        customer = generator.randint(1, customers_amount)
+        rows = [{"id": i * 10 + row, "product_id": Link("products", generator.randint(1, PRODUCTS)),
+                 "product_attribute_id": 0, "product_quantity": generator.randint(1, 3),
+                 "product_name": f"Product {row}", "product_reference": f"REF{row}",
+                 "product_ean13": "", "product_price": "9.900000", "unit_price_tax_incl": "11.880000"}
+                for row in range(1, generator.randint(1, 4) + 1)]
+        day = 1 + (i - 1) // 50 % 28
+        resources["orders"][i] = {
+            "id": i, "id_address_delivery": Link("addresses", customer), "id_customer": Link("customers", customer),
+            "current_state": Link("order_states", generator.randint(1, len(ORDER_STATES))),
+            "date_add": f"2024-01-{day:02d} 10:{i % 60:02d}:00", "date_upd": f"2024-01-{day:02d} 12:{i % 60:02d}:00",
+            "payment": "Bank wire", "total_paid": f"{10 + i % 90}.500000", "reference": f"REF{i:06d}",
+            "associations": Association("order_rows", "order_row", rows)}
+    return resources
+
+
+def expected_order(resources: dict, order_id: int, rows: bool = False, products: bool = False):
+    """
+    Builds the Order the client should return for the given order of a generated shop, with its order rows if the
+    client reads them and the products of the rows if it resolves them.
+    """
+    from prestashop_orders_client.utils import Order, OrderRow
+
+    order = resources["orders"][order_id]
+    address = resources["addresses"][order["id_address_delivery"].id]
+    state = address["id_state"]
+    return Order(id=order_id, total_paid=float(order["total_paid"]), reference=order["reference"],
+                 order_state=resources["order_states"][order["current_state"].id]["name"].text,
+                 email=resources["customers"][order["id_customer"].id]["email"],
+                 first_name=address["firstname"], last_name=address["lastname"], company_name=address["company"],
+                 phone=address["phone"],
+                 address=address["address1"] + (" " + address["address2"] if address["address2"] else ""),
+                 city=address["city"], post_code=address["postcode"],
+                 country=resources["countries"][address["id_country"].id]["name"].text,
+                 state=resources["states"][state.id]["name"] if isinstance(state, Link) else None,
+                 rows=[OrderRow(id=row["id"], product_id=row["product_id"].id,
+                                product_attribute_id=row["product_attribute_id"], quantity=row["product_quantity"],
+                                name=row["product_name"], reference=row["product_reference"],
+                                ean13=row["product_ean13"] or None,
+                                unit_price_tax_incl=float(row["unit_price_tax_incl"]),
+                                product=_expected_product(resources, row["product_id"].id) if products else None)
+                       for row in order["associations"].items] if rows or products else None)
+
+
+def _expected_product(resources: dict, product_id: int):
+    from prestashop_orders_client.utils import Product
+
+    product = resources["products"].get(product_id)
+    return None if product is None else Product(id=product_id, reference=product["reference"],
+                                                ean13=product["ean13"], weight=float(product["weight"]))
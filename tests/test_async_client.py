@@ -0,0 +1,161 @@
+from unittest import IsolatedAsyncioTestCase
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.async_client import AsyncPrestaShopOrderClient
+from prestashop_orders_client.exceptions import InvalidApiKeyError, WebServiceUnavailableError, \
+    PrestaShopConnectionError, InvalidOrderNumber, ResourceForbiddenError
+from prestashop_orders_client.transport import RetryPolicy
+
+
+class TestAsyncPrestaShopOrderClient(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(25)
+        self.shop = FakePrestaShop(self.resources, self.api_key, latency=0.005).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    async def test_get_order(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key) as client:
+            # Connecting only checks the connection, orders are counted on first use
+            self.assertIsNone(client.orders_amount)
+            order = await client.get_order(7)
+
+        self.assertEqual(client.orders_amount, 25)
+        self.assertEqual(order, expected_order(self.resources, 7))
+
+    async def test_iter_orders_keeps_order_and_concurrency_limit(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, max_concurrency=4) as client:
+            orders = [order async for order in client.iter_orders()]
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 26)])
+        # Orders were fetched concurrently, but never with more requests at once than allowed
+        self.assertGreater(self.shop.max_in_flight, 1)
+        self.assertLessEqual(self.shop.max_in_flight, 4)
+
+    async def test_orders_with_gaps(self):
+        for order_id in (3, 17):
+            del self.resources["orders"][order_id]
+        self.resources["orders"][40] = self.resources["orders"][1] | {"id": 40}
+        expected = [expected_order(self.resources, i) for i in range(1, 26) if i not in (3, 17)] + \
+            [expected_order(self.resources, 40)]
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key) as client:
+            # Deleted orders are rejected like by PrestaShopOrderClient and skipped when reading all orders
+            with self.assertRaises(InvalidOrderNumber):
+                await client.get_order(3)
+            with self.assertRaises(InvalidOrderNumber):
+                await client.get_orders_bulk([2, 17])
+            orders = await client.get_all_orders()
+            bulk_orders = await client.get_all_orders_bulk(page_size=10)
+            # An order created later is found without loading all ids again
+            self.resources["orders"][41] = self.resources["orders"][2] | {"id": 41}
+            order = await client.get_order(41)
+
+        self.assertEqual(orders, expected)
+        self.assertEqual(bulk_orders, expected)
+        self.assertEqual(order, expected_order(self.resources, 41))
+        self.assertEqual(client.orders_amount, 25)
+        self.assertIn(">[40]", [params.get("filter[id]") for _, params in self.shop.requests])
+
+    async def test_get_all_orders_batch(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key) as client:
+            batch = await client.get_all_orders_batch()
+
+        self.assertEqual(list(batch), [expected_order(self.resources, i) for i in range(1, 26)])
+
+    async def test_get_orders_bulk(self):
+        numbers = [17, 3, 25, 3, 8]
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key) as client:
+            orders = await client.get_orders_bulk(numbers, page_size=2)
+            with self.assertRaises(InvalidOrderNumber):
+                await client.get_orders_bulk([26])
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in numbers])
+        # The ids, two pages of orders and the ids above the highest one looking for order 26, every referenced order
+        # state with a single request
+        self.assertEqual(self.shop.requests_to("orders"), 1 + 2 + 1)
+        self.assertLessEqual(self.shop.requests_to("order_states"), 3)
+
+    async def test_get_all_orders_bulk(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, max_concurrency=4) as client:
+            orders = await client.get_all_orders_bulk(page_size=10)
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 26)])
+        self.assertEqual(self.shop.requests_to("orders"), 1 + 3)
+        self.assertLessEqual(self.shop.requests_to("countries"), 1)
+        self.assertLessEqual(self.shop.max_in_flight, 4)
+
+    async def test_extra_fields(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, extra_fields={"order": ["payment"]}) \
+                as client:
+            order = await client.get_order(7)
+
+        self.assertEqual(order, expected_order(self.resources, 7)._replace(extra={"order": {"payment": "Bank wire"}}))
+        self.assertTrue(all(params.get("display") != "full" for _, params in self.shop.requests))
+
+    async def test_products(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON", products=True) \
+                as client:
+            order = await client.get_order(7)
+            orders = await client.get_all_orders_bulk(page_size=10)
+
+        self.assertEqual(order, expected_order(self.resources, 7, products=True))
+        self.assertEqual(orders, [expected_order(self.resources, i, products=True) for i in range(1, 26)])
+        # Products are read in batches, not once per order row
+        self.assertLess(self.shop.requests_to("products"), len(orders))
+
+    async def test_json_output_format(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON") as client:
+            orders = await client.get_all_orders()
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 26)])
+        self.assertEqual(self.shop.requests[-1][1].get("output_format"), "JSON")
+
+    async def test_compression_and_connection_reuse(self):
+        self.shop.gzip = True
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, max_concurrency=2) as client:
+            orders = await client.get_orders_bulk([1, 2, 3])
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in (1, 2, 3)])
+        self.assertEqual(self.shop.compressed, len(self.shop.requests))
+        self.assertLessEqual(len(self.shop.connections), 2)
+
+    async def test_timeout(self):
+        self.shop.latency = 0.5
+        with self.assertRaises(PrestaShopConnectionError):
+            async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, timeout=0.05,
+                                                  retry_policy=RetryPolicy(retries=0)):
+                pass
+
+    async def test_get_invalid_order(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key) as client:
+            with self.assertRaises(InvalidOrderNumber):
+                await client.get_order(26)
+
+    async def test_invalid_api_key(self):
+        with self.assertRaises(InvalidApiKeyError):
+            async with AsyncPrestaShopOrderClient(self.shop.link, "wrong_api_key"):
+                pass
+
+    async def test_web_service_unavailable(self):
+        self.shop.fail("/api", 503)
+        with self.assertRaises(WebServiceUnavailableError):
+            async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key):
+                pass
+
+    async def test_resource_forbidden(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key) as client:
+            self.shop.fail("/api/customers", 401)
+            with self.assertRaises(ResourceForbiddenError):
+                await client.get_order(3)
+
+    async def test_connection_error(self):
+        link = self.shop.link
+        self.shop.stop()
+        with self.assertRaises(PrestaShopConnectionError):
+            async with AsyncPrestaShopOrderClient(link, self.api_key):
+                pass
+        # Restart so tearDown can stop it again
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
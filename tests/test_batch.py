@@ -0,0 +1,114 @@
+from unittest import TestCase, skipUnless
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.batch import OrderBatch, pyarrow
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.utils import Order, OrderRow, Product
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+def make_order(order_id: int, **fields) -> Order:
+    return Order(**{"id": order_id, "total_paid": order_id + 0.5, "reference": f"REF{order_id}",
+                    "order_state": "Shipped", "email": f"customer{order_id}@example.com", "first_name": "John",
+                    "last_name": "Doe", "company_name": None, "phone": "+43 1", "address": "Straße 1",
+                    "city": "Wien", "post_code": "1010", "country": "Austria", "state": None} | fields)
+
+
+class TestOrderBatch(TestCase):
+
+    def setUp(self):
+        # Company names and phones are missing on some rows, across more than one byte of the validity bitmap
+        self.orders = [make_order(i, company_name="Company" if i % 3 == 0 else None,
+                                  phone=None if i % 7 == 0 else f"+43 {i}",
+                                  country="Germany" if i % 2 else "Austria") for i in range(1, 21)]
+        self.batch = OrderBatch(self.orders)
+
+    def test_rows_are_orders(self):
+        self.assertEqual(len(self.batch), 20)
+        self.assertEqual(list(self.batch), self.orders)
+        self.assertEqual(self.batch[0], self.orders[0])
+        self.assertEqual(self.batch[-1], self.orders[-1])
+        self.assertEqual(list(self.batch[5:10]), self.orders[5:10])
+        with self.assertRaises(IndexError):
+            self.batch[20]
+
+    def test_column(self):
+        self.assertEqual(self.batch.column("id"), list(range(1, 21)))
+        self.assertEqual(self.batch.column("phone"), [order.phone for order in self.orders])
+        self.assertEqual(self.batch.column("country"), [order.country for order in self.orders])
+        with self.assertRaises(KeyError):
+            self.batch.column("unknown")
+
+    def test_append_after_none(self):
+        batch = OrderBatch([make_order(1, state=None)])
+        batch.append(make_order(2, state="Alaska"))
+
+        self.assertEqual(batch.column("state"), [None, "Alaska"])
+
+    def test_extra(self):
+        batch = OrderBatch([make_order(1), make_order(2, extra={"order": {"payment": "Bank wire"}})])
+
+        self.assertEqual(batch[1].extra, {"order": {"payment": "Bank wire"}})
+        self.assertEqual(batch.column("extra"), [None, {"order": {"payment": "Bank wire"}}])
+
+    def test_order_rows(self):
+        rows = [OrderRow(11, 8, 0, 2, "Product 1", "REF1", None, 11.88, Product(8, "SKU0008", None, 0.8))]
+        batch = OrderBatch([make_order(1, rows=rows), make_order(2)])
+
+        self.assertEqual(batch[0].rows, rows)
+        self.assertEqual(batch.column("rows"), [rows, None])
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    def test_to_arrow(self):
+        table = self.batch.to_arrow()
+
+        self.assertEqual(table.column_names, list(Order._fields))
+        self.assertEqual(table.column("id").to_pylist(), list(range(1, 21)))
+        self.assertEqual(table.column("address").to_pylist(), ["Straße 1"] * 20)
+        self.assertEqual(table.column("phone").to_pylist(), [order.phone for order in self.orders])
+        self.assertEqual(table.column("company_name").to_pylist(), [order.company_name for order in self.orders])
+        # Repeated fields are dictionary encoded, every country is stored once
+        self.assertEqual(len(table.column("country").chunk(0).dictionary), 2)
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    def test_extra_to_arrow(self):
+        table = OrderBatch([make_order(1), make_order(2, extra={"order": {"payment": "Bank wire"}})]).to_arrow()
+
+        self.assertEqual(table.column("extra").to_pylist(), [None, {"order": {"payment": "Bank wire"}}])
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    def test_order_rows_to_arrow(self):
+        rows = [OrderRow(11, 8, 0, 2, "Product 1", "REF1", None, 11.88, Product(8, "SKU0008", None, 0.8))]
+        table = OrderBatch([make_order(1, rows=rows), make_order(2)]).to_arrow()
+
+        self.assertEqual(table.column("rows").to_pylist()[1], None)
+        self.assertEqual(table.column("rows").to_pylist()[0][0]["product"]["weight"], 0.8)
+
+    @skipUnless(pyarrow and pandas, "pyarrow or pandas is not installed")
+    def test_to_pandas(self):
+        frame = self.batch.to_pandas()
+
+        self.assertEqual(len(frame), 20)
+        self.assertEqual(frame["total_paid"].tolist(), [order.total_paid for order in self.orders])
+        self.assertEqual(str(frame["country"].dtype), "category")
+
+
+class TestOrderBatchClient(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(15)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    def test_get_all_orders_batch(self):
+        batch = PrestaShopOrderClient(self.shop.link, self.api_key).get_all_orders_batch(page_size=4)
+
+        self.assertIsInstance(batch, OrderBatch)
+        self.assertEqual(list(batch), [expected_order(self.resources, i) for i in range(1, 16)])
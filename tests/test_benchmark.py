@@ -0,0 +1,37 @@
+import os
+import sys
+from unittest import TestCase
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from benchmark import run_benchmarks, compare, format_results, BenchmarkResult
+
+
+class TestBenchmark(TestCase):
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(orders=20, latency=0.0, modes=["get_order", "get_all_orders_bulk"], repeat=1)
+
+        self.assertEqual([result.mode for result in results], ["get_order", "get_all_orders_bulk"])
+        single, bulk = results
+        self.assertEqual((single.orders, bulk.orders), (20, 20))
+        # Five or six requests per order, against a few requests for all of them
+        self.assertGreater(single.requests / single.orders, 4)
+        self.assertLess(bulk.requests, 10)
+        self.assertGreater(bulk.peak_memory, 0)
+        self.assertIn("get_all_orders_bulk", format_results(results))
+
+    def test_compare(self):
+        baseline = {"get_order": {"requests": 100, "wall": 1.0, "cpu": 0.5, "peak_memory": 1000}}
+        results = [BenchmarkResult("get_order", 20, 100, 1.1, 0.9, 1000),
+                   BenchmarkResult("get_all_orders_bulk", 20, 5, 0.1, 0.1, 1000)]
+
+        self.assertEqual(len(compare(results, baseline, tolerance=0.2)), 1)
+        self.assertIn("cpu", compare(results, baseline, tolerance=0.2)[0])
+        self.assertEqual(compare(results, baseline, tolerance=1.0), [])
+
+    def test_compare_with_zero_baseline(self):
+        baseline = {"get_order": {"requests": 100, "wall": 1.0, "cpu": 0.0, "peak_memory": 1000}}
+        results = [BenchmarkResult("get_order", 20, 100, 1.0, 0.1, 1000)]
+
+        self.assertEqual(compare(results, baseline, tolerance=0.2), ["get_order: cpu 0.1 > 0"])
@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+from prestashop_orders_client.cache import ResourceCache
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestResourceCache(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResourceCache(max_size=2, ttls={"country": 100, "customer": 10, "state": None},
+                                   clock=self.clock)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get("country", "1"))
+        self.cache.set("country", "1", {"id": "1"})
+
+        self.assertEqual(self.cache.get("country", 1), {"id": "1"})
+        self.assertEqual(self.cache.hits["country"], 1)
+        self.assertEqual(self.cache.misses["country"], 1)
+
+    def test_expired_by_resource_ttl(self):
+        self.cache.set("country", "1", {"id": "1"})
+        self.cache.set("customer", "1", {"id": "1"})
+        self.clock.now = 50
+
+        # The customer TTL is over, the country one is not
+        self.assertIsNone(self.cache.get("customer", "1"))
+        self.assertEqual(self.cache.get("country", "1"), {"id": "1"})
+        self.assertEqual(len(self.cache), 1)
+
+    def test_ttl_none_never_expires(self):
+        self.cache.set("state", "1", {"id": "1"})
+        self.clock.now = 10 ** 9
+        self.assertEqual(self.cache.get("state", "1"), {"id": "1"})
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("country", "1", {"id": "1"})
+        self.cache.set("country", "2", {"id": "2"})
+        # Reading country 1 makes country 2 the least recently used one
+        self.cache.get("country", "1")
+        self.cache.set("country", "3", {"id": "3"})
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("country", "2"))
+        self.assertIsNotNone(self.cache.get("country", "1"))
+
+    def test_resource_without_ttl_is_not_cached(self):
+        self.cache.set("order", "1", {"id": "1"})
+        self.assertIsNone(self.cache.get("order", "1"))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.misses["order"], 0)
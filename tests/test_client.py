@@ -1,14 +1,24 @@
+import time
 from unittest import TestCase
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, call
 
 import requests
 
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.cache import ResourceCache
 from prestashop_orders_client.client import PrestaShopOrderClient
 from prestashop_orders_client.exceptions import OrdersNotFound, PrestaShopConnectionError, \
     UnexpectedStatusCodeError, \
-    WebServiceUnavailableError, InvalidApiKeyError, InvalidOrderNumber
-from prestashop_orders_client.utils import Order
+    WebServiceUnavailableError, InvalidApiKeyError, InvalidOrderNumber, ResourceForbiddenError
 from prestashop_orders_client.parser import _OrderParser
+from prestashop_orders_client.transport import RetryPolicy, RetryingAdapter
+from prestashop_orders_client.utils import Order, SyncWatermark, RESOURCE_FIELDS, _OrderIdIndex
+
+
+def order_id_index(ids) -> _OrderIdIndex:
+    index = _OrderIdIndex()
+    index.extend([{"id": order_id} for order_id in ids])
+    return index
 
 
 class TestPrestaShopOrderClient(TestCase):
@@ -19,12 +29,12 @@ class TestPrestaShopOrderClient(TestCase):
 
     @patch.object(_OrderParser, "parse_order")
     @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
-    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__count_orders')
-    def test_get_valid_order(self, mock_count_orders, mock_establish_connection: Mock, mock_parse_order: Mock):
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
+    def test_get_valid_order(self, mock_load_order_ids, mock_establish_connection: Mock, mock_parse_order: Mock):
         # Set up the mock __establish_connection method to return the mock session
         mock_establish_connection.return_value = Mock()
-        # Set up the mock to return a dictionary with two orders
-        mock_count_orders.return_value = 10
+        # Set up the mock to return the ids of ten orders
+        mock_load_order_ids.return_value = order_id_index(range(1, 11))
         # Set up the mock to return a valid order
         mock_parse_order.return_value = Mock(spec=Order)
         # Initialize the PrestaShopApi object
@@ -34,68 +44,106 @@ class TestPrestaShopOrderClient(TestCase):
 
         self.assertIsInstance(order, Order)
         # Check that the mock __establish_connection method was called
-        mock_count_orders.assert_called_once()
-        # Check that the mock __count_orders method was called
+        mock_load_order_ids.assert_called_once()
+        # Check that the mock __load_order_ids method was called
         mock_establish_connection.assert_called_once_with(self.api_key)
         # Check that the mock parse_order method was called
         mock_parse_order.assert_called_once_with(f"https://{self.shop_link}/api/orders/5")
 
     @patch.object(_OrderParser, "parse_order")
     @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
-    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__count_orders')
-    def test_get_invalid_order(self, mock_count_orders, mock_establish_connection: Mock, mock_parse_order: Mock):
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
+    def test_get_invalid_order(self, mock_load_order_ids, mock_establish_connection: Mock, mock_parse_order: Mock):
         # Set up the mock __establish_connection method to return the mock session
         mock_establish_connection.return_value = Mock()
-        # Set up the mock to return a dictionary with two orders
-        mock_count_orders.return_value = 10
+        # Set up the mock to return the ids of ten orders, order 4 was deleted
+        mock_load_order_ids.return_value = order_id_index([1, 2, 3, 5, 6, 7, 8, 9, 10, 11])
         # Set up the mock to return a valid order
         mock_parse_order.return_value = Mock(spec=Order)
         # Initialize the PrestaShopApi object
         api = PrestaShopOrderClient(self.shop_link, self.api_key)
         # Call the get_order method
         with self.assertRaises(InvalidOrderNumber):
-            api.get_order(11)
+            api.get_order(4)
+        mock_parse_order.assert_not_called()
+
+    @patch.object(_OrderParser, "parse_order")
+    @patch("prestashop_orders_client.client._get_resources_as_list")
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
+    def test_get_order_created_after_loading_ids(self, mock_load_order_ids, mock_establish_connection: Mock,
+                                                 mock__get_resources_as_list: Mock, mock_parse_order: Mock):
+        mock_establish_connection.return_value = Mock()
+        mock_load_order_ids.return_value = order_id_index(range(1, 11))
+        # Orders 11 and 12 were created after the ids were loaded
+        mock__get_resources_as_list.return_value = [{"id": "11"}, {"id": "12"}]
+        api = PrestaShopOrderClient(self.shop_link, self.api_key)
+
+        api.get_order(12)
+
+        # Only ids newer than the known ones were requested
+        mock__get_resources_as_list.assert_called_once_with(
+            mock_establish_connection.return_value, f"https://{self.shop_link}/api/orders", "order",
+            {"display": "[id]", "sort": "[id_ASC]", "filter[id]": ">[10]"}, fields=("id",), metrics=api.metrics)
+        self.assertEqual(api.orders_amount, 12)
+        mock_parse_order.assert_called_once_with(f"https://{self.shop_link}/api/orders/12")
 
     @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
-    @patch("prestashop_orders_client.client._get_resource_as_dict")
-    def test_count_orders(self, mock__get_resource_as_dict: Mock, mock_establish_connection: Mock):
+    @patch("prestashop_orders_client.client._get_resources_as_list")
+    def test_count_orders(self, mock__get_resources_as_list: Mock, mock_establish_connection: Mock):
         # Set up the mock __establish_connection method to return the mock session
         mock_establish_connection.return_value = Mock()
 
-        # Set up the mock to return a dictionary with two orders
-        mock__get_resource_as_dict.return_value = {"order": [{}, {}]}
+        # Set up the mock to return the ids of two orders with a gap between them
+        mock__get_resources_as_list.return_value = [{"id": "2"}, {"id": "7"}]
 
         # Initialize the PrestaShopApi object
         api = PrestaShopOrderClient(self.shop_link, self.api_key)
 
         # Check that the orders_amount attribute is set to 2
         self.assertEqual(api.orders_amount, 2)
+        self.assertEqual(list(api.order_ids), [2, 7])
+        mock__get_resources_as_list.assert_called_once_with(mock_establish_connection.return_value,
+                                                            f"https://{self.shop_link}/api/orders", "order",
+                                                            {"display": "[id]", "sort": "[id_ASC]",
+                                                             "filter[id]": ">[0]"}, fields=("id",),
+                                                            metrics=api.metrics)
 
     @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
-    @patch("prestashop_orders_client.client._get_resource_as_dict")
-    def test_count_orders_with_zero_orders(self, mock__get_resource_as_dict: Mock, mock_establish_connection: Mock):
+    @patch("prestashop_orders_client.client._get_resources_as_list")
+    def test_count_orders_with_zero_orders(self, mock__get_resources_as_list: Mock, mock_establish_connection: Mock):
         # Set up the mock __establish_connection method to return the mock session
         mock_establish_connection.return_value = Mock()
-        # Set up the mock to return an empty dictionary
-        mock__get_resource_as_dict.return_value = {}
+        # Set up the mock to return an empty list
+        mock__get_resources_as_list.return_value = []
+        # Orders are counted on first access, creating the client makes no request for it
+        api = PrestaShopOrderClient(self.shop_link, self.api_key)
+        mock__get_resources_as_list.assert_not_called()
         # Assert that the OrdersNotFound exception is raised
         with self.assertRaises(OrdersNotFound):
-            PrestaShopOrderClient(self.shop_link, self.api_key)
+            api.orders_amount
 
-    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__count_orders')
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
     @patch('requests.Session.get')
-    def test_establish_connection_success(self, mock_session_get: Mock, mock_count_orders: Mock):
+    def test_establish_connection_success(self, mock_session_get: Mock, mock_load_order_ids: Mock):
         # Set up the mock session to return a 200 status code
         mock_response = Mock()
         mock_response.status_code = 200
         mock_session_get.return_value = mock_response
-        # Set up the mock count_orders method to return 1
-        mock_count_orders.return_value = 1
+        # Set up the mock __load_order_ids method to return one order id
+        mock_load_order_ids.return_value = order_id_index(range(1, 2))
         # Initialize the PrestaShopApi object
         api = PrestaShopOrderClient(self.shop_link, self.api_key)
         # Check that the __session attribute is set to the mock session
         self.assertIsInstance(api, PrestaShopOrderClient)
 
+    @patch('requests.Session.get')
+    def test_skip_connection_check(self, mock_session_get: Mock):
+        # Without the connection check the client is created without any request
+        api = PrestaShopOrderClient(self.shop_link, self.api_key, check_connection=False)
+        self.assertIsInstance(api, PrestaShopOrderClient)
+        mock_session_get.assert_not_called()
+
     @patch('requests.Session.get')
     def test_establish_connection_unavailable(self, mock_session_get: Mock):
         # Set up the mock session to return a 503 status code
@@ -128,3 +176,412 @@ class TestPrestaShopOrderClient(TestCase):
         mock_session_get.side_effect = requests.exceptions.HTTPError
         with self.assertRaises(PrestaShopConnectionError):
             PrestaShopOrderClient(self.shop_link, self.api_key)
+
+    @patch.object(_OrderParser, "parse_orders")
+    @patch("prestashop_orders_client.client._get_resources_as_list")
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
+    def test_get_all_orders_bulk(self, mock_load_order_ids, mock_establish_connection: Mock,
+                                 mock__get_resources_as_list: Mock, mock_parse_orders: Mock):
+        mock_establish_connection.return_value = Mock()
+        mock_load_order_ids.return_value = order_id_index(range(1, 4))
+        # Set up two pages, the second one is not full so paging stops there
+        first_page, second_page = [{"id": "1"}, {"id": "2"}], [{"id": "3"}]
+        mock__get_resources_as_list.side_effect = [first_page, second_page]
+        mock_parse_orders.side_effect = lambda orders_data, chunk_size: [int(data["id"]) for data in orders_data]
+
+        api = PrestaShopOrderClient(self.shop_link, self.api_key)
+        orders = api.get_all_orders_bulk(page_size=2)
+
+        self.assertEqual(orders, [1, 2, 3])
+        orders_link = f"https://{self.shop_link}/api/orders"
+        # Only the fields orders are built from are requested
+        display = "[{}]".format(",".join(RESOURCE_FIELDS["order"]))
+        mock__get_resources_as_list.assert_has_calls([
+            call(mock_establish_connection.return_value, orders_link, "order",
+                 {"display": display, "sort": "[id_ASC]", "limit": "0,2"}, fields=RESOURCE_FIELDS["order"],
+                 metrics=api.metrics),
+            call(mock_establish_connection.return_value, orders_link, "order",
+                 {"display": display, "sort": "[id_ASC]", "filter[id]": ">[2]", "limit": 2},
+                 fields=RESOURCE_FIELDS["order"], metrics=api.metrics),
+        ])
+        # The resources of the orders are read in chunks of the page size as well
+        mock_parse_orders.assert_has_calls([call(first_page, 2), call(second_page, 2)])
+
+    @patch.object(_OrderParser, "parse_order")
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
+    def test_get_orders_concurrently(self, mock_load_order_ids, mock_establish_connection: Mock,
+                                     mock_parse_order: Mock):
+        mock_establish_connection.return_value = Mock()
+        mock_load_order_ids.return_value = order_id_index(range(1, 11))
+
+        # Later orders finish first, the result must still follow the requested order
+        def parse_order(order_link):
+            number = int(order_link.rsplit("/", 1)[1])
+            time.sleep((10 - number) / 1000)
+            return number
+
+        mock_parse_order.side_effect = parse_order
+        api = PrestaShopOrderClient(self.shop_link, self.api_key)
+        orders = api.get_all_orders(workers=4)
+
+        self.assertEqual(orders, list(range(1, 11)))
+        # The connection pool is sized for the orders and their resources fetched at the same time
+        self.assertEqual(mock_establish_connection.return_value.mount.call_count, 2)
+
+    @patch.object(_OrderParser, "parse_order")
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__establish_connection')
+    @patch.object(PrestaShopOrderClient, '_PrestaShopOrderClient__load_order_ids')
+    def test_get_orders_with_invalid_number(self, mock_load_order_ids, mock_establish_connection: Mock,
+                                            mock_parse_order: Mock):
+        mock_establish_connection.return_value = Mock()
+        mock_load_order_ids.return_value = order_id_index([1, 2, 3, 4, 6, 7, 8, 9, 10])
+        api = PrestaShopOrderClient(self.shop_link, self.api_key)
+        # Invalid numbers are rejected before any order is fetched
+        with self.assertRaises(InvalidOrderNumber):
+            api.get_orders([1, 2, 5], workers=4)
+        mock_parse_order.assert_not_called()
+
+
+class TestPrestaShopOrderClientWithFakeShop(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(30)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    def test_cheap_startup(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        # Only the connection check is made when the client is created
+        self.assertEqual(self.shop.requests, [("/api", {})])
+        self.assertEqual(api.orders_amount, 30)
+
+    def test_orders_with_gaps(self):
+        for order_id in (4, 17, 30):
+            del self.resources["orders"][order_id]
+        self.resources["orders"][45] = self.resources["orders"][1] | {"id": 45}
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+
+        orders = api.get_all_orders(workers=4)
+
+        # Deleted orders are skipped and orders with ids above the amount of orders are fetched
+        self.assertEqual([order.id for order in orders], [i for i in range(1, 30) if i not in (4, 17)] + [45])
+        self.assertEqual(api.orders_amount, 28)
+        with self.assertRaises(InvalidOrderNumber):
+            api.get_order(17)
+
+    def test_resized_connection_pool_closes_replaced_adapter(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        with patch.object(RetryingAdapter, "close") as close:
+            api.get_all_orders(workers=4)
+            # A pool large enough already is kept
+            api.get_all_orders(workers=2)
+
+        close.assert_called_once_with()
+
+    def test_refresh_order_ids(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.assertEqual(api.orders_amount, 30)
+        self.resources["orders"][31] = self.resources["orders"][30] | {"id": 31}
+
+        self.assertEqual(api.refresh_order_ids(), 1)
+        self.assertEqual(api.order_ids[-1], 31)
+        self.assertEqual(self.shop.requests[-1][1]["filter[id]"], ">[30]")
+
+    def test_get_all_orders_with_cache(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, cache=ResourceCache())
+        orders = api.get_all_orders()
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 31)])
+        # Shared resources are fetched once, no matter how many orders use them
+        self.assertEqual(self.shop.requests_to("orders"), 31)
+        self.assertLessEqual(self.shop.requests_to("order_states"), len(self.resources["order_states"]))
+        self.assertLessEqual(self.shop.requests_to("countries"), len(self.resources["countries"]))
+        self.assertLessEqual(self.shop.requests_to("customers"), len(self.resources["customers"]))
+        self.assertGreater(sum(api.cache.hits.values()), 0)
+
+    def test_preload_resources(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, cache=ResourceCache(), preload=True)
+        orders = api.get_orders([1, 2, 3], workers=3)
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in (1, 2, 3)])
+        # Reference resources were read with one list request each and never one by one
+        self.assertEqual(self.shop.requests_to("order_states"), 1)
+        self.assertEqual(self.shop.requests_to("countries"), 1)
+        self.assertEqual(self.shop.requests_to("states"), 1)
+
+    def test_get_orders_since_id(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        orders, watermark = api.get_orders_since(since_id=25, page_size=2)
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(26, 31)])
+        self.assertEqual(watermark, SyncWatermark(None, 30))
+        # Nothing new since the watermark
+        self.assertEqual(api.get_orders_since(*watermark), ([], watermark))
+
+    def test_get_orders_since_date_upd(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        _, watermark = api.get_orders_since(date_upd="2024-01-01 00:00:00")
+        self.assertEqual(watermark, SyncWatermark("2024-01-01 12:30:00", 30))
+
+        # An old order changes and a new one with the same update date as the watermark is added
+        self.resources["orders"][3] |= {"date_upd": "2024-02-01 08:00:00"}
+        self.resources["orders"][31] = self.resources["orders"][30] | {"id": 31, "reference": "NEW"}
+        orders, watermark = api.get_orders_since(*watermark)
+
+        self.assertEqual([order.id for order in orders], [31, 3])
+        self.assertEqual(watermark, SyncWatermark("2024-02-01 08:00:00", 3))
+
+    def test_get_orders_since_with_order_updated_meanwhile(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        respond = self.shop.respond
+
+        # Order 1 is updated after the first page was read
+        def respond_and_update(raw_path: str, headers):
+            response = respond(raw_path, headers)
+            if self.shop.requests_to("orders") == 1:
+                self.resources["orders"][1] |= {"date_upd": "2024-02-01 08:00:00"}
+            return response
+
+        self.shop.respond = respond_and_update
+        orders, watermark = api.get_orders_since(date_upd="2024-01-01 00:00:00", page_size=3)
+
+        # No order is skipped and the updated one is returned once, at its new position
+        self.assertEqual([order.id for order in orders], list(range(2, 31)) + [1])
+        self.assertEqual(watermark, SyncWatermark("2024-02-01 08:00:00", 1))
+
+    def test_get_orders_since_with_many_orders_in_one_second(self):
+        for order_id in range(5, 15):
+            self.resources["orders"][order_id] |= {"date_upd": "2024-02-01 08:00:00"}
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+
+        orders, watermark = api.get_orders_since("2024-02-01 08:00:00", 6, page_size=3)
+
+        self.assertEqual([order.id for order in orders], list(range(7, 15)))
+        self.assertEqual(watermark, SyncWatermark("2024-02-01 08:00:00", 14))
+
+    def test_iter_orders_is_lazy(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        orders = api.iter_orders(page_size=4)
+        requests_before = self.shop.requests_to("orders")
+
+        self.assertEqual(next(orders), expected_order(self.resources, 1))
+        # Only the first page was requested to yield the first order
+        self.assertEqual(self.shop.requests_to("orders"), requests_before + 1)
+        self.assertEqual(list(orders), [expected_order(self.resources, i) for i in range(2, 31)])
+
+    def test_iter_orders_from_start_to_stop(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        orders = list(api.iter_orders(page_size=4, start=10, stop=19))
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(11, 20)])
+
+    def test_iter_orders_pipelined(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, extra_fields={"customer": ["birthday"]})
+        orders = list(api.iter_orders_pipelined(page_size=4, io_workers=3, processes=2, max_pending=2))
+
+        # The reference resources are read once, every page reads its orders, customers and addresses once
+        self.assertEqual(self.shop.requests_to("countries"), 1)
+        self.assertEqual(self.shop.requests_to("customers"), 8)
+        # The worker processes report their decoding and building time, the order id index adds another 30 parsed
+        self.assertEqual(api.metrics["orders"].parsed, 60)
+        self.assertEqual(api.metrics.built, 30)
+        self.assertEqual(orders, list(api.iter_orders(page_size=4)))
+
+    def test_iter_orders_pipelined_with_failing_stage(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.shop.fail("/api/customers", 401)
+
+        # The error of a stage reaches the consumer
+        with self.assertRaises(ResourceForbiddenError):
+            list(api.iter_orders_pipelined(page_size=10, io_workers=2, processes=1))
+
+    def test_iter_orders_pipelined_from_start_to_stop(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON")
+        orders = list(api.iter_orders_pipelined(page_size=4, processes=1, start=10, stop=19))
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(11, 20)])
+        self.assertEqual(list(api.iter_orders_pipelined(start=30)), [])
+
+    def test_iter_orders_pipelined_with_orders_added_later(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.assertEqual(api.orders_amount, 30)
+        self.resources["orders"][31] = self.resources["orders"][30] | {"id": 31, "reference": "NEW31"}
+
+        orders = list(api.iter_orders_pipelined(page_size=10, processes=1))
+        self.assertEqual(orders, list(api.iter_orders(page_size=10)))
+        self.assertEqual(orders[-1], expected_order(self.resources, 31))
+
+    def test_iter_orders_pipelined_of_empty_shop(self):
+        self.resources["orders"].clear()
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+
+        self.assertEqual(list(api.iter_orders_pipelined(processes=1)), [])
+        self.assertEqual(list(api.iter_orders()), [])
+
+    def test_json_output_format(self):
+        xml_api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        json_api = PrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON")
+
+        # Both wire formats give identical orders on every path
+        self.assertEqual(json_api.get_all_orders(), xml_api.get_all_orders())
+        self.assertEqual(json_api.get_all_orders_bulk(page_size=8), xml_api.get_all_orders_bulk(page_size=8))
+        self.assertEqual(json_api.get_orders_since(since_id=20), xml_api.get_orders_since(since_id=20))
+
+    def test_json_output_format_falls_back_to_xml(self):
+        self.shop.json_support = False
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON")
+
+        self.assertEqual(api.get_orders([1, 2]), [expected_order(self.resources, 1), expected_order(self.resources, 2)])
+        self.assertEqual(self.shop.requests[-1][1].get("output_format"), "JSON")
+
+    def test_invalid_output_format(self):
+        with self.assertRaises(ValueError):
+            PrestaShopOrderClient(self.shop.link, self.api_key, output_format="CSV")
+
+    def test_requests_only_the_needed_fields(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+
+        self.assertEqual(api.get_order(7), expected_order(self.resources, 7))
+        self.assertEqual(api.get_all_orders_bulk(page_size=8),
+                         [expected_order(self.resources, i) for i in range(1, 31)])
+        # No resource was requested completely, the password hashes of the customers are never read
+        for path, params in self.shop.requests[1:]:
+            self.assertNotEqual(params.get("display"), "full")
+        for path, params in self.shop.requests:
+            if path.startswith("/api/customers"):
+                self.assertNotIn("passwd", params["display"])
+
+    def test_extra_fields(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key,
+                                    extra_fields={"order": ["payment", "date_add"], "country": ["iso_code"]})
+        order = api.get_order(7)
+        country = self.resources["addresses"][self.resources["orders"][7]["id_address_delivery"].id]["id_country"]
+
+        self.assertEqual(order._replace(extra=None), expected_order(self.resources, 7))
+        self.assertEqual(order.extra, {"order": {"payment": "Bank wire",
+                                                 "date_add": self.resources["orders"][7]["date_add"]},
+                                       "country": {"iso_code": self.resources["countries"][country.id]["iso_code"]}})
+        self.assertEqual(api.get_all_orders_bulk(page_size=8)[6], order)
+
+    def test_extra_fields_of_unknown_resource(self):
+        with self.assertRaises(ValueError):
+            PrestaShopOrderClient(self.shop.link, self.api_key, extra_fields={"carrier": ["name"]})
+
+    def test_order_rows(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        rows_api = PrestaShopOrderClient(self.shop.link, self.api_key, order_rows=True)
+        requests_before = len(self.shop.requests)
+        api.get_order(7)
+        requests_without_rows = len(self.shop.requests) - requests_before
+        order = rows_api.get_order(7)
+
+        self.assertEqual(order, expected_order(self.resources, 7, rows=True))
+        # The rows are part of the order, reading them needs no further request
+        self.assertEqual(len(self.shop.requests) - requests_before, 2 * requests_without_rows)
+        self.assertEqual(self.shop.requests_to("products"), 0)
+        json_api = PrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON", order_rows=True)
+        self.assertEqual(json_api.get_all_orders_bulk(page_size=8), rows_api.get_all_orders_bulk(page_size=8))
+
+    def test_products(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, products=True, cache=ResourceCache())
+        orders = api.get_all_orders_bulk(page_size=30)
+
+        self.assertEqual(orders, [expected_order(self.resources, i, products=True) for i in range(1, 31)])
+        # Products are read in chunks of the page size, cached products not at all
+        self.assertLessEqual(self.shop.requests_to("products"), 2)
+        requests_to_products = self.shop.requests_to("products")
+        self.assertEqual(api.get_order(7), orders[6])
+        self.assertEqual(self.shop.requests_to("products"), requests_to_products)
+        self.assertEqual(list(api.iter_orders_pipelined(page_size=10, processes=1)), orders)
+
+    def test_products_of_deleted_rows(self):
+        order = self.resources["orders"][7]
+        del self.resources["products"][order["associations"].items[0]["product_id"].id]
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, output_format="JSON", products=True)
+
+        rows = api.get_order(7).rows
+        self.assertIsNone(rows[0].product)
+        self.assertEqual(rows, expected_order(self.resources, 7, products=True).rows)
+        self.assertEqual(self.shop.requests_to("products"), 1)
+
+    def test_find_orders(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        orders = [expected_order(self.resources, i) for i in range(1, 31)]
+
+        self.assertEqual(api.find_orders(current_state="Shipped", page_size=4),
+                         [order for order in orders if order.order_state == "Shipped"])
+        self.assertEqual(api.find_orders(current_state=[1, "Delivered"]),
+                         [order for order in orders if order.order_state in ("Awaiting payment", "Delivered")])
+        customer = self.resources["orders"][5]["id_customer"].id
+        self.assertEqual(api.find_orders(id_customer=customer),
+                         [order for order in orders
+                          if self.resources["orders"][order.id]["id_customer"].id == customer])
+        self.assertEqual(api.find_orders(reference=["REF000003", "REF000017"]), [orders[2], orders[16]])
+        self.assertEqual(api.find_orders(date_add=("2024-01-01 10:05:00", "2024-01-01 10:09:00"), sort="id_DESC",
+                                         limit=3), [orders[8], orders[7], orders[6]])
+        # The order ids were never listed, only the matching orders were read
+        self.assertTrue(all(params.get("display") != "[id]" for _, params in self.shop.requests))
+
+    def test_find_orders_reads_only_matching_orders(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        orders = api.find_orders(reference="REF000007", page_size=10)
+
+        self.assertEqual(orders, [expected_order(self.resources, 7)])
+        self.assertEqual(self.shop.requests_to("orders"), 1)
+        self.assertEqual(self.shop.requests_to("customers"), 1)
+        self.assertEqual(api.find_orders(reference="unknown"), [])
+
+    def test_find_orders_with_unknown_state(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        with self.assertRaises(ValueError):
+            api.find_orders(current_state="Lost")
+
+    def test_get_orders_bulk(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key)
+        numbers = [17, 3, 25, 3, 8, 12, 30, 1]
+        orders = api.get_orders_bulk(numbers, page_size=4)
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in numbers])
+        # One request per page of distinct orders and per chunk of distinct referenced resources
+        self.assertEqual(self.shop.requests_to("orders"), 1 + 2)
+        customers = {self.resources["orders"][i]["id_customer"].id for i in numbers}
+        self.assertEqual(self.shop.requests_to("customers"), -(-len(customers) // 4))
+        self.assertEqual(self.shop.requests_to("countries"), 1)
+        with self.assertRaises(InvalidOrderNumber):
+            api.get_orders_bulk([1, 31])
+
+    def test_connections_are_reused(self):
+        with PrestaShopOrderClient(self.shop.link, self.api_key) as api:
+            api.get_orders([1, 2, 3])
+
+        # The connection of the connection check is used for all following requests
+        self.assertEqual(len(self.shop.connections), 1)
+
+    def test_without_keep_alive(self):
+        with PrestaShopOrderClient(self.shop.link, self.api_key, keep_alive=False) as api:
+            api.get_order(1)
+
+        self.assertEqual(len(self.shop.connections), len(self.shop.requests))
+
+    def test_compression(self):
+        self.shop.gzip = True
+        with PrestaShopOrderClient(self.shop.link, self.api_key) as api:
+            self.assertEqual(api.get_all_orders_bulk(page_size=10),
+                             [expected_order(self.resources, i) for i in range(1, 31)])
+        self.assertEqual(self.shop.compressed, len(self.shop.requests))
+
+        self.shop.compressed = 0
+        with PrestaShopOrderClient(self.shop.link, self.api_key, compression=False) as api:
+            api.get_order(1)
+        self.assertEqual(self.shop.compressed, 0)
+
+    def test_timeout(self):
+        self.shop.latency = 0.5
+        with self.assertRaises(PrestaShopConnectionError):
+            PrestaShopOrderClient(self.shop.link, self.api_key, timeout=(1.0, 0.05),
+                                  retry_policy=RetryPolicy(retries=0))
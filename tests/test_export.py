@@ -0,0 +1,147 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase, skipUnless
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.exceptions import PrestaShopConnectionError
+from prestashop_orders_client.export import pyarrow
+from prestashop_orders_client.utils import Order
+
+
+class TestExportOrders(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(30)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+        self.client = PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "orders.ndjson")
+
+    def tearDown(self):
+        self.shop.stop()
+        self.directory.cleanup()
+
+    def read_ndjson(self, path: str, compressed: bool = False) -> list[Order]:
+        with (gzip.open if compressed else open)(path, "rt") as file:
+            return [Order(**json.loads(line)) for line in file]
+
+    def interrupt_after(self, client: PrestaShopOrderClient, amount: int):
+        """
+        Makes the iteration of the client's orders fail after the given amount of orders.
+        """
+        iter_orders = client.iter_orders
+
+        def failing(*args, **kwargs):
+            for position, order in enumerate(iter_orders(*args, **kwargs)):
+                if position == amount:
+                    raise PrestaShopConnectionError("Could not connect to the server!")
+                yield order
+
+        client.iter_orders = failing
+
+    def test_ndjson(self):
+        self.assertEqual(self.client.export_orders(self.path, page_size=8, chunk_size=7), 30)
+
+        self.assertEqual(self.read_ndjson(self.path), [expected_order(self.resources, i) for i in range(1, 31)])
+        # A finished export leaves no checkpoint behind
+        self.assertFalse(os.path.exists(self.path + ".checkpoint"))
+
+    def test_resume_after_failure(self):
+        self.interrupt_after(self.client, 25)
+        with self.assertRaises(PrestaShopConnectionError):
+            self.client.export_orders(self.path, compression="gzip", page_size=8, chunk_size=10)
+        with open(self.path + ".checkpoint") as file:
+            self.assertEqual(json.load(file)["last_id"], 20)
+        # A chunk torn by the crash is cut off when resuming
+        with open(self.path, "ab") as file:
+            file.write(b"torn chunk")
+
+        client = PrestaShopOrderClient(self.shop.link, self.api_key)
+        requests_before = self.shop.requests_to("orders")
+        self.assertEqual(client.export_orders(self.path, compression="gzip", page_size=8, chunk_size=10), 30)
+
+        self.assertEqual(self.read_ndjson(self.path, compressed=True),
+                         [expected_order(self.resources, i) for i in range(1, 31)])
+        # Only the orders after the checkpoint were read again
+        self.assertEqual(self.shop.requests_to("orders") - requests_before, 2)
+        orders_requests = [params for path, params in self.shop.requests if path == "/api/orders"][-2:]
+        self.assertEqual(orders_requests[0]["filter[id]"], ">[20]")
+
+    def test_resume_after_deleted_order(self):
+        self.interrupt_after(self.client, 3)
+        with self.assertRaises(PrestaShopConnectionError):
+            self.client.export_orders(self.path, chunk_size=3)
+        del self.client.iter_orders
+        self.client.refresh_order_ids()
+        # An already exported order is deleted before the export is resumed by the same client
+        del self.resources["orders"][1]
+
+        self.assertEqual(self.client.export_orders(self.path, chunk_size=3), 30)
+        self.assertEqual([order.id for order in self.read_ndjson(self.path)], list(range(1, 31)))
+
+    def test_resume_with_other_format(self):
+        self.interrupt_after(self.client, 5)
+        with self.assertRaises(PrestaShopConnectionError):
+            self.client.export_orders(self.path, chunk_size=2)
+        with self.assertRaises(ValueError):
+            self.client.export_orders(self.path, format="csv", chunk_size=2)
+
+    def test_resume_with_missing_or_shortened_file(self):
+        path = os.path.join(self.directory.name, "orders.csv")
+        self.interrupt_after(self.client, 5)
+        with self.assertRaises(PrestaShopConnectionError):
+            self.client.export_orders(path, format="csv", chunk_size=2)
+        del self.client.iter_orders
+        with open(path, "r+b") as file:
+            file.truncate(10)
+
+        # Resuming would pad the file with NUL bytes or fail to open it, the checkpoint has to be removed instead
+        with self.assertRaisesRegex(ValueError, "orders.csv.checkpoint"):
+            self.client.export_orders(path, format="csv", chunk_size=2)
+        os.remove(path)
+        with self.assertRaisesRegex(ValueError, "orders.csv.checkpoint"):
+            self.client.export_orders(path, format="csv", chunk_size=2)
+
+        os.remove(path + ".checkpoint")
+        self.assertEqual(self.client.export_orders(path, format="csv", chunk_size=2), 30)
+
+    def test_csv(self):
+        path = os.path.join(self.directory.name, "orders.csv")
+        client = PrestaShopOrderClient(self.shop.link, self.api_key, order_rows=True)
+        client.export_orders(path, format="csv", chunk_size=4)
+
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 30)
+        self.assertEqual(list(rows[0]), list(Order._fields))
+        order = expected_order(self.resources, 3, rows=True)
+        self.assertEqual(rows[2]["reference"], order.reference)
+        self.assertEqual(rows[2]["extra"], "")
+        self.assertEqual([row["product_id"] for row in json.loads(rows[2]["rows"])],
+                         [row.product_id for row in order.rows])
+
+    def test_invalid_format_and_compression(self):
+        with self.assertRaises(ValueError):
+            self.client.export_orders(self.path, format="xml")
+        with self.assertRaises(ValueError):
+            self.client.export_orders(self.path, compression="zstd")
+
+    @skipUnless(pyarrow, "pyarrow is not installed")
+    def test_parquet(self):
+        path = os.path.join(self.directory.name, "orders.parquet")
+        self.interrupt_after(self.client, 12)
+        with self.assertRaises(PrestaShopConnectionError):
+            self.client.export_orders(path, format="parquet", compression="zstd", chunk_size=5)
+        client = PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.assertEqual(client.export_orders(path, format="parquet", compression="zstd", chunk_size=5), 30)
+
+        self.assertEqual(sorted(os.listdir(path)), [f"part-{part:05d}.parquet" for part in range(6)])
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.column("id").to_pylist(), list(range(1, 31)))
+        self.assertEqual(table.column("country").to_pylist(),
+                         [expected_order(self.resources, i).country for i in range(1, 31)])
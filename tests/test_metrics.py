@@ -0,0 +1,132 @@
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.async_client import AsyncPrestaShopOrderClient
+from prestashop_orders_client.cache import ResourceCache
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.metrics import ClientMetrics, MetricEvent, LATENCY_BUCKETS
+from prestashop_orders_client.transport import RetryPolicy
+
+
+class FakeSpan:
+
+    def __init__(self, name: str, start_time: int, attributes: dict):
+        self.name, self.start_time, self.attributes, self.end_time = name, start_time, attributes, None
+
+    def end(self, end_time: int = None):
+        self.end_time = end_time
+
+
+class FakeTracer:
+    """
+    Records the spans like an OpenTelemetry tracer.
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name: str, start_time: int = None, attributes: dict = None) -> FakeSpan:
+        self.spans.append(FakeSpan(name, start_time, attributes))
+        return self.spans[-1]
+
+
+class TestClientMetrics(TestCase):
+
+    def test_record_request(self):
+        metrics = ClientMetrics()
+        metrics.record_request("customers", 200, 0.02, 500)
+        metrics.record_request("customers", 200, 30.0, 700)
+        metrics.record_request("customers", 500, 0.001, 10)
+        metrics.record_request("customers", None, 0.5, 0)
+        metrics.record_request("customers", 200, 0.0, 500, cached=True)
+
+        customers = metrics["customers"]
+        self.assertEqual(customers.requests, 4)
+        self.assertEqual(customers.cached_responses, 1)
+        self.assertEqual(customers.errors, 2)
+        self.assertEqual(customers.statuses, {200: 3, 500: 1, None: 1})
+        self.assertEqual(customers.bytes, 1210)
+        # 0.02 lands in the 0.025 bucket, 30 seconds in the last one
+        self.assertEqual(customers.latency[LATENCY_BUCKETS.index(0.025)], 1)
+        self.assertEqual(customers.latency[-1], 1)
+        self.assertEqual(sum(customers.latency), 4)
+
+    def test_snapshot_and_reset(self):
+        metrics = ClientMetrics()
+        metrics.record_parse("orders", 0.25, 100)
+        metrics.record_build(0.5, 100)
+        metrics.record_cache_hit("countries", 3)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["orders"]["parsed"], 100)
+        self.assertEqual(snapshot["orders"]["parse_time"], 0.25)
+        self.assertEqual(snapshot["countries"]["cache_hits"], 3)
+        self.assertEqual(snapshot["build"], {"built": 100, "build_time": 0.5})
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {"build": {"built": 0, "build_time": 0.0}})
+
+    def test_hooks_and_tracer(self):
+        events, tracer = [], FakeTracer()
+        metrics = ClientMetrics(hooks=[events.append], tracer=tracer)
+        metrics.record_request("orders", 200, 0.5, 100)
+        metrics.record_cache_hit("countries")
+
+        self.assertEqual(events, [MetricEvent("request", "orders", 0.5, 100, 200),
+                                  MetricEvent("cache_hit", "countries", 0.0, 1, None)])
+        # Cache hits take no time and get no span
+        self.assertEqual(len(tracer.spans), 1)
+        span = tracer.spans[0]
+        self.assertEqual(span.name, "prestashop.request")
+        self.assertEqual(span.end_time - span.start_time, 500_000_000)
+        self.assertEqual(span.attributes["http.response.status_code"], 200)
+
+
+class TestClientMetricsWithFakeShop(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(30)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    def test_get_all_orders_bulk(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, check_connection=False)
+        api.get_all_orders_bulk(page_size=10)
+        metrics = api.metrics
+
+        for resource in ("orders", "customers", "addresses", "order_states", "countries", "states"):
+            self.assertEqual(metrics[resource].requests, self.shop.requests_to(resource))
+            self.assertGreater(metrics[resource].bytes, 0)
+            self.assertGreater(metrics[resource].parse_time, 0)
+        self.assertEqual(metrics["orders"].parsed, 30)
+        self.assertEqual(metrics.built, 30)
+        self.assertEqual(metrics["orders"].errors, 0)
+
+    def test_errors_and_cache_hits(self):
+        self.shop.fail("/api/customers", 502)
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, cache=ResourceCache(),
+                                    retry_policy=RetryPolicy(backoff=0.0))
+
+        self.assertEqual(api.get_orders([1, 2, 3, 4]), [expected_order(self.resources, i) for i in (1, 2, 3, 4)])
+        # The retried request counts once, with the status of its last attempt
+        self.assertEqual(api.metrics["customers"].errors, 0)
+        self.assertEqual(api.metrics[""].requests, 1)
+        self.assertEqual(sum(api.metrics[resource].cache_hits for resource in api.metrics),
+                         sum(api.cache.hits.values()))
+
+
+class TestAsyncClientMetrics(IsolatedAsyncioTestCase):
+
+    async def test_get_all_orders(self):
+        with FakePrestaShop(make_shop(10)) as shop:
+            events = []
+            async with AsyncPrestaShopOrderClient(shop.link, "test_api_key",
+                                                  metrics=ClientMetrics(hooks=[events.append])) as client:
+                await client.get_all_orders()
+
+        self.assertEqual(client.metrics["orders"].requests, shop.requests_to("orders"))
+        self.assertGreater(client.metrics["orders"].bytes, 0)
+        self.assertEqual(client.metrics.built, 10)
+        self.assertEqual(sum(1 for event in events if event.kind == "request"), len(shop.requests))
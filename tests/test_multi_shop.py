@@ -0,0 +1,99 @@
+import itertools
+import time
+from unittest import TestCase
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.exceptions import ResourceForbiddenError
+from prestashop_orders_client.multi_shop import MultiShopOrderClient, ShopOrders
+from prestashop_orders_client.transport import RetryPolicy
+from prestashop_orders_client.utils import SyncWatermark
+
+
+class TestMultiShopOrderClient(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = [make_shop(12, seed=1), make_shop(7, seed=2), make_shop(5, seed=3)]
+        self.shops = [FakePrestaShop(self.resources[0], self.api_key, latency=0.02).start(),
+                      FakePrestaShop(self.resources[1], self.api_key).start(),
+                      FakePrestaShop(self.resources[2], "other_api_key").start()]
+        self.links = [shop.link for shop in self.shops]
+
+    def tearDown(self):
+        for shop in self.shops:
+            shop.stop()
+
+    def client(self, **options) -> MultiShopOrderClient:
+        return MultiShopOrderClient([(link, self.api_key) for link in self.links],
+                                    retry_policy=RetryPolicy(retries=0), **options)
+
+    def test_get_all_orders(self):
+        orders, errors = self.client().get_all_orders(page_size=5)
+
+        self.assertEqual(orders[self.links[0]], [expected_order(self.resources[0], i) for i in range(1, 13)])
+        self.assertEqual(orders[self.links[1]], [expected_order(self.resources[1], i) for i in range(1, 8)])
+        # The shop with another API key fails on its own
+        self.assertEqual(orders[self.links[2]], [])
+        self.assertIsInstance(errors[self.links[2]], ResourceForbiddenError)
+        self.assertEqual(list(errors), [self.links[2]])
+        # No connection check was made
+        self.assertNotIn(("/api", {}), self.shops[1].requests)
+
+    def test_slow_shop_does_not_hold_up_the_others(self):
+        results = list(self.client().iter_orders(page_size=4))
+
+        self.assertEqual([result.shop for result in results][-1], self.links[0])
+        self.assertEqual(sum(len(result.orders) for result in results if result.shop == self.links[1]), 7)
+        self.assertTrue(all(len(result.orders) <= 4 for result in results))
+
+    def test_max_shops_per_host(self):
+        # All fake shops run on 127.0.0.1, so they are read one after another
+        results = list(self.client(max_shops_per_host=1).iter_orders(page_size=2))
+
+        shops = [shop for shop, _ in itertools.groupby(result.shop for result in results)]
+        self.assertEqual(sorted(shops), sorted(self.links))
+
+    def test_busy_host_does_not_hold_up_other_hosts(self):
+        slow_shops = [FakePrestaShop(make_shop(12, seed=4), self.api_key, latency=0.02).start() for _ in range(2)]
+        self.shops.extend(slow_shops)
+        # The fast shop is the only one on localhost, the slow shops share 127.0.0.1
+        self.links = [shop.link for shop in slow_shops] + [self.shops[1].link.replace("127.0.0.1", "localhost")]
+
+        results = [result.shop for result in self.client(max_shops=2, max_shops_per_host=1).iter_orders(page_size=2)]
+
+        def finished(link: str) -> int:
+            return len(results) - results[::-1].index(link)
+
+        # The fast shop got the thread the second slow shop would have waited in and finished before the first one
+        self.assertLess(finished(self.links[2]), finished(self.links[0]))
+
+    def test_stop_iterating(self):
+        orders = self.client().iter_orders(page_size=1)
+
+        self.assertIsInstance(next(orders), ShopOrders)
+        orders.close()
+
+    def test_slow_consumer_holds_shops_back(self):
+        # The fast shop alone, with one page per order and room for two pages in the results queue
+        self.links = [self.shops[1].link]
+        orders = self.client(max_shops=1).iter_orders(page_size=1)
+        next(orders)
+        time.sleep(0.3)
+
+        # Besides the two queued pages, the shop only read the page it waits to put
+        requests = self.shops[1].requests_to("orders")
+        self.assertLessEqual(requests, 4)
+        orders.close()
+        time.sleep(0.3)
+        self.assertEqual(self.shops[1].requests_to("orders"), requests)
+
+    def test_get_orders_since(self):
+        watermarks = {self.links[0]: SyncWatermark(None, 10)}
+        results = {result.shop: result for result in self.client().get_orders_since(watermarks)}
+
+        self.assertEqual(results[self.links[0]].orders, [expected_order(self.resources[0], i) for i in (11, 12)])
+        self.assertEqual(results[self.links[0]].watermark, SyncWatermark(None, 12))
+        self.assertEqual(len(results[self.links[1]].orders), 7)
+        # A failed shop keeps the watermark it was read from
+        self.assertEqual(results[self.links[2]].watermark, SyncWatermark(None, 0))
+        self.assertIsInstance(results[self.links[2]].error, ResourceForbiddenError)
@@ -1,4 +1,5 @@
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 from unittest.mock import Mock, patch
 
@@ -220,3 +221,99 @@ class TestOrderParser(TestCase):
         result = self.parser.parse_resource("state", state_data)
         expected_result = {'state': None}
         self.assertDictEqual(result, expected_result)
+
+    @patch("prestashop_orders_client.parser._get_resources_as_list")
+    def test_parse_orders(self, mock__get_resources_as_list: Mock):
+        orders_data = [
+            {'id': '1', 'total_paid': '10.000000', 'reference': 'AAA',
+             'current_state': {'@xlink:href': 'https://example/api/order_states/4', '#text': '4'},
+             'id_address_delivery': {'@xlink:href': 'https://example/api/addresses/1', '#text': '1'},
+             'id_customer': {'@xlink:href': 'https://example/api/customers/1', '#text': '1'}},
+            {'id': '2', 'total_paid': '20.000000', 'reference': 'BBB',
+             'current_state': {'@xlink:href': 'https://example/api/order_states/4', '#text': '4'},
+             'id_address_delivery': {'@xlink:href': 'https://example/api/addresses/2', '#text': '2'},
+             'id_customer': {'@xlink:href': 'https://example/api/customers/1', '#text': '1'}},
+        ]
+        address = {'company': None, 'lastname': 'Doe', 'firstname': 'John', 'address1': 'Street 1',
+                   'address2': None, 'postcode': '1234', 'city': 'Vienna', 'phone': '123'}
+        order_states = [{'id': '4', 'name': {'language': {'@id': '1', '#text': 'Shipped'}}}]
+        customers = [{'id': '1', 'email': 'example@example.co'}]
+        addresses = [
+            address | {'id': '1', 'id_country': {'@xlink:href': 'https://example/api/countries/2', '#text': '2'},
+                       'id_state': '0'},
+            address | {'id': '2', 'id_country': {'@xlink:href': 'https://example/api/countries/2', '#text': '2'},
+                       'id_state': {'@xlink:href': 'https://example/api/states/9', '#text': '9'}},
+        ]
+        countries = [{'id': '2', 'name': {'language': {'@id': '1', '#text': 'Austria'}}}]
+        states = [{'id': '9', 'name': 'Vienna'}]
+        mock__get_resources_as_list.side_effect = [order_states, customers, addresses, countries, states]
+
+        result = self.parser.parse_orders(orders_data)
+
+        common = dict(order_state='Shipped', email='example@example.co', first_name='John', last_name='Doe',
+                      company_name=None, phone='123', address='Street 1', city='Vienna', post_code='1234',
+                      country='Austria')
+        self.assertEqual(result, [Order(id=1, total_paid=10.0, reference='AAA', state=None, **common),
+                                  Order(id=2, total_paid=20.0, reference='BBB', state='Vienna', **common)])
+        # Every distinct linked resource is requested once, with one request per resource type
+        mock__get_resources_as_list.assert_has_calls([
+            unittest.mock.call(self.session, 'https://example/api/order_states', 'order_state',
+                               {'display': 'full', 'filter[id]': '[4]'}, fields=None, metrics=None),
+            unittest.mock.call(self.session, 'https://example/api/customers', 'customer',
+                               {'display': 'full', 'filter[id]': '[1]'}, fields=None, metrics=None),
+            unittest.mock.call(self.session, 'https://example/api/addresses', 'address',
+                               {'display': 'full', 'filter[id]': '[1|2]'}, fields=None, metrics=None),
+            unittest.mock.call(self.session, 'https://example/api/countries', 'country',
+                               {'display': 'full', 'filter[id]': '[2]'}, fields=None, metrics=None),
+            unittest.mock.call(self.session, 'https://example/api/states', 'state',
+                               {'display': 'full', 'filter[id]': '[9]'}, fields=None, metrics=None),
+        ])
+
+    @patch("prestashop_orders_client.parser._get_resources_as_list")
+    def test_extract_linked_data_in_chunks(self, mock__get_resources_as_list: Mock):
+        resources_data = [{'id_customer': {'@xlink:href': f'https://example/api/customers/{i}', '#text': str(i)}}
+                          for i in (3, 1, 2, 1)]
+        mock__get_resources_as_list.side_effect = [[{'id': '1'}, {'id': '2'}], [{'id': '3'}]]
+
+        result = self.parser.extract_linked_data(resources_data, "id_customer", "customer", 2)
+
+        self.assertEqual(result, {'1': {'id': '1'}, '2': {'id': '2'}, '3': {'id': '3'}})
+        mock__get_resources_as_list.assert_has_calls([
+            unittest.mock.call(self.session, 'https://example/api/customers', 'customer',
+                               {'display': 'full', 'filter[id]': '[1|2]'}, fields=None, metrics=None),
+            unittest.mock.call(self.session, 'https://example/api/customers', 'customer',
+                               {'display': 'full', 'filter[id]': '[3]'}, fields=None, metrics=None),
+        ])
+
+    @patch("prestashop_orders_client.parser._get_resource_as_dict")
+    def test_extract_order_data_with_executor(self, mock__get_resource_as_dict: Mock):
+        resources = {
+            self.order_link: {"id": "999",
+                              'current_state': {'@xlink:href': 'https://example/api/order_states/4', '#text': '4'},
+                              'id_address_delivery': {'@xlink:href': 'https://example/api/addresses/1', '#text': '1'},
+                              'id_customer': {'@xlink:href': 'https://example/api/customers/1', '#text': '1'}},
+            'https://example/api/order_states/4': {"order_state_data": "order_state_data"},
+            'https://example/api/customers/1': {"customer_data": "customer_data"},
+            'https://example/api/addresses/1': {"id": "1",
+                                                'id_country': {'@xlink:href': 'https://example/api/countries/21',
+                                                               '#text': '21'},
+                                                'id_state': {'@xlink:href': 'https://example/api/states/44',
+                                                             '#text': '44'}},
+            'https://example/api/countries/21': {"country_data": "country_data"},
+            'https://example/api/states/44': {"state_data": "state_data"},
+        }
+        # Resources are fetched in parallel, so they are looked up by link instead of by call order
+        mock__get_resource_as_dict.side_effect = lambda session, link, xml_root, **kwargs: resources[link]
+
+        with ThreadPoolExecutor(3) as executor:
+            result = _OrderParser(self.session, executor).extract_order_data(self.order_link)
+
+        self.assertDictEqual(result, {
+            "order": resources[self.order_link],
+            "order_state": resources['https://example/api/order_states/4'],
+            "customer": resources['https://example/api/customers/1'],
+            "address": resources['https://example/api/addresses/1'],
+            "country": resources['https://example/api/countries/21'],
+            "state": resources['https://example/api/states/44'],
+        })
+        self.assertEqual(mock__get_resource_as_dict.call_count, 6)
@@ -0,0 +1,160 @@
+import os
+import tempfile
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.async_client import AsyncPrestaShopOrderClient
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.response_cache import ResponseCache
+
+COUNTRY = "https://shop/api/countries/1"
+BODY = b"<prestashop><country><id>1</id></country></prestashop>"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "responses.sqlite")
+        self.clock = FakeClock()
+        self.cache = ResponseCache(self.path, ttls={"countries": 100, "states": None}, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_fresh_by_resource_list_ttl(self):
+        self.cache.set(COUNTRY, {"Content-Type": "text/xml"}, BODY)
+        self.cache.set("https://shop/api/states/1", {}, BODY)
+        self.clock.now += 50
+        self.assertTrue(self.cache.fresh(COUNTRY, self.cache.get(COUNTRY)))
+
+        # The TTL of countries is over, states never expire
+        self.clock.now += 100
+        self.assertFalse(self.cache.fresh(COUNTRY, self.cache.get(COUNTRY)))
+        self.assertTrue(self.cache.fresh("https://shop/api/states/1", self.cache.get("https://shop/api/states/1")))
+
+        # A 304 makes the response fresh again
+        self.cache.refresh(COUNTRY)
+        self.assertTrue(self.cache.fresh(COUNTRY, self.cache.get(COUNTRY)))
+
+    def test_only_validated_responses_are_kept_without_ttl(self):
+        self.cache.set("https://shop/api/orders/1", {"Content-Type": "text/xml"}, BODY)
+        self.assertIsNone(self.cache.get("https://shop/api/orders/1"))
+
+        self.cache.set("https://shop/api/orders/1", {"ETag": '"abc"', "Content-Encoding": "gzip"}, BODY)
+        cached = self.cache.get("https://shop/api/orders/1")
+        self.assertEqual(cached.headers, {"ETag": '"abc"'})
+        self.assertEqual(cached.body, BODY)
+        self.assertFalse(self.cache.fresh("https://shop/api/orders/1", cached))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ResponseCache(":memory:", max_size=len(BODY) * 2, ttls={}, default_ttl=None, clock=self.clock)
+        for resource_id in (1, 2):
+            self.clock.now += 1
+            cache.set(f"https://shop/api/countries/{resource_id}", {}, BODY)
+        # Reading country 1 makes country 2 the least recently used one
+        self.clock.now += 1
+        cache.get("https://shop/api/countries/1")
+        self.clock.now += 1
+        cache.set("https://shop/api/countries/3", {}, BODY)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.size, len(BODY) * 2)
+        self.assertIsNone(cache.get("https://shop/api/countries/2"))
+        self.assertIsNotNone(cache.get("https://shop/api/countries/1"))
+
+    def test_survives_reopening(self):
+        self.cache.set(COUNTRY, {}, BODY)
+        self.cache.close()
+        self.cache = ResponseCache(self.path, clock=self.clock)
+
+        self.assertEqual(self.cache.get(COUNTRY).body, BODY)
+        self.assertEqual(self.cache.size, len(BODY))
+
+    def test_api_root_is_not_cacheable(self):
+        self.assertFalse(self.cache.cacheable("https://shop/api"))
+        self.assertFalse(self.cache.cacheable("https://shop/api/"))
+        self.assertTrue(self.cache.cacheable("https://shop/api/orders?display=full"))
+
+
+class TestCachedClient(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(10)
+        self.shop = FakePrestaShop(self.resources, self.api_key, validators=True).start()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "responses.sqlite")
+
+    def tearDown(self):
+        self.shop.stop()
+        self.directory.cleanup()
+
+    def run_client(self, **cache_options) -> tuple[list, ResponseCache]:
+        # Every run opens the cache anew, like a new process would
+        cache = ResponseCache(self.path, **cache_options)
+        try:
+            return PrestaShopOrderClient(self.shop.link, self.api_key, response_cache=cache).get_all_orders(), cache
+        finally:
+            cache.close()
+
+    def test_unchanged_resources_are_revalidated(self):
+        orders, _ = self.run_client(ttls={})
+        requests_before, not_modified_before = len(self.shop.requests), self.shop.not_modified
+        cached_orders, cache = self.run_client(ttls={})
+
+        self.assertEqual(cached_orders, orders)
+        # Every resource was answered with 304 instead of its body, only the connection check was not
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(cache.revalidated, len(self.shop.requests) - requests_before - 1)
+        self.assertEqual(self.shop.not_modified - not_modified_before, cache.revalidated)
+
+    def test_fresh_resources_are_not_requested(self):
+        self.run_client(default_ttl=3600)
+        requests_before = len(self.shop.requests)
+        orders, cache = self.run_client(default_ttl=3600)
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 11)])
+        # Only the connection check reached the shop
+        self.assertEqual(len(self.shop.requests), requests_before + 1)
+        self.assertGreater(cache.hits, 0)
+
+    def test_changed_resource_is_downloaded(self):
+        self.run_client(ttls={})
+        self.resources["orders"][4] |= {"reference": "CHANGED"}
+        orders, cache = self.run_client(ttls={})
+
+        self.assertEqual(orders[3].reference, "CHANGED")
+        self.assertEqual(cache.misses, 1)
+
+
+class TestAsyncCachedClient(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(10)
+        self.shop = FakePrestaShop(self.resources, self.api_key, validators=True).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    async def test_unchanged_resources_are_revalidated(self):
+        cache = ResponseCache(":memory:", ttls={})
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, response_cache=cache) as client:
+            orders = await client.get_all_orders()
+            cached_orders = await client.get_all_orders()
+
+        self.assertEqual(cached_orders, orders)
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 11)])
+        self.assertGreater(cache.revalidated, 0)
+        self.assertEqual(self.shop.not_modified, cache.revalidated)
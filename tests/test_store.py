@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.store import OrderStore, INITIAL_WATERMARK, DATE_COLUMNS
+from prestashop_orders_client.utils import Order, SyncWatermark
+
+
+class TestOrderStore(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(30)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+        self.client = PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "orders.sqlite")
+        self.store = OrderStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.shop.stop()
+        self.directory.cleanup()
+
+    def test_sync_mirrors_all_orders(self):
+        self.assertEqual(self.store.watermark, INITIAL_WATERMARK)
+        self.assertEqual(self.store.sync(self.client, page_size=8), 30)
+
+        self.assertEqual(len(self.store), 30)
+        self.assertEqual(self.store.get(7), expected_order(self.resources, 7))
+        self.assertIsNone(self.store.get(31))
+        self.assertEqual(self.store.watermark, SyncWatermark("2024-01-01 12:30:00", 30))
+        # The resources the orders were built from are kept as read from the shop
+        customer_id = self.resources["orders"][7]["id_customer"].id
+        self.assertEqual(self.store.resource("customer", customer_id)["email"],
+                         self.resources["customers"][customer_id]["email"])
+
+    def test_incremental_sync(self):
+        self.store.sync(self.client)
+        self.store.close()
+        # An old order changes and a new one is added, the store is opened again like in a new process
+        self.resources["orders"][3] |= {"reference": "CHANGED", "date_upd": "2024-02-01 08:00:00"}
+        self.resources["orders"][31] = self.resources["orders"][30] | {"id": 31, "date_upd": "2024-02-01 09:00:00"}
+        self.store = OrderStore(self.path)
+        requests_before = self.shop.requests_to("orders")
+
+        self.assertEqual(self.store.sync(self.client), 2)
+        self.assertEqual(self.shop.requests_to("orders"), requests_before + 1)
+        self.assertEqual(len(self.store), 31)
+        self.assertEqual(self.store.get(3).reference, "CHANGED")
+        self.assertEqual(self.store.sync(self.client), 0)
+
+    def test_query(self):
+        self.store.sync(self.client)
+        orders = [expected_order(self.resources, i) for i in range(1, 31)]
+
+        self.assertEqual(self.store.query(country="Germany"), [order for order in orders if order.country == "Germany"])
+        self.assertEqual(self.store.query(order_state=["Shipped", "Delivered"], country=["Austria", "Germany"]),
+                         [order for order in orders if order.order_state in ("Shipped", "Delivered")
+                          and order.country in ("Austria", "Germany")])
+        self.assertEqual(self.store.query(state=None), [order for order in orders if order.state is None])
+        self.assertEqual(self.store.query(reference="REF000012"), [orders[11]])
+        # Orders 1 to 50 were added on January 1st
+        self.assertEqual(self.store.query(date_add=("2024-01-01", "2024-01-01 10:05:00")), orders[:5])
+        self.assertEqual(self.store.query(limit=3), orders[:3])
+
+    def test_query_invalid_field(self):
+        with self.assertRaises(ValueError):
+            self.store.query(total_paid=10)
+
+    def test_extra_fields(self):
+        client = PrestaShopOrderClient(self.shop.link, self.api_key, extra_fields={"order": ["payment"]})
+        self.store.sync(client)
+
+        self.assertEqual(self.store.get(7).extra, {"order": {"payment": "Bank wire"}})
+        self.assertEqual(self.store.query(reference="REF000007"), [self.store.get(7)])
+
+    def test_order_rows(self):
+        client = PrestaShopOrderClient(self.shop.link, self.api_key, products=True)
+        self.store.sync(client)
+
+        self.assertEqual(self.store.get(7), expected_order(self.resources, 7, products=True))
+        self.assertEqual(self.store.query(reference="REF000007"), [self.store.get(7)])
+
+    def test_store_without_rows_column(self):
+        self.store.close()
+        os.remove(self.path)
+        # A store created before orders had rows
+        with sqlite3.connect(self.path) as connection:
+            connection.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, total_paid REAL, {})".format(
+                ", ".join(f"{column} TEXT" for column in Order._fields[2:-1] + DATE_COLUMNS)))
+        connection.close()
+        self.store = OrderStore(self.path)
+        self.store.sync(PrestaShopOrderClient(self.shop.link, self.api_key, order_rows=True))
+
+        self.assertEqual(self.store.get(3), expected_order(self.resources, 3, rows=True))
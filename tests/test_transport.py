@@ -0,0 +1,192 @@
+import time
+from unittest import TestCase, IsolatedAsyncioTestCase
+
+from fake_shop import FakePrestaShop, make_shop, expected_order
+from prestashop_orders_client.async_client import AsyncPrestaShopOrderClient
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.exceptions import UnexpectedStatusCodeError, WebServiceUnavailableError
+from prestashop_orders_client.transport import RetryPolicy, RateLimiter, _parse_retry_after
+
+"""
+Retries without waiting, so that the tests against the fake shop stay fast.
+"""
+NO_WAIT = RetryPolicy(retries=3, backoff=0.0)
+
+
+class FakeClock:
+    """
+    A clock which only moves when sleep is called.
+    """
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestRetryPolicy(TestCase):
+
+    def test_should_retry(self):
+        policy = RetryPolicy(retries=2)
+
+        # Connection errors and transient statuses are retried until the retries are used up
+        self.assertTrue(policy.should_retry(0))
+        self.assertTrue(policy.should_retry(1, 502))
+        self.assertTrue(policy.should_retry(0, 429))
+        self.assertFalse(policy.should_retry(2, 502))
+        # Client errors are not transient
+        self.assertFalse(policy.should_retry(0, 401))
+        self.assertFalse(policy.should_retry(0, 404))
+        # A disabled webservice answers 503 without Retry-After, maintenance mode sends one
+        self.assertFalse(policy.should_retry(0, 503))
+        self.assertTrue(policy.should_retry(0, 503, 5.0))
+
+    def test_exponential_backoff(self):
+        policy = RetryPolicy(backoff=0.5, max_backoff=3.0, jitter=False)
+
+        self.assertEqual([policy.delay(attempt) for attempt in range(5)], [0.5, 1.0, 2.0, 3.0, 3.0])
+
+    def test_jitter(self):
+        policy = RetryPolicy(backoff=1.0, random=lambda: 0.25)
+
+        self.assertEqual(policy.delay(2), 1.0)
+
+    def test_retry_after_is_capped(self):
+        policy = RetryPolicy(max_backoff=10.0)
+
+        self.assertEqual(policy.delay(0, retry_after=4.0), 4.0)
+        self.assertEqual(policy.delay(0, retry_after=120.0), 10.0)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(_parse_retry_after("3"), 3.0)
+        self.assertEqual(_parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(_parse_retry_after("soon"))
+        self.assertIsNone(_parse_retry_after(None))
+
+
+class TestRateLimiter(TestCase):
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=10, burst=2, clock=clock, sleep=clock.sleep)
+
+        # The burst is sent right away, the following requests are spaced by 1 / rate
+        waits = [limiter.acquire() for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1)
+        self.assertAlmostEqual(waits[3], 0.1)
+
+    def test_pause(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=100, burst=5, clock=clock, sleep=clock.sleep)
+        limiter.pause(2.0)
+
+        self.assertEqual(limiter.acquire(), 2.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+
+
+class TestRetryingClient(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(12)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    def test_transient_failures_are_retried(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=NO_WAIT)
+        self.shop.fail("/api/customers", 502, 429)
+        self.shop.fail("/api/addresses", 504)
+
+        # A failure halfway through does not throw away the orders already fetched
+        self.assertEqual(api.get_all_orders(workers=4), [expected_order(self.resources, i) for i in range(1, 13)])
+
+    def test_retries_are_used_up(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=RetryPolicy(retries=1, backoff=0.0))
+        self.shop.fail("/api/customers", 500, 500)
+
+        with self.assertRaises(UnexpectedStatusCodeError):
+            api.get_order(3)
+        self.assertEqual(self.shop.requests_to("customers"), 2)
+
+    def test_retries_disabled(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=RetryPolicy(retries=0))
+        self.shop.fail("/api/customers", 502)
+
+        with self.assertRaises(UnexpectedStatusCodeError):
+            api.get_order(3)
+
+    def test_disabled_web_service_is_not_retried(self):
+        self.shop.fail("/api", 503)
+
+        with self.assertRaises(WebServiceUnavailableError):
+            PrestaShopOrderClient(self.shop.link, self.api_key)
+        self.assertEqual(len(self.shop.requests), 1)
+
+    def test_retry_after_pauses_the_rate_limiter(self):
+        limiter = RateLimiter(rate=1000, burst=10)
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=NO_WAIT, rate_limiter=limiter)
+        self.shop.fail("/api/customers", 429, headers={"Retry-After": "0.2"})
+        started = time.monotonic()
+
+        self.assertEqual(api.get_order(2), expected_order(self.resources, 2))
+        # The Retry-After of the shop is used instead of the backoff of the policy
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_retry_after_holds_back_other_requests(self):
+        limiter = RateLimiter(rate=1000, burst=10)
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=RetryPolicy(retries=0),
+                                    rate_limiter=limiter)
+        self.shop.fail("/api/customers", 429, headers={"Retry-After": "30"})
+
+        with self.assertRaises(UnexpectedStatusCodeError):
+            api.get_order(2)
+        # Without retries left the request fails right away, but the requests of other workers respect the Retry-After
+        self.assertGreater(limiter.reserve(), 25.0)
+
+    def test_rate_limit(self):
+        api = PrestaShopOrderClient(self.shop.link, self.api_key, rate_limiter=RateLimiter(rate=50, burst=1))
+        started = time.monotonic()
+        api.get_order(1)
+
+        # The six requests of an order are spaced by 1 / rate
+        self.assertGreaterEqual(time.monotonic() - started, 5 / 50)
+
+
+class TestAsyncRetryingClient(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(12)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+
+    def tearDown(self):
+        self.shop.stop()
+
+    async def test_transient_failures_are_retried(self):
+        self.shop.fail("/api", 502)
+        self.shop.fail("/api/customers", 502, 503, headers={"Retry-After": "0"})
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=NO_WAIT) as client:
+            orders = await client.get_all_orders()
+
+        self.assertEqual(orders, [expected_order(self.resources, i) for i in range(1, 13)])
+
+    async def test_retries_are_used_up(self):
+        async with AsyncPrestaShopOrderClient(self.shop.link, self.api_key,
+                                              retry_policy=RetryPolicy(retries=1, backoff=0.0)) as client:
+            self.shop.fail("/api/customers", 500, 500)
+            with self.assertRaises(UnexpectedStatusCodeError):
+                await client.get_order(3)
@@ -3,9 +3,10 @@ from unittest.mock import patch, Mock
 
 import requests
 
+from prestashop_orders_client.cache import ResourceCache
 from prestashop_orders_client.exceptions import UnexpectedStatusCodeError, ResourceForbiddenError, \
     PrestaShopConnectionError
-from prestashop_orders_client.utils import _get_resource_as_dict
+from prestashop_orders_client.utils import _get_resource_as_dict, _get_resources_as_list, _id_filter, _from_json
 
 
 class TestGetResourceAsDict(TestCase):
@@ -70,3 +71,98 @@ class TestGetResourceAsDict(TestCase):
         # Assert that the PrestaShopConnectionError exception is raised
         with self.assertRaises(PrestaShopConnectionError):
             _get_resource_as_dict(mock_session, "https://example.com", "customer")
+
+    @patch("requests.Session")
+    def test_cached_response(self, mock_session: Mock):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'<prestashop><country><id>21</id></country></prestashop>'
+        mock_session.get.return_value = mock_response
+        cache = ResourceCache()
+
+        # The second call is answered from the cache
+        first = _get_resource_as_dict(mock_session, "https://example.com/api/countries/21", "country", cache=cache)
+        second = _get_resource_as_dict(mock_session, "https://example.com/api/countries/21", "country", cache=cache)
+
+        self.assertEqual(first, {'id': '21'})
+        self.assertEqual(second, first)
+        mock_session.get.assert_called_once()
+        self.assertEqual(cache.hits["country"], 1)
+
+    @patch("requests.Session")
+    def test_json_response(self, mock_session: Mock):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'{"address": {"id": 1, "id_country": "21", "id_state": "0", "company": "",' \
+                                b' "city": "Vienna"}}'
+        mock_session.get.return_value = mock_response
+
+        result = _get_resource_as_dict(mock_session, "https://example.com/api/addresses/1", "address")
+
+        self.assertEqual(result, {'id': '1', 'id_country': {'@xlink:href': 'https://example.com/api/countries/21',
+                                                            '#text': '21'},
+                                  'id_state': '0', 'company': None, 'city': 'Vienna'})
+
+    def test_from_json_translated_field(self):
+        result = _from_json({"id": 4, "name": [{"id": "1", "value": "Shipped"}]}, "https://example.com/api",
+                            ("name",))
+        self.assertEqual(result, {'name': {'language': {'@id': '1', '@xlink:href': 'https://example.com/api/languages/1',
+                                                        '#text': 'Shipped'}}})
+
+
+class TestGetResourcesAsList(TestCase):
+
+    @patch("requests.Session")
+    def test_many_resources(self, mock_session: Mock):
+        # Set up the mock to return a list response with two customers
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'<prestashop><customers>' \
+                                b'<customer><id>1</id></customer>' \
+                                b'<customer><id>2</id></customer>' \
+                                b'</customers></prestashop>'
+        mock_session.get.return_value = mock_response
+
+        params = {"display": "full", "filter[id]": "[1|2]"}
+        result = _get_resources_as_list(mock_session, "https://example.com/api/customers", "customer", params)
+
+        self.assertEqual(result, [{'id': '1'}, {'id': '2'}])
+        mock_session.get.assert_called_once_with("https://example.com/api/customers", params=params)
+
+    @patch("requests.Session")
+    def test_single_resource(self, mock_session: Mock):
+        # xmltodict returns a dict for a single element, it must still come back as a list
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'<prestashop><addresses><address><id>7</id></address></addresses></prestashop>'
+        mock_session.get.return_value = mock_response
+
+        result = _get_resources_as_list(mock_session, "https://example.com/api/addresses", "address")
+
+        self.assertEqual(result, [{'id': '7'}])
+
+    @patch("requests.Session")
+    def test_no_resources(self, mock_session: Mock):
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'<prestashop><orders></orders></prestashop>'
+        mock_session.get.return_value = mock_response
+
+        result = _get_resources_as_list(mock_session, "https://example.com/api/orders", "order")
+
+        self.assertEqual(result, [])
+
+    @patch("requests.Session")
+    def test_no_resources_json(self, mock_session: Mock):
+        # PrestaShop answers an empty JSON list with [] instead of an object
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = b'[]'
+        mock_session.get.return_value = mock_response
+
+        result = _get_resources_as_list(mock_session, "https://example.com/api/orders", "order")
+
+        self.assertEqual(result, [])
+
+    def test_id_filter(self):
+        self.assertEqual(_id_filter([1, "2", 3]), "[1|2|3]")
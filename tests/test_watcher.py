@@ -0,0 +1,123 @@
+import threading
+from unittest import TestCase
+
+from fake_shop import FakePrestaShop, Link, make_shop, expected_order
+from prestashop_orders_client.client import PrestaShopOrderClient
+from prestashop_orders_client.exceptions import UnexpectedStatusCodeError
+from prestashop_orders_client.transport import RetryPolicy
+from prestashop_orders_client.utils import SyncWatermark
+from prestashop_orders_client.watcher import OrderChange
+
+
+class TestOrderWatcher(TestCase):
+
+    def setUp(self):
+        self.api_key = "test_api_key"
+        self.resources = make_shop(30)
+        self.shop = FakePrestaShop(self.resources, self.api_key).start()
+        self.client = PrestaShopOrderClient(self.shop.link, self.api_key)
+
+    def tearDown(self):
+        self.shop.stop()
+
+    def add_order(self, order_id: int, date_upd: str):
+        self.resources["orders"][order_id] = self.resources["orders"][30] | {"id": order_id, "date_upd": date_upd,
+                                                                             "reference": f"NEW{order_id}"}
+
+    def test_new_and_changed_orders(self):
+        watcher = self.client.watch_orders()
+        # The first poll only sets the watermark to the most recently updated order
+        self.assertEqual(watcher.poll(), [])
+        self.assertEqual(watcher.watermark, SyncWatermark("2024-01-01 12:30:00", 30))
+
+        self.resources["orders"][3] |= {"date_upd": "2024-02-01 08:00:00"}
+        self.add_order(31, "2024-02-01 08:00:00")
+        changes = watcher.poll()
+
+        self.assertEqual(changes, [OrderChange(expected_order(self.resources, 3), False),
+                                   OrderChange(expected_order(self.resources, 31), True)])
+        self.assertEqual(watcher.watermark, SyncWatermark("2024-02-01 08:00:00", 31))
+        # Orders are reported once
+        self.assertEqual(watcher.poll(), [])
+
+    def test_state_change_within_the_same_second(self):
+        watcher = self.client.watch_orders()
+        watcher.poll()
+        watcher.poll()
+        state = self.resources["orders"][30]["current_state"].id
+        self.resources["orders"][30] |= {"current_state": Link("order_states", state % 5 + 1)}
+
+        self.assertEqual(watcher.poll(), [OrderChange(expected_order(self.resources, 30), False)])
+
+    def test_polls_read_only_the_changes(self):
+        watcher = self.client.watch_orders()
+        watcher.poll()
+        requests_before = len(self.shop.requests)
+        watcher.poll()
+
+        # An idle poll is a single request for the fields of the orders updated at the watermark
+        path, params = self.shop.requests[-1]
+        self.assertEqual(len(self.shop.requests) - requests_before, 1)
+        self.assertEqual(params["display"], "[id,date_upd,current_state]")
+        self.assertEqual(params["filter[date_upd]"], "[2024-01-01 12:30:00,9999-12-31 23:59:59]")
+
+        self.add_order(31, "2024-02-01 08:00:00")
+        requests_before = len(self.shop.requests)
+        self.assertEqual(len(watcher.poll()), 1)
+        # The listing and the new order, the shop is neither probed nor are all order ids loaded
+        orders_requests = [params for path, params in self.shop.requests[requests_before:] if path == "/api/orders"]
+        self.assertEqual(orders_requests[0]["display"], "[id,date_upd,current_state]")
+        self.assertEqual([params.get("filter[id]") for params in orders_requests], [None, "[31]"])
+        self.assertNotIn("/api", [path for path, _ in self.shop.requests[requests_before:]])
+
+    def test_failed_poll_is_repeated(self):
+        client = PrestaShopOrderClient(self.shop.link, self.api_key, retry_policy=RetryPolicy(retries=0))
+        watcher = client.watch_orders()
+        watcher.poll()
+        self.add_order(31, "2024-02-01 08:00:00")
+        self.shop.fail("/api/customers", 502)
+
+        with self.assertRaises(UnexpectedStatusCodeError):
+            watcher.poll()
+        # The watermark stays where it was and the next poll reports the change
+        self.assertEqual(watcher.watermark, SyncWatermark("2024-01-01 12:30:00", 30))
+        self.assertEqual(watcher.poll(), [OrderChange(expected_order(self.resources, 31), True)])
+
+    def test_since_watermark(self):
+        watcher = self.client.watch_orders(since=SyncWatermark("2024-01-01 12:28:00", 28))
+
+        self.assertEqual([change.order.id for change in watcher.poll()], [29, 30])
+        with self.assertRaises(ValueError):
+            self.client.watch_orders(since=SyncWatermark(None, 28))
+
+    def test_adaptive_interval(self):
+        watcher = self.client.watch_orders(min_interval=1, max_interval=5, backoff=2)
+        watcher.poll()
+        intervals = []
+        for _ in range(4):
+            watcher.poll()
+            intervals.append(watcher.interval)
+        self.assertEqual(intervals, [2, 4, 5, 5])
+
+        self.add_order(31, "2024-02-01 08:00:00")
+        watcher.poll()
+        self.assertEqual(watcher.interval, 1)
+        with self.assertRaises(ValueError):
+            self.client.watch_orders(min_interval=10, max_interval=5)
+
+    def test_run_with_callback(self):
+        watcher = self.client.watch_orders(min_interval=0.01, max_interval=0.05)
+        watcher.poll()
+        changes = []
+
+        def callback(change: OrderChange):
+            changes.append(change)
+            watcher.stop()
+
+        thread = threading.Thread(target=watcher.run, args=(callback,))
+        thread.start()
+        self.add_order(31, "2024-02-01 08:00:00")
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(changes, [OrderChange(expected_order(self.resources, 31), True)])